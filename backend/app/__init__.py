@@ -19,7 +19,7 @@ def create_app(config_name='development'):
          resources={r"/*": {"origins": "*"}},
          methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
          allow_headers=["Content-Type", "Authorization", "X-Organization-Id"],
-         expose_headers=["Content-Type", "Authorization"],
+         expose_headers=["Content-Type", "Authorization", "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "Retry-After"],
          supports_credentials=False,
          max_age=3600)
     
@@ -48,6 +48,14 @@ def create_app(config_name='development'):
     app.register_blueprint(public_api_bp)  # Public API with API key auth
     app.register_blueprint(debug_bp)  # Debug endpoints
     
+    # CLI maintenance commands (flask rescore-leads, ...)
+    from .cli import register_commands
+    register_commands(app)
+    
+    if app.config.get('GEMINI_PREWARM'):
+        from .ai.gemini_client import prewarm_gemini_client
+        prewarm_gemini_client(app)
+    
     # Health check endpoint
     @app.route('/health')
     def health():
@@ -0,0 +1,203 @@
+"""Cached AI chat context per organization and data type.
+
+The chat endpoints used to re-query and re-enrich every lead / customer /
+campaign and rebuild the prompt table with string `+=` on every message. A
+ChatContext holds the summary figures, the rows, their pre-rendered table lines
+(one join per message, linear in the rows sent) and the retrieval index. It is
+cached per (organization, data type) and tagged with the organization's data
+version (database/organization-data-versions.sql); a message reuses it as long
+as the version is unchanged, so an unchanged org costs one small version query.
+
+If the version table is unavailable, contexts are built per message and never
+cached. Entries also expire after CHAT_CONTEXT_TTL, since customer health
+scores drift with time.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.ai.prompt_budget import stratified_sample
+from app.ai.retrieval import CHAT_CONTEXT_ROWS, DATA_TYPES, RowIndex, describe_selection
+from app.extensions import get_supabase_admin
+from app.utils.ttl_cache import TTLCache
+
+CHAT_CONTEXT_TTL = int(os.getenv('CHAT_CONTEXT_TTL', 900))
+
+_context_cache = TTLCache(
+    maxsize=int(os.getenv('CHAT_CONTEXT_CACHE_SIZE', 256)),
+    ttl=CHAT_CONTEXT_TTL
+)
+
+ROWS_KEYS = {'leads': 'all_leads', 'customers': 'all_customers', 'campaigns': 'all_campaigns'}
+
+TABLE_HEADERS = {
+    'leads': "LEAD_NAME | EMAIL | COMPANY | SCORE | TEMPERATURE | SOURCE | STATUS\n" + "-" * 80 + "\n",
+    'customers': "COMPANY | EMAIL | PLAN | MRR | HEALTH_SCORE | STATUS | CHURN_RISK | EXPANSION\n" + "-" * 90 + "\n",
+    'campaigns': "CAMPAIGN_NAME | CHANNEL | PERIOD | SPEND | REVENUE | ROI | PERFORMANCE\n" + "-" * 80 + "\n"
+}
+
+
+def _lead_line(lead: Dict) -> str:
+    return f"{lead.get('name')} | {lead.get('email')} | {lead.get('company')} | {lead.get('score')} | {lead.get('temperature')} | {lead.get('source')} | {lead.get('status')}"
+
+
+def _customer_line(customer: Dict) -> str:
+    return f"{customer.get('company')} | {customer.get('email')} | {customer.get('plan')} | ${customer.get('mrr', 0):,.2f} | {customer.get('health_score', 0)}/100 | {customer.get('health_status')} | {customer.get('churn_risk_level')} | {'Yes' if customer.get('expansion_opportunity') else 'No'}"
+
+
+def _campaign_line(campaign: Dict) -> str:
+    return f"{campaign.get('name')} | {campaign.get('channel')} | {campaign.get('period')} | ${campaign.get('spend', 0):,.2f} | ${campaign.get('revenue', 0):,.2f} | {campaign.get('roi_percentage', '0%')} | {campaign.get('performance', 'unknown')}"
+
+
+ROW_WRITERS = {'leads': _lead_line, 'customers': _customer_line, 'campaigns': _campaign_line}
+
+
+class ChatContext:
+    """Summary figures, rows, rendered table lines and row index for one dataset."""
+
+    def __init__(self, data_type: str, data_context: Dict[str, Any], version: Optional[int] = None):
+        if data_type not in ROWS_KEYS:
+            raise ValueError(f"Unknown data type '{data_type}'")
+        self.data_type = data_type
+        self.version = version
+        self.rows = data_context.get(ROWS_KEYS[data_type], [])
+        self.summary = {key: value for key, value in data_context.items() if key != ROWS_KEYS[data_type]}
+        self._lines = None
+        self._positions = None
+        self._index = None
+        self._strata_summary = None
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Summary value (same interface as the plain data_context dict)."""
+        return self.summary.get(key, default)
+
+    @property
+    def lines(self) -> List[str]:
+        """One rendered table line per row, built once."""
+        if self._lines is None:
+            with self._lock:
+                if self._lines is None:
+                    self._lines = list(map(ROW_WRITERS[self.data_type], self.rows))
+        return self._lines
+
+    @property
+    def positions(self) -> Dict[Any, int]:
+        """Row position by row id, built once (rows without an id are left out)."""
+        if self._positions is None:
+            with self._lock:
+                if self._positions is None:
+                    self._positions = {row['id']: i for i, row in enumerate(self.rows) if row.get('id') is not None}
+        return self._positions
+
+    @property
+    def index(self) -> RowIndex:
+        """Retrieval index over the rows, built once."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = RowIndex(self.rows, self.data_type)
+        return self._index
+
+    def strata_summary(self) -> str:
+        """Row count and mean rank column per stratum over all rows, built once."""
+        if self._strata_summary is None:
+            spec = DATA_TYPES[self.data_type]
+            field, rank_field = spec['stratum_field'], spec['rank_field']
+            groups = {}
+            for row in self.rows:
+                count, total = groups.get(row.get(field), (0, 0.0))
+                groups[row.get(field)] = (count + 1, total + float(row.get(rank_field) or 0))
+            parts = [
+                f"{value}: {count:,} (avg {rank_field} {total / count:,.1f})"
+                for value, (count, total) in sorted(groups.items(), key=lambda item: -item[1][0])
+            ]
+            self._strata_summary = f"ALL {len(self.rows):,} {self.data_type.upper()} BY {field.upper()}: " + '; '.join(parts)
+        return self._strata_summary
+
+    def render_table(self, question: str, k: int = CHAT_CONTEXT_ROWS, carried: Sequence = (),
+                     max_rows: Optional[int] = None) -> Tuple[str, Dict]:
+        """
+        Prompt table of the rows most relevant to question, plus the subset note.
+
+        carried are the row ids shown on the conversation's previous turn; the
+        rows that still exist fill the table after the k new rows, up to
+        CHAT_CONTEXT_ROWS in total. max_rows (prompt budget) keeps a stratified
+        sample of those rows and adds strata_summary(). selection['rows'] lists
+        the positions shown and selection['row_ids'] their ids.
+        """
+        indices, selection = self.index.select_indices(question, k)
+        note = describe_selection(selection, self.data_type)
+        if carried:
+            shown = set(indices)
+            positions = self.positions
+            extra = [positions[row_id] for row_id in carried if row_id in positions]
+            extra = [i for i in extra if i not in shown]
+            extra = extra[:max(CHAT_CONTEXT_ROWS - len(indices), 0)]
+            indices = indices + extra
+            if extra:
+                note += f" It also repeats {len(extra)} {self.data_type} shown earlier in this conversation."
+        if max_rows is not None and len(indices) > max_rows:
+            field = DATA_TYPES[self.data_type]['stratum_field']
+            labels = [self.rows[i].get(field) for i in indices]
+            kept = stratified_sample(labels, max_rows)
+            dropped = {}
+            for position in set(range(len(indices))) - set(kept):
+                dropped[str(labels[position])] = dropped.get(str(labels[position]), 0) + 1
+            selection['budget_dropped'] = {'rows': len(indices) - len(kept), 'by_' + field: dropped}
+            indices = [indices[position] for position in kept]
+            note += (f" To fit the prompt size limit only {len(indices)} of those rows are listed, "
+                     f"sampled across {field} groups.\n{self.strata_summary()}")
+        selection['rows'] = indices
+        selection['row_ids'] = [self.rows[i].get('id') for i in indices if self.rows[i].get('id') is not None]
+        lines = self.lines
+        table = TABLE_HEADERS[self.data_type] + ''.join(f"{lines[i]}\n" for i in indices)
+        return table + note, selection
+
+
+def get_data_version(organization_id: str, data_type: str) -> Optional[int]:
+    """Current data version for an org's leads/customers/campaigns (None if unavailable)."""
+    try:
+        response = get_supabase_admin().table('organization_data_versions')\
+            .select('version')\
+            .eq('organization_id', organization_id)\
+            .eq('data_type', data_type)\
+            .limit(1)\
+            .execute()
+    except Exception as e:
+        print(f"[chat_context] organization_data_versions unavailable, not caching: {e}")
+        return None
+    # No row yet: nothing has changed since the version triggers were installed
+    return response.data[0]['version'] if response.data else 0
+
+
+def get_chat_context(organization_id: str, data_type: str, build: Callable[[], Dict[str, Any]]) -> ChatContext:
+    """
+    Cached ChatContext for an org, rebuilt with build() when its data changed.
+
+    build returns the data_context dict (summary figures plus the ROWS_KEYS
+    row list) the chat service would otherwise pass for every message.
+    """
+    # Read the version before loading, so a concurrent write makes the cached
+    # entry look stale (rebuilt next time) rather than current
+    version = get_data_version(organization_id, data_type)
+    key = (organization_id, data_type)
+    if version is not None:
+        cached = _context_cache.get(key)
+        if cached is not None and cached.version == version:
+            return cached
+
+    context = ChatContext(data_type, build(), version)
+    if version is not None:
+        _context_cache.set(key, context)
+    return context
+
+
+def invalidate_chat_context(organization_id: str = None, data_type: str = None):
+    """Forget cached contexts (one org / data type, or all)."""
+    if organization_id is None:
+        _context_cache.clear()
+    elif data_type is None:
+        _context_cache.pop_where(lambda key: key[0] == organization_id)
+    else:
+        _context_cache.pop((organization_id, data_type))
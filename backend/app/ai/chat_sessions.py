@@ -0,0 +1,222 @@
+"""Data chat sessions: rolling conversation memory per (org, user, data type).
+
+A session keeps the last CHAT_RECENT_MESSAGES messages verbatim and folds older
+ones into a bounded extractive summary, so a long conversation adds a fixed
+amount to each prompt instead of growing with every turn. It also remembers the
+ids of the table rows shown on the previous turn: follow-up turns retrieve only
+CHAT_FOLLOWUP_ROWS new rows for the question and carry the earlier ones over
+("what is the email of the second one?" still sees them), instead of selecting
+a whole new table.
+
+Sessions live in a per-worker LRU/TTL cache, or in Redis
+(CHAT_SESSION_BACKEND=redis) so every gunicorn worker sees the same
+conversation. The client's `history` seeds a session the store does not know
+(expired, or served by another worker without Redis), and an empty history
+starts a new conversation.
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from app.utils.ttl_cache import TTLCache
+
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', 1800))  # seconds since last message
+CHAT_SESSION_MAX = int(os.getenv('CHAT_SESSION_MAX', 1000))  # per worker (memory backend)
+CHAT_RECENT_MESSAGES = int(os.getenv('CHAT_RECENT_MESSAGES', 4))
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv('CHAT_SUMMARY_MAX_CHARS', 1500))
+CHAT_FOLLOWUP_ROWS = int(os.getenv('CHAT_FOLLOWUP_ROWS', 15))
+_MESSAGE_MAX_CHARS = 600
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s')
+
+
+def _clip(text: str, limit: int) -> str:
+    text = ' '.join(str(text or '').split())
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+def _normalize_history(history, message: str) -> List[Dict]:
+    """Client history as [{'role': 'user'|'assistant', 'content'}], minus the current message."""
+    messages = [
+        {'role': 'assistant' if item.get('role') in ('assistant', 'model') else 'user', 'content': str(item.get('content', ''))}
+        for item in history or []
+        if isinstance(item, dict) and item.get('content')
+    ]
+    # Some pages send the new message as the last history entry, others don't
+    if messages and messages[-1]['role'] == 'user' and messages[-1]['content'].strip() == message.strip():
+        messages.pop()
+    return messages
+
+
+class ChatSession:
+    """Rolling summary, recent messages and last-shown rows of one conversation."""
+
+    def __init__(self, key: str, summary: List[str] = None, recent: List[Dict] = None,
+                 message_count: int = 0, rows: List = None):
+        self.key = key
+        self.summary = summary or []  # one line per folded question/answer
+        self.recent = recent or []
+        self.message_count = message_count
+        self.rows = rows or []  # ids of the table rows shown on the last turn
+
+    def to_dict(self) -> Dict:
+        return {
+            'summary': self.summary,
+            'recent': self.recent,
+            'message_count': self.message_count,
+            'rows': self.rows
+        }
+
+    @classmethod
+    def from_dict(cls, key: str, data: Dict) -> 'ChatSession':
+        # Copies, so the memory backend's stored entry only changes on save
+        return cls(key, list(data.get('summary', [])), list(data.get('recent', [])),
+                   data.get('message_count', 0), list(data.get('rows', [])))
+
+    @property
+    def is_new(self) -> bool:
+        return self.message_count == 0
+
+    def carried_rows(self) -> List:
+        """Row ids from the last turn (ids, so they survive rows added or removed since)."""
+        return self.rows
+
+    def _append(self, role: str, content: str):
+        self.recent.append({'role': role, 'content': _clip(content, _MESSAGE_MAX_CHARS)})
+        self.message_count += 1
+        while len(self.recent) > CHAT_RECENT_MESSAGES:
+            folded = self.recent.pop(0)
+            if folded['role'] == 'user':
+                self.summary.append(f"- Asked: {_clip(folded['content'], 160)}")
+            else:
+                first_sentence = _SENTENCE_RE.split(folded['content'], maxsplit=1)[0]
+                self.summary.append(f"  Answered: {_clip(first_sentence, 240)}")
+        while self.summary and sum(len(line) + 1 for line in self.summary) > CHAT_SUMMARY_MAX_CHARS:
+            self.summary.pop(0)
+
+    def seed(self, history: List[Dict]):
+        """Rebuild from the client's history (already normalized)."""
+        self.summary, self.recent, self.message_count, self.rows = [], [], 0, []
+        for item in history:
+            self._append(item['role'], item['content'])
+
+    def record(self, message: str, answer: str, row_ids: List):
+        """Add a completed turn and the ids of the rows its prompt showed."""
+        self._append('user', message)
+        self._append('assistant', answer)
+        self.rows = list(row_ids)
+
+    def render(self) -> str:
+        """Conversation block for the prompt ('' for a new conversation)."""
+        if self.is_new:
+            return ''
+        parts = ["CONVERSATION SO FAR:"]
+        if self.summary:
+            parts.append("Earlier (summarized):\n" + '\n'.join(self.summary))
+        if self.recent:
+            parts.append("Most recent messages:\n" + '\n'.join(
+                f"{'User' if item['role'] == 'user' else 'Assistant'}: {item['content']}" for item in self.recent
+            ))
+        return '\n'.join(parts)
+
+
+class InMemorySessionStore:
+    """Sessions in a per-worker TTLCache (LRU beyond CHAT_SESSION_MAX)."""
+
+    def __init__(self, maxsize: int = CHAT_SESSION_MAX, ttl: float = CHAT_SESSION_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self._cache.get(key)
+
+    def set(self, key: str, data: Dict):
+        self._cache.set(key, data)
+
+    def delete(self, key: str):
+        self._cache.pop(key)
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+class RedisSessionStore:
+    """Sessions as JSON strings in Redis with a sliding TTL, shared by all workers."""
+
+    def __init__(self, redis_url: str, ttl: float = CHAT_SESSION_TTL, prefix: str = 'chatsession:'):
+        import redis
+        self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            raw = self.redis.get(self.prefix + key)
+        except Exception as e:
+            # A missing session only costs context, never the answer
+            print(f"[ChatSessions] Redis read failed, starting without history: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, data: Dict):
+        try:
+            self.redis.setex(self.prefix + key, self.ttl, json.dumps(data))
+        except Exception as e:
+            print(f"[ChatSessions] Redis write failed: {e}")
+
+    def delete(self, key: str):
+        try:
+            self.redis.delete(self.prefix + key)
+        except Exception as e:
+            print(f"[ChatSessions] Redis delete failed: {e}")
+
+    def stats(self) -> Dict:
+        return {'backend': 'redis', 'ttl': self.ttl}
+
+
+_session_store = None
+
+
+def get_session_store():
+    """Get or create the configured session store backend."""
+    global _session_store
+    if _session_store is None:
+        backend = os.getenv('CHAT_SESSION_BACKEND', 'memory').lower()
+        if backend == 'redis':
+            try:
+                _session_store = RedisSessionStore(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+                print("[ChatSessions] Using Redis backend")
+            except ImportError:
+                print("[ChatSessions] redis package not installed - falling back to in-memory sessions")
+        if _session_store is None:
+            _session_store = InMemorySessionStore()
+    return _session_store
+
+
+def session_key(organization_id: Optional[str], user_id: str, data_type: str) -> str:
+    return f"{organization_id or '-'}:{user_id}:{data_type}"
+
+
+def load_session(key: str, history, message: str) -> ChatSession:
+    """
+    The stored session for key, reconciled with the client's history.
+
+    An empty history means the user started over; an unknown session, or one
+    whose message count disagrees with the client's (new tab, a turn handled
+    by another worker without Redis), is reseeded from what the client sent.
+    """
+    history = _normalize_history(history, message)
+    store = get_session_store()
+    if not history:
+        store.delete(key)
+        return ChatSession(key)
+
+    data = store.get(key)
+    session = ChatSession.from_dict(key, data) if data else ChatSession(key)
+    if len(history) != session.message_count:
+        session.seed(history)
+    return session
+
+
+def save_session(session: ChatSession):
+    get_session_store().set(session.key, session.to_dict())
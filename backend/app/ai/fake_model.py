@@ -0,0 +1,132 @@
+"""Offline deterministic LLM provider (LLM_PROVIDER=fake).
+
+Answers are deterministic functions of the prompt, so the AI endpoints (and
+their streaming variants) can be exercised, load-tested and profiled without
+network access or an API key. Data chat prompts get an answer that quotes the
+first rows of the prompt table; prompts asking for JSON "insights" /
+"recommendations" get that JSON.
+
+Latency and size are configurable:
+
+- time to first chunk is lognormal with median FAKE_LLM_LATENCY_MEDIAN and
+  shape FAKE_LLM_LATENCY_SIGMA (0 = always the median), then
+  FAKE_LLM_CHUNK_DELAY between chunks of FAKE_LLM_WORDS_PER_CHUNK words
+- free-text answers are padded to FAKE_LLM_OUTPUT_WORDS words (0 = natural)
+- FAKE_LLM_ERROR_RATE of calls raise, to exercise timeouts and fallbacks
+
+Draws come from a generator seeded with FAKE_LLM_SEED, the prompt and how many
+times this provider has seen that prompt, so a run is reproducible call for
+call regardless of thread scheduling.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Iterator, List
+
+from app.ai.providers import LLMProvider
+
+FAKE_LLM_LATENCY_MEDIAN = float(os.getenv('FAKE_LLM_LATENCY_MEDIAN', 0.2))  # seconds to first chunk
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv('FAKE_LLM_LATENCY_SIGMA', 0))
+FAKE_LLM_CHUNK_DELAY = float(os.getenv('FAKE_LLM_CHUNK_DELAY', 0.05))  # seconds
+FAKE_LLM_WORDS_PER_CHUNK = int(os.getenv('FAKE_LLM_WORDS_PER_CHUNK', 4))
+FAKE_LLM_OUTPUT_WORDS = int(os.getenv('FAKE_LLM_OUTPUT_WORDS', 0))
+FAKE_LLM_ERROR_RATE = float(os.getenv('FAKE_LLM_ERROR_RATE', 0))
+FAKE_LLM_SEED = int(os.getenv('FAKE_LLM_SEED', 0))
+
+_QUESTION_RE = re.compile(r'User Question:\s*(.*)\Z', re.S)
+_FILLER = ('the', 'data', 'shows', 'that', 'these', 'rows', 'stand', 'out', 'for', 'their', 'recent', 'activity')
+
+
+def _digest(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+class FakeProviderError(RuntimeError):
+    """Injected failure (FAKE_LLM_ERROR_RATE)."""
+
+
+class FakeProvider(LLMProvider):
+    """Deterministic, offline LLMProvider."""
+
+    def __init__(self, model_name: str = 'fake', latency_median: float = FAKE_LLM_LATENCY_MEDIAN,
+                 latency_sigma: float = FAKE_LLM_LATENCY_SIGMA, chunk_delay: float = FAKE_LLM_CHUNK_DELAY,
+                 words_per_chunk: int = FAKE_LLM_WORDS_PER_CHUNK, output_words: int = FAKE_LLM_OUTPUT_WORDS,
+                 error_rate: float = FAKE_LLM_ERROR_RATE, seed: int = FAKE_LLM_SEED):
+        self.model_name = model_name
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.chunk_delay = chunk_delay
+        self.words_per_chunk = max(words_per_chunk, 1)
+        self.output_words = output_words
+        self.error_rate = error_rate
+        self.seed = seed
+        self._seen = Counter()  # calls per prompt digest
+        self._lock = threading.Lock()
+
+    def answer(self, prompt: str) -> str:
+        """Full response text for a prompt."""
+        digest = _digest(prompt)[:8]
+        if '"insights"' in prompt and '"recommendations"' in prompt:
+            return json.dumps({
+                'insights': [f"Offline insight {i + 1} ({digest})" for i in range(4)],
+                'recommendations': [f"Offline recommendation {i + 1} ({digest})" for i in range(4)]
+            })
+
+        match = _QUESTION_RE.search(prompt)
+        question = match.group(1).strip() if match else prompt.strip()[:80]
+        lines = prompt.splitlines()
+        # Rows follow the dashed separator under the table header
+        start = next((i + 1 for i, line in enumerate(lines) if line.startswith('---')), len(lines))
+        rows = [line for line in lines[start:start + 3] if ' | ' in line]
+        answer = f"Offline answer ({digest}) to \"{question}\"."
+        if rows:
+            answer += ' Based on your data: ' + '; '.join(row.split(' | ')[0] for row in rows) + '.'
+
+        missing = self.output_words - len(answer.split(' '))
+        if missing > 0:
+            answer += ' ' + ' '.join(_FILLER[i % len(_FILLER)] for i in range(missing))
+        return answer
+
+    def _draw(self, prompt: str) -> random.Random:
+        # Keyed on the digest, so a long benchmark run doesn't hold every prompt
+        digest = _digest(prompt)
+        with self._lock:
+            self._seen[digest] += 1
+            occurrence = self._seen[digest]
+        return random.Random(f"{self.seed}:{occurrence}:{digest}")
+
+    def _plan(self, prompt: str):
+        """(first chunk delay, chunks) for one call; raises for injected errors."""
+        rng = self._draw(prompt)
+        if self.error_rate and rng.random() < self.error_rate:
+            raise FakeProviderError("Injected fake provider error")
+        delay = self.latency_median
+        if self.latency_sigma:
+            delay *= rng.lognormvariate(0, self.latency_sigma)
+        return delay, self._chunks(self.answer(prompt))
+
+    def _chunks(self, text: str) -> List[str]:
+        words = text.split(' ')
+        size = self.words_per_chunk
+        return [
+            ' '.join(words[i:i + size]) + (' ' if i + size < len(words) else '')
+            for i in range(0, len(words), size)
+        ]
+
+    def generate(self, prompt: str) -> str:
+        delay, chunks = self._plan(prompt)
+        time.sleep(delay + self.chunk_delay * (len(chunks) - 1))
+        return ''.join(chunks)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        delay, chunks = self._plan(prompt)
+        time.sleep(delay)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(self.chunk_delay)
+            yield chunk
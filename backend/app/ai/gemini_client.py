@@ -1,8 +1,89 @@
 """Google Gemini client wrapper."""
 import google.generativeai as genai
 from flask import current_app
-from typing import Dict, Any, List
+from app.ai.chat_context import ChatContext
+from app.ai.chat_sessions import CHAT_FOLLOWUP_ROWS, ChatSession, load_session, save_session, session_key
+from app.ai.llm_executor import llm_executor
+from app.ai.prompt_budget import PromptBudget
+from app.ai.providers import LLMProvider, create_provider, provider_requires_api_key
+from app.ai.retrieval import CHAT_CONTEXT_ROWS
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+import json
 import os
+import tempfile
+import threading
+import time
+
+DEFAULT_GEMINI_MODEL = 'gemini-1.5-flash'
+GEMINI_MODEL_CACHE_FILE = os.getenv(
+    'GEMINI_MODEL_CACHE_FILE', os.path.join(tempfile.gettempdir(), 'gemini_model.json')
+)
+GEMINI_MODEL_CACHE_TTL = int(os.getenv('GEMINI_MODEL_CACHE_TTL', 86400))
+
+
+def _configured_model() -> Optional[str]:
+    """Model pinned by config (GEMINI_MODEL); skips discovery entirely."""
+    try:
+        model = current_app.config.get('GEMINI_MODEL')
+    except RuntimeError:
+        model = None
+    return model or os.getenv('GEMINI_MODEL') or None
+
+
+def _read_cached_model() -> Optional[str]:
+    """Model name persisted by an earlier discovery, if still fresh."""
+    try:
+        with open(GEMINI_MODEL_CACHE_FILE, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get('resolved_at', 0) > GEMINI_MODEL_CACHE_TTL:
+        return None
+    return entry.get('model')
+
+
+def _write_cached_model(model_name: str):
+    try:
+        directory = os.path.dirname(GEMINI_MODEL_CACHE_FILE) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'model': model_name, 'resolved_at': time.time()}, f)
+        os.replace(tmp_path, GEMINI_MODEL_CACHE_FILE)
+    except OSError as e:
+        print(f"[GeminiClient] Could not persist model choice: {e}")
+
+
+def discover_model() -> str:
+    """List models and pick the first that supports generateContent (one API call)."""
+    try:
+        candidates = [
+            model.name for model in genai.list_models()
+            if 'generateContent' in model.supported_generation_methods
+        ]
+    except Exception as e:
+        print(f"[GeminiClient] Error listing models: {type(e).__name__}: {e}")
+        return DEFAULT_GEMINI_MODEL
+    if not candidates:
+        print(f"[GeminiClient] No suitable model found, using {DEFAULT_GEMINI_MODEL}")
+        return DEFAULT_GEMINI_MODEL
+    print(f"[GeminiClient] Discovered {len(candidates)} generateContent models, using {candidates[0]}")
+    _write_cached_model(candidates[0])
+    return candidates[0]
+
+
+def _configured_provider() -> str:
+    """LLM_PROVIDER: 'gemini' (default), 'fake' (offline) or a registered provider (app.ai.providers)."""
+    try:
+        provider = current_app.config.get('LLM_PROVIDER')
+    except RuntimeError:
+        provider = None
+    return (provider or os.getenv('LLM_PROVIDER') or 'gemini').lower()
+
+
+def resolve_model_name() -> str:
+    """Config override, then the persisted discovery result, then a fresh discovery."""
+    return _configured_model() or _read_cached_model() or discover_model()
 
 
 class GeminiClient:
@@ -28,7 +109,8 @@ class GeminiClient:
         print(f"[GeminiClient] Initializing with API key: {'SET' if self.api_key else 'NOT SET'}")
         print(f"[GeminiClient] API key length: {len(self.api_key) if self.api_key else 0}")
         
-        if not self.api_key:
+        self.provider_name = _configured_provider()
+        if not self.api_key and provider_requires_api_key(self.provider_name):
             print("[GeminiClient] ERROR: GOOGLE_API_KEY or GOOGLE_GEMINI_API_KEY environment variable not set!")
             raise ValueError("GOOGLE_API_KEY or GOOGLE_GEMINI_API_KEY not configured. Please set one of these environment variables.")
             
@@ -39,56 +121,83 @@ class GeminiClient:
             genai.configure(api_key=self.api_key)
             print("[GeminiClient] Gemini API configured successfully")
         
-        # List available models and use the first one that supports generateContent
-        try:
-            print("[GeminiClient] Attempting to list available models...")
-            available_models = genai.list_models()
-            print("[GeminiClient] Available models:")
-            suitable_model = None
-            for model in available_models:
-                print(f"  - {model.name} (supports: {model.supported_generation_methods})")
-                if 'generateContent' in model.supported_generation_methods and suitable_model is None:
-                    suitable_model = model.name
-            
-            if suitable_model:
-                print(f"[GeminiClient] Using model: {suitable_model}")
-                self.model = genai.GenerativeModel(suitable_model)
-            else:
-                print("[GeminiClient] No suitable model found, trying gemini-1.5-flash")
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
-        except Exception as e:
-            print(f"[GeminiClient] Error listing models: {type(e).__name__}: {e}")
-            print("[GeminiClient] Defaulting to gemini-1.5-flash")
-            try:
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
-            except Exception as e2:
-                print(f"[GeminiClient] Failed to load gemini-1.5-flash: {e2}")
-                print("[GeminiClient] Trying gemini-1.5-pro as last resort")
-                self.model = genai.GenerativeModel('gemini-1.5-pro')
+        # The provider (and Gemini model) is resolved on first use (see resolve_model_name), not here
+        self._provider = None
+        self._model_lock = threading.Lock()
         
-        self.chat_sessions = {}  # Store chat sessions by user ID
+        # Conversations are kept in app.ai.chat_sessions (bounded, optionally in Redis)
     
-    def chat_with_data(self, user_id: str, message: str, data_context: Dict[str, Any], conversation_history: List[Dict] = None, data_type: str = 'leads') -> Dict[str, Any]:
-        """Chat with AI about the provided data."""
-        try:
-            print(f"[chat_with_data] Starting chat for user {user_id}, data_type={data_type}")
-            print(f"[chat_with_data] API key configured: {bool(self.api_key)}")
-            
-            # Build context based on data type
-            if data_type == 'customers':
-                all_customers = data_context.get('all_customers', [])
-                print(f"[chat_with_data] Including {len(all_customers)} customers in context")
-                
-                # Build a structured table of customers
-                customers_table = "COMPANY | EMAIL | PLAN | MRR | HEALTH_SCORE | STATUS | CHURN_RISK | EXPANSION\n"
-                customers_table += "-" * 90 + "\n"
-                for customer in all_customers:
-                    customers_table += f"{customer.get('company')} | {customer.get('email')} | {customer.get('plan')} | ${customer.get('mrr', 0):,.2f} | {customer.get('health_score', 0)}/100 | {customer.get('health_status')} | {customer.get('churn_risk_level')} | {'Yes' if customer.get('expansion_opportunity') else 'No'}\n"
-                
-                context = f"""CRITICAL INSTRUCTION: You are analyzing a specific company's customer health data. You MUST answer questions using ONLY the exact customer data provided in the table below. DO NOT provide general customer success advice.
+    @property
+    def model_name(self) -> str:
+        """Resolved model name (resolution happens once per client)."""
+        return self.provider.model_name
+    
+    @property
+    def provider(self) -> LLMProvider:
+        """LLMProvider for LLM_PROVIDER (GeminiProvider on the resolved model by default)."""
+        self._ensure_model()
+        return self._provider
+    
+    def _ensure_model(self):
+        if self._provider is not None:
+            return
+        with self._model_lock:
+            if self._provider is None:
+                self._provider = create_provider(self.provider_name)
+                print(f"[GeminiClient] Using {self.provider_name} model: {self._provider.model_name}")
+    
+    def build_chat_prompt(self, message: str, data_context, data_type: str = 'leads',
+                          session: Optional[ChatSession] = None) -> Tuple[str, Dict]:
+        """
+        Full prompt for a data chat message, and the row selection it used.
+        
+        data_context is a ChatContext (cached per org, see app.ai.chat_context)
+        or a plain dict of summary figures plus the all_<data_type> rows. Only
+        the rows most relevant to the message go into the prompt. With an
+        ongoing session, a follow-up retrieves fewer new rows, repeats the rows
+        of the previous turn, and adds the summarized conversation. A prompt
+        over LLM_PROMPT_TOKEN_BUDGET lists a stratified sample of those rows
+        instead (selection['budget'] records the cut).
+        """
+        if not isinstance(data_context, ChatContext):
+            data_context = ChatContext(data_type, data_context)
+        carried = session.carried_rows() if session else []
+        k = CHAT_FOLLOWUP_ROWS if carried else CHAT_CONTEXT_ROWS
+        table, selection = data_context.render_table(message, k, carried)
+        
+        conversation = session.render() if session else ''
+        
+        def compose(table: str) -> str:
+            context = self._chat_instructions(data_type, table, data_context)
+            if conversation:
+                context += f"\n\n{conversation}\nUse the conversation only to resolve references like \"them\" or \"the second one\"; facts must still come from the table."
+            # ALWAYS include the data context with every message to ensure AI uses the data
+            return f"{context}\n\nUser Question: {message}"
+        
+        prompt = compose(table)
+        budget = PromptBudget(f"chat:{data_type}")
+        if not budget.fits(prompt):
+            # Over budget: a stratified sample of the rows plus group totals over all of them
+            # (re-estimated from the sampled table until the sampling note fits too)
+            max_rows, extra = len(selection['rows']), data_context.strata_summary()
+            while not budget.fits(prompt) and max_rows > 0:
+                max_rows = min(max_rows - 1, budget.rows_that_fit(prompt, table, max_rows, extra))
+                table, selection = data_context.render_table(message, k, carried, max_rows=max_rows)
+                prompt, extra = compose(table), ''
+            if 'budget_dropped' in selection:
+                budget.drop('rows', **selection['budget_dropped'])
+        selection['budget'] = budget.report(prompt)
+        print(f"[build_chat_prompt] Including {len(selection['rows'])} of {selection['total_rows']} {data_type} in context")
+        return prompt, selection
+    
+    def _chat_instructions(self, data_type: str, table: str, data_context) -> str:
+        """Data chat instructions, the prompt table and summary figures for data_type."""
+        # Build context based on data type
+        if data_type == 'customers':
+            context = f"""CRITICAL INSTRUCTION: You are analyzing a specific company's customer health data. You MUST answer questions using ONLY the exact customer data provided in the table below. DO NOT provide general customer success advice.
 
 DATABASE OF CUSTOMERS:
-{customers_table}
+{table}
 
 SUMMARY:
 - Total Customers: {data_context.get('total_customers', 0)}
@@ -112,21 +221,12 @@ GOOD Answer: "Based on your data, Acme Corp (acme@example.com) has a health scor
 BAD Answer: "To prevent churn, you should focus on improving customer engagement and conducting regular check-ins."
 
 Now answer the user's question using ONLY the customers in the table."""
-            
-            elif data_type == 'campaigns':
-                all_campaigns = data_context.get('all_campaigns', [])
-                print(f"[chat_with_data] Including {len(all_campaigns)} campaigns in context")
-                
-                # Build a structured table of campaigns
-                campaigns_table = "CAMPAIGN_NAME | CHANNEL | PERIOD | SPEND | REVENUE | ROI | PERFORMANCE\n"
-                campaigns_table += "-" * 80 + "\n"
-                for campaign in all_campaigns:
-                    campaigns_table += f"{campaign.get('name')} | {campaign.get('channel')} | {campaign.get('period')} | ${campaign.get('spend', 0):,.2f} | ${campaign.get('revenue', 0):,.2f} | {campaign.get('roi_percentage', '0%')} | {campaign.get('performance', 'unknown')}\n"
-                
-                context = f"""CRITICAL INSTRUCTION: You are analyzing a specific company's marketing campaigns. You MUST answer questions using ONLY the exact campaign data provided in the table below. DO NOT provide general marketing advice.
+        
+        elif data_type == 'campaigns':
+            context = f"""CRITICAL INSTRUCTION: You are analyzing a specific company's marketing campaigns. You MUST answer questions using ONLY the exact campaign data provided in the table below. DO NOT provide general marketing advice.
 
 DATABASE OF CAMPAIGNS:
-{campaigns_table}
+{table}
 
 SUMMARY:
 - Total Campaigns: {data_context.get('total_campaigns', 0)}
@@ -148,21 +248,12 @@ GOOD Answer: "Based on your data, Summer Sale Email has 933.0% ROI with $3,100 r
 BAD Answer: "To improve ROI, you should focus on email marketing and optimize your campaigns."
 
 Now answer the user's question using ONLY the campaigns in the table."""
-            
-            else:  # leads
-                all_leads = data_context.get('all_leads', [])
-                print(f"[chat_with_data] Including {len(all_leads)} leads in context")
-                
-                # Build a structured table of leads
-                leads_table = "LEAD_NAME | EMAIL | COMPANY | SCORE | TEMPERATURE | SOURCE | STATUS\n"
-                leads_table += "-" * 80 + "\n"
-                for lead in all_leads:
-                    leads_table += f"{lead.get('name')} | {lead.get('email')} | {lead.get('company')} | {lead.get('score')} | {lead.get('temperature')} | {lead.get('source')} | {lead.get('status')}\n"
-                
-                context = f"""CRITICAL INSTRUCTION: You are analyzing a specific company's leads database. You MUST answer questions using ONLY the exact lead data provided in the table below. DO NOT provide general sales advice.
+        
+        else:  # leads
+            context = f"""CRITICAL INSTRUCTION: You are analyzing a specific company's leads database. You MUST answer questions using ONLY the exact lead data provided in the table below. DO NOT provide general sales advice.
 
 DATABASE OF LEADS:
-{leads_table}
+{table}
 
 SUMMARY:
 - Total Leads: {data_context.get('total_leads', 0)}
@@ -186,25 +277,38 @@ GOOD Answer: "Your top leads are John Smith (john@example.com) with a score of 9
 BAD Answer: "You should prioritize leads with high engagement scores and focus on warm leads first."
 
 Now answer the user's question using ONLY the leads in the table."""
+        
+        return context
+    
+    def chat_with_data(self, user_id: str, message: str, data_context, conversation_history: List[Dict] = None,
+                       data_type: str = 'leads', organization_id: str = None) -> Dict[str, Any]:
+        """
+        Chat with AI about the provided data.
+        
+        See build_chat_prompt for what data_context may be. conversation_history
+        is the client's message list; the conversation itself is kept per
+        (organization, user, data type) in app.ai.chat_sessions.
+        """
+        try:
+            print(f"[chat_with_data] Starting chat for user {user_id}, data_type={data_type}")
+            print(f"[chat_with_data] API key configured: {bool(self.api_key)}")
             
-            # Always start fresh session to ensure context is always included
-            session_key = f"{user_id}_{data_type}"
-            print(f"[chat_with_data] Creating fresh chat session with context for {session_key}")
-            
-            # ALWAYS include full context with every message to ensure AI uses the data
-            full_message = f"{context}\n\nUser Question: {message}"
-            print(f"[chat_with_data] Including full data context with message")
+            session = load_session(session_key(organization_id, user_id, data_type), conversation_history, message)
+            full_message, selection = self.build_chat_prompt(message, data_context, data_type, session)
             
             print(f"[chat_with_data] Sending message to Gemini...")
             # Reconfigure API key before each call to ensure it's set
-            genai.configure(api_key=self.api_key)
+            if self.api_key:
+                genai.configure(api_key=self.api_key)
             # Use generate_content directly instead of chat to avoid authentication issues
-            response = self.model.generate_content(full_message)
-            print(f"[chat_with_data] Got response: {response.text[:100]}...")
+            response_text = llm_executor.call(lambda: self.provider.generate(full_message), 'chat')
+            print(f"[chat_with_data] Got response: {response_text[:100]}...")
+            session.record(message, response_text, selection['row_ids'])
+            save_session(session)
             
             return {
                 'success': True,
-                'response': response.text,
+                'response': response_text,
                 'conversation_id': user_id
             }
             
@@ -219,6 +323,39 @@ Now answer the user's question using ONLY the leads in the table."""
                 'response': f"I'm having trouble analyzing the data right now. Error details: {error_details}"
             }
     
+    def stream_chat_with_data(self, user_id: str, message: str, data_context, conversation_history: List[Dict] = None,
+                              data_type: str = 'leads', organization_id: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streamed variant of chat_with_data.
+        
+        The prompt is built before the first yield, so errors in it surface to
+        the caller. Yields {'type': 'chunk', 'text'} events as the model
+        generates, then {'type': 'done', 'response'} with the full text, or
+        {'type': 'error', 'error'} if generation fails part way.
+        """
+        session = load_session(session_key(organization_id, user_id, data_type), conversation_history, message)
+        full_message, selection = self.build_chat_prompt(message, data_context, data_type, session)
+        print(f"[stream_chat_with_data] Streaming {data_type} answer for user {user_id}")
+        
+        def _events():
+            parts = []
+            try:
+                if self.api_key:
+                    genai.configure(api_key=self.api_key)
+                for text in llm_executor.stream(lambda: self.provider.stream(full_message), 'chat_stream'):
+                    if text:
+                        parts.append(text)
+                        yield {'type': 'chunk', 'text': text}
+            except Exception as e:
+                print(f"[stream_chat_with_data] ERROR: {type(e).__name__}: {e}")
+                yield {'type': 'error', 'error': f"{type(e).__name__}: {str(e)}", 'response': ''.join(parts)}
+                return
+            session.record(message, ''.join(parts), selection['row_ids'])
+            save_session(session)
+            yield {'type': 'done', 'response': ''.join(parts), 'conversation_id': user_id}
+        
+        return _events()
+    
     def predict_churn(self, customer_data: Dict[str, Any]) -> Dict[str, Any]:
         """Predict customer churn probability."""
         prompt = f"""
@@ -240,10 +377,9 @@ Now answer the user's question using ONLY the leads in the table."""
         """
         
         try:
-            response = self.model.generate_content(prompt)
             return {
                 'success': True,
-                'result': response.text
+                'result': llm_executor.call(lambda: self.provider.generate(prompt), 'predict_churn')
             }
         
         except Exception as e:
@@ -273,25 +409,34 @@ Now answer the user's question using ONLY the leads in the table."""
         """
         
         try:
-            response = self.model.generate_content(prompt)
             return {
                 'success': True,
-                'result': response.text
+                'result': llm_executor.call(lambda: self.provider.generate(prompt), 'match_talent_to_job')
             }
         
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e)
-            }    
-    def generate_text(self, prompt: str) -> str:
-        """Generate text response from a prompt."""
-        if not self.api_key:
+            }
+    
+    def generate_text(self, prompt: str, cache: bool = False) -> str:
+        """
+        Generate text response from a prompt.
+        
+        cache=True serves repeats of the exact prompt (for this model) from
+        insight_cache instead of calling Gemini again; use it for prompts built
+        only from aggregate stats, like the analyze_* insight endpoints.
+        """
+        if not self.api_key and provider_requires_api_key(self.provider_name):
             raise ValueError("GOOGLE_GEMINI_API_KEY not configured")
         
+        if cache:
+            from app.ai.insight_cache import insight_cache
+            return insight_cache.get_or_compute(prompt, self.model_name, lambda: self.generate_text(prompt))
+        
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return llm_executor.call(lambda: self.provider.generate(prompt), 'generate_text')
         except Exception as e:
             print(f"Gemini API error: {e}")
             raise
@@ -299,18 +444,33 @@ Now answer the user's question using ONLY the leads in the table."""
 
 # Create singleton instance
 gemini_client = None
+_client_lock = threading.Lock()
 
 def get_gemini_client():
     """Get or create Gemini client instance."""
     global gemini_client
     if gemini_client is None:
-        try:
-            print("[get_gemini_client] Creating new GeminiClient instance...")
-            gemini_client = GeminiClient()
-            print("[get_gemini_client] GeminiClient instance created successfully")
-        except Exception as e:
-            print(f"[get_gemini_client] Failed to create GeminiClient: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            raise
-    return gemini_client
\ No newline at end of file
+        with _client_lock:
+            if gemini_client is None:
+                try:
+                    print("[get_gemini_client] Creating new GeminiClient instance...")
+                    gemini_client = GeminiClient()
+                    print("[get_gemini_client] GeminiClient instance created successfully")
+                except Exception as e:
+                    print(f"[get_gemini_client] Failed to create GeminiClient: {str(e)}")
+                    import traceback
+                    traceback.print_exc()
+                    raise
+    return gemini_client
+
+
+def prewarm_gemini_client(app):
+    """Create the client and resolve its model in a background thread (GEMINI_PREWARM=true)."""
+    def _warm():
+        with app.app_context():
+            try:
+                get_gemini_client()._ensure_model()
+            except Exception as e:
+                print(f"[prewarm_gemini_client] Skipped: {e}")
+    
+    threading.Thread(target=_warm, name='gemini-prewarm', daemon=True).start()
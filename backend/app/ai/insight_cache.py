@@ -0,0 +1,191 @@
+"""Content-addressed cache for AI insight responses.
+
+Entries are keyed on sha256(model name + exact prompt), so a response is reused
+only while the aggregated stats in the prompt are unchanged and the same model
+would answer. Two tiers:
+
+- memory: per-worker TTL/LRU (app.utils.ttl_cache.TTLCache)
+- disk: one JSON file per key under AI_CACHE_DIR, shared by every worker on the
+  host and kept across restarts; least recently read files are pruned past
+  AI_CACHE_MAX_FILES
+
+Only successful responses are stored. Disk errors are logged and treated as
+misses, so the cache can never fail an insight request.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.utils.ttl_cache import TTLCache
+
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 3600))
+AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', 512))
+AI_CACHE_DIR = os.getenv('AI_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ai_insight_cache'))
+AI_CACHE_MAX_FILES = int(os.getenv('AI_CACHE_MAX_FILES', 5000))
+_PRUNE_EVERY_WRITES = 100
+
+
+class InsightCache:
+    """Two-tier (memory + disk) TTL cache for prompt -> response text."""
+
+    def __init__(self, maxsize: int = AI_CACHE_SIZE, ttl: float = AI_CACHE_TTL,
+                 directory: Optional[str] = AI_CACHE_DIR, max_files: int = AI_CACHE_MAX_FILES):
+        self.ttl = ttl
+        self.directory = directory or None  # AI_CACHE_DIR='' disables the disk tier
+        self.max_files = max_files
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = {}  # key -> Event, so concurrent misses call the model once
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def make_key(prompt: str, model_name: str) -> str:
+        """Content address of a prompt for a given model."""
+        return hashlib.sha256(f"{model_name}\n{prompt}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str):
+        """(value, expires_at) from the disk tier, or (None, 0)."""
+        if not self.directory:
+            return None, 0
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None, 0
+        except (OSError, ValueError) as e:
+            print(f"[InsightCache] Unreadable entry {key[:12]}: {e}")
+            return None, 0
+
+        if entry.get('expires_at', 0) <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None, 0
+        try:
+            os.utime(path)  # mtime = last read, for LRU pruning
+        except OSError:
+            pass
+        return entry.get('value'), entry['expires_at']
+
+    def _write_disk(self, key: str, value: str, ttl: float):
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so other workers never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': time.time() + ttl, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[InsightCache] Failed to write entry {key[:12]}: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY_WRITES == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop expired-by-age and least recently read files beyond max_files."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        files.sort()
+        cutoff = time.time() - self.ttl
+        doomed = [path for mtime, path in files[:max(len(files) - self.max_files, 0)]]
+        doomed += [path for mtime, path in files[len(doomed):] if mtime < cutoff]
+        removed = 0
+        for path in doomed:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            print(f"[InsightCache] Pruned {removed} disk entries")
+        return removed
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for a key, checking memory then disk."""
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        value, expires_at = self._read_disk(key)
+        if value is not None:
+            self.disk_hits += 1
+            self._memory.set(key, value, ttl=expires_at - time.time())
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """Store a response in both tiers."""
+        ttl = self.ttl if ttl is None else ttl
+        self._memory.set(key, value, ttl=ttl)
+        self._write_disk(key, value, ttl)
+
+    def get_or_compute(self, prompt: str, model_name: str, compute: Callable[[], str]) -> str:
+        """Return the cached response for prompt, or call compute() once and cache it."""
+        key = self.make_key(prompt, model_name)
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self._lock:
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._inflight[key] = threading.Event()
+                    break
+            # Another request is already asking the model for this prompt
+            waiter.wait(timeout=120)
+            if self._memory.contains(key):
+                continue
+            # The other call failed; compute ourselves rather than wait again
+            with self._lock:
+                if key not in self._inflight:
+                    self._inflight[key] = threading.Event()
+                    break
+
+        try:
+            value = compute()
+            if value:
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def clear(self):
+        """Drop both tiers."""
+        self._memory.clear()
+        if self.directory and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> Dict:
+        """Memory hit/miss counters plus disk hits, for monitoring."""
+        stats = self._memory.stats()
+        stats['disk_hits'] = self.disk_hits
+        stats['disk_dir'] = self.directory
+        return stats
+
+
+insight_cache = InsightCache()
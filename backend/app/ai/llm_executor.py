@@ -0,0 +1,315 @@
+"""Bounded executor for LLM provider calls.
+
+Every model call runs on a shared thread pool instead of the request thread,
+so the request can give up at a deadline while the provider is slow:
+
+- deadline: call() raises LLMTimeout after LLM_TIMEOUT seconds (waiting for a
+  slot included); streams time out when no chunk arrives for that long
+- in-flight limit: at most LLM_MAX_IN_FLIGHT provider calls per worker. A slot
+  is released when the provider call actually returns, so abandoned calls still
+  count and a hung provider cannot pile up threads
+- hedging: an idempotent call still running after the recent p95 latency for
+  its kind gets one duplicate request; the first answer wins
+- circuit breaker: after LLM_BREAKER_FAILURES consecutive failures calls fail
+  fast with LLMCircuitOpen for LLM_BREAKER_COOLDOWN seconds, then one probe call
+  decides whether to close it again. Callers with a rule-based fallback (the
+  analyze_* insight methods) use it immediately instead of waiting on Gemini
+
+Per-kind latency percentiles and counters are exposed by stats()
+(GET /api/debug/llm-stats).
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 30))  # seconds
+LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', 8))
+LLM_HEDGE = os.getenv('LLM_HEDGE', 'true').lower() == 'true'
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', 5))
+LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', 30))  # seconds
+_LATENCY_WINDOW = 1000
+
+_STREAM_END = object()
+
+
+class LLMUnavailable(RuntimeError):
+    """The provider was not asked or did not answer in time."""
+
+
+class LLMTimeout(LLMUnavailable):
+    """The call missed its deadline."""
+
+
+class LLMOverloaded(LLMUnavailable):
+    """No in-flight slot freed up before the deadline."""
+
+
+class LLMCircuitOpen(LLMUnavailable):
+    """The provider is failing; calls are short-circuited until the cooldown ends."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half_open (one probe) -> closed."""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened_count = 0
+        self._probe_started = None  # monotonic time of the half-open probe in progress
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+            # A probe that never reported back (e.g. an abandoned stream) expires
+            if self.state == 'half_open' and (
+                self._probe_started is None or time.monotonic() - self._probe_started >= self.cooldown
+            ):
+                self._probe_started = time.monotonic()
+                return True
+            return False
+
+    def cancel_probe(self):
+        """The allowed call never reached the provider; let another one probe."""
+        with self._lock:
+            self._probe_started = None
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print("[LLMExecutor] Circuit closed, provider recovered")
+            self.state = 'closed'
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_started = None
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.opened_count += 1
+                print(f"[LLMExecutor] Circuit open after {self.failures} failures, failing fast for {self.cooldown:g}s")
+
+
+class _CallStats:
+    """Counters and a window of recent latencies for one kind of call."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=_LATENCY_WINDOW)
+        self.counts = dict.fromkeys(
+            ('calls', 'succeeded', 'failed', 'timeouts', 'overloaded', 'short_circuited', 'hedged', 'hedge_wins'), 0
+        )
+
+    def quantile(self, q: float):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def snapshot(self) -> Dict:
+        return {
+            **self.counts,
+            'p50_ms': _ms(self.quantile(0.5)),
+            'p95_ms': _ms(self.quantile(0.95)),
+            'p99_ms': _ms(self.quantile(0.99)),
+            'samples': len(self.latencies)
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class LLMExecutor:
+    """Shared pool running provider calls with a deadline, slot limit, hedging and breaker."""
+
+    def __init__(self, max_in_flight: int = LLM_MAX_IN_FLIGHT, timeout: float = LLM_TIMEOUT,
+                 hedge: bool = LLM_HEDGE, breaker: CircuitBreaker = None):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='llm')
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _kind(self, name: str) -> _CallStats:
+        with self._lock:
+            return self._stats.setdefault(name, _CallStats())
+
+    def _count(self, stats: _CallStats, counter: str):
+        with self._lock:
+            stats.counts[counter] += 1
+
+    def _submit(self, fn: Callable, wait_seconds: float):
+        """Run fn on the pool once a slot frees up (None if none did in time)."""
+        if not self._slots.acquire(timeout=max(wait_seconds, 0)):
+            return None
+        with self._lock:
+            self._in_flight += 1
+        future = self._pool.submit(fn)
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _admit(self, stats: _CallStats):
+        self._count(stats, 'calls')
+        if not self.breaker.allow():
+            self._count(stats, 'short_circuited')
+            raise LLMCircuitOpen("LLM provider unavailable (circuit open)")
+
+    def _fail(self, stats: _CallStats, counter: str):
+        self._count(stats, counter)
+        self.breaker.record_failure()
+
+    def call(self, fn: Callable[[], Any], name: str = 'call', timeout: float = None, hedge: bool = None) -> Any:
+        """
+        fn() on the pool, within timeout seconds.
+
+        hedge (default: LLM_HEDGE) must only be set for idempotent calls: fn may
+        run twice. Raises LLMUnavailable subclasses, or whatever fn raised.
+        """
+        stats = self._kind(name)
+        self._admit(stats)
+        timeout = self.timeout if timeout is None else timeout
+        hedge = self.hedge if hedge is None else hedge
+        started = time.monotonic()
+        deadline = started + timeout
+
+        primary = self._submit(fn, timeout)
+        if primary is None:
+            self._count(stats, 'overloaded')
+            self.breaker.cancel_probe()
+            raise LLMOverloaded(f"No LLM slot free within {timeout:g}s ({self.max_in_flight} calls in flight)")
+        futures = [primary]
+
+        hedge_after = stats.quantile(0.95) if hedge and len(stats.latencies) >= LLM_HEDGE_MIN_SAMPLES else None
+        if hedge_after is not None and started + hedge_after < deadline:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                # Only hedge with a spare slot; never queue behind other requests for it
+                backup = self._submit(fn, 0)
+                if backup is not None:
+                    self._count(stats, 'hedged')
+                    futures.append(backup)
+
+        while futures:
+            done, _ = wait(futures, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                self._fail(stats, 'timeouts')
+                print(f"[LLMExecutor] {name} timed out after {timeout:g}s")
+                raise LLMTimeout(f"LLM call '{name}' timed out after {timeout:g}s")
+            future = done.pop()
+            futures.remove(future)
+            if future.exception() is not None and futures:
+                continue  # the other request may still answer
+            try:
+                result = future.result()
+            except Exception:
+                self._fail(stats, 'failed')
+                raise
+            if future is not primary:
+                self._count(stats, 'hedge_wins')
+            self._record(stats, time.monotonic() - started)
+            return result
+
+    def _record(self, stats: _CallStats, elapsed: float):
+        with self._lock:
+            stats.counts['succeeded'] += 1
+            stats.latencies.append(elapsed)
+        self.breaker.record_success()
+
+    def stream(self, open_stream: Callable[[], Iterable], name: str = 'stream', timeout: float = None) -> Iterator:
+        """
+        Items of open_stream(), pumped on the pool.
+
+        Raises LLMTimeout when no item arrives within timeout seconds. Latency
+        recorded is time to the first item.
+        """
+        stats = self._kind(name)
+        self._admit(stats)
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        items = queue.Queue()
+        cancelled = threading.Event()
+
+        def _pump():
+            try:
+                for item in open_stream():
+                    if cancelled.is_set():
+                        return
+                    items.put(item)
+                items.put(_STREAM_END)
+            except Exception as e:
+                items.put(e)
+
+        if self._submit(_pump, timeout) is None:
+            self._count(stats, 'overloaded')
+            self.breaker.cancel_probe()
+            raise LLMOverloaded(f"No LLM slot free within {timeout:g}s ({self.max_in_flight} calls in flight)")
+
+        def _items():
+            first = True
+            try:
+                while True:
+                    try:
+                        item = items.get(timeout=timeout)
+                    except queue.Empty:
+                        self._fail(stats, 'timeouts')
+                        raise LLMTimeout(f"LLM stream '{name}' stalled for {timeout:g}s")
+                    if item is _STREAM_END:
+                        if first:
+                            self._record(stats, time.monotonic() - started)
+                        return
+                    if isinstance(item, Exception):
+                        self._fail(stats, 'failed')
+                        raise item
+                    if first:
+                        first = False
+                        self._record(stats, time.monotonic() - started)
+                    yield item
+            finally:
+                # Client went away or we timed out: stop pulling from the provider
+                cancelled.set()
+
+        return _items()
+
+    def stats(self) -> Dict:
+        """Per-kind counters and latency percentiles, plus breaker and slot state."""
+        with self._lock:
+            calls = {name: stats.snapshot() for name, stats in self._stats.items()}
+            in_flight = self._in_flight
+        return {
+            'calls': calls,
+            'in_flight': in_flight,
+            'max_in_flight': self.max_in_flight,
+            'timeout_s': self.timeout,
+            'circuit': {
+                'state': self.breaker.state,
+                'consecutive_failures': self.breaker.failures,
+                'times_opened': self.breaker.opened_count
+            }
+        }
+
+
+llm_executor = LLMExecutor()
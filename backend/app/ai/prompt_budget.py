@@ -0,0 +1,157 @@
+"""Prompt token budgets.
+
+Prompts are measured before they are sent. Token counts are estimated from
+the UTF-8 size (about CHARS_PER_TOKEN bytes per token for Gemini on English
+and tabular text), so no count_tokens round trip is needed. When a prompt is
+over LLM_PROMPT_TOKEN_BUDGET, the caller shrinks what scales with the data:
+
+- data chat tables keep a stratified sample of their rows (by temperature,
+  health status or performance band; see ChatContext.render_table) plus group
+  totals over every row
+- analyze_* breakdowns keep their largest categories and fold the rest into
+  one "other" entry
+
+Every cut is logged and kept in a short in-memory history for
+GET /api/debug/llm-stats.
+"""
+import math
+import os
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Sequence
+
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv('LLM_PROMPT_TOKEN_BUDGET', 8000))
+CHARS_PER_TOKEN = 4
+_RECENT_TRIMS = 50
+
+_trims = deque(maxlen=_RECENT_TRIMS)
+_trim_lock = threading.Lock()
+_trim_count = 0
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text (rounded up)."""
+    return -(-len(text.encode('utf-8')) // CHARS_PER_TOKEN)
+
+
+class PromptBudget:
+    """Token allowance for one prompt and a record of what was cut to meet it."""
+
+    def __init__(self, name: str, budget: int = LLM_PROMPT_TOKEN_BUDGET):
+        self.name = name
+        self.budget = budget
+        self.dropped = []
+
+    def fits(self, prompt: str) -> bool:
+        return estimate_tokens(prompt) <= self.budget
+
+    def rows_that_fit(self, prompt: str, table: str, rows: int, extra: str = '') -> int:
+        """How many of a table's rows fit once everything else in the prompt (plus extra) is paid for."""
+        table_tokens = estimate_tokens(table)
+        spare = self.budget - (estimate_tokens(prompt) - table_tokens) - estimate_tokens(extra)
+        per_row = table_tokens / max(rows, 1)
+        return max(int(spare // per_row), 0) if per_row else rows
+
+    def drop(self, what: str, **details):
+        """Record one cut made to fit the budget."""
+        self.dropped.append({'what': what, **details})
+
+    def report(self, prompt: str) -> Dict:
+        """Final size and cuts; prompts that needed cuts are also logged and kept for stats()."""
+        report = {
+            'budget_tokens': self.budget,
+            'estimated_tokens': estimate_tokens(prompt),
+            'dropped': self.dropped
+        }
+        if self.dropped:
+            global _trim_count
+            with _trim_lock:
+                _trim_count += 1
+                _trims.append({'prompt': self.name, **report})
+            print(f"[PromptBudget] {self.name}: trimmed to ~{report['estimated_tokens']} tokens "
+                  f"(budget {self.budget}): {self.dropped}")
+        return report
+
+
+def stratified_sample(labels: Sequence, k: int) -> List[int]:
+    """
+    Positions of k items spread across the label groups (proportional, largest remainder).
+
+    Every group gets at least one item while k allows. labels are in
+    preference order; each group keeps its first items and the result keeps
+    the original order.
+    """
+    if k >= len(labels):
+        return list(range(len(labels)))
+    if k <= 0:
+        return []
+
+    groups = {}
+    for position, label in enumerate(labels):
+        groups.setdefault(label, []).append(position)
+
+    if k <= len(groups):
+        # Not enough room for every group: one each from the largest groups
+        largest = sorted(groups.values(), key=len, reverse=True)[:k]
+        return sorted(group[0] for group in largest)
+
+    # One per group, then the rest proportionally to group size
+    rest = k - len(groups)
+    shares = {label: (len(members) - 1) * rest / (len(labels) - len(groups)) for label, members in groups.items()}
+    quota = {label: 1 + math.floor(share) for label, share in shares.items()}
+    leftover = k - sum(quota.values())
+    for label in sorted(shares, key=lambda label: shares[label] - math.floor(shares[label]), reverse=True)[:leftover]:
+        quota[label] += 1
+    return sorted(position for label, members in groups.items() for position in members[:quota[label]])
+
+
+def top_categories(values: Dict, limit: int, weights: Dict = None,
+                   merge: Callable[[List], object] = None) -> Dict:
+    """
+    The limit heaviest entries of a breakdown, plus one entry for the rest.
+
+    weights ranks the keys (default: the values themselves); merge turns the
+    dropped keys into the "other" value (default: sum of their values).
+    """
+    if len(values) <= limit:
+        return values
+    weights = weights or values
+    ranked = sorted(values, key=lambda key: weights.get(key) or 0, reverse=True)
+    kept, folded = ranked[:limit], ranked[limit:]
+    trimmed = {key: values[key] for key in kept}
+    other = merge(folded) if merge else sum(values[key] for key in folded)
+    if other is not None:
+        trimmed[f"other ({len(folded)} more)"] = other
+    return trimmed
+
+
+def fit_breakdowns(render: Callable[[Dict[str, Dict]], str], breakdowns: Dict[str, Dict],
+                   budget: PromptBudget, weights: Dict[str, Dict] = None,
+                   merges: Dict[str, Callable] = None) -> str:
+    """
+    render(breakdowns) trimmed to the budget.
+
+    Halves the number of categories kept per breakdown until the prompt fits
+    (or one category is left), recording how many were folded.
+    """
+    weights, merges = weights or {}, merges or {}
+    prompt = render(breakdowns)
+    limit = max((len(values) for values in breakdowns.values()), default=0)
+    trimmed = breakdowns
+    while not budget.fits(prompt) and limit > 1:
+        limit //= 2
+        trimmed = {
+            name: top_categories(values, limit, weights.get(name), merges.get(name))
+            for name, values in breakdowns.items()
+        }
+        prompt = render(trimmed)
+    for name, values in breakdowns.items():
+        if trimmed[name] is not values:
+            budget.drop(name, kept=limit, folded=len(values) - limit)
+    return prompt
+
+
+def stats() -> Dict:
+    """How many prompts needed cuts, and the most recent ones."""
+    with _trim_lock:
+        return {'trimmed_prompts': _trim_count, 'recent': list(_trims)}
@@ -0,0 +1,80 @@
+"""LLM provider interface.
+
+GeminiClient builds prompts and talks to an LLMProvider chosen by LLM_PROVIDER:
+
+- gemini: Google Gemini (the default)
+- fake: deterministic offline model (app.ai.fake_model), for local runs,
+  CI and benchmarks
+
+Other backends plug in with register_provider(name, factory).
+"""
+from typing import Callable, Dict, Iterator, Tuple
+
+import google.generativeai as genai
+
+
+class LLMProvider:
+    """A text model: one prompt in, text out (whole or streamed)."""
+
+    model_name = 'unknown'
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Text chunks as they are produced (one chunk unless overridden)."""
+        yield self.generate(prompt)
+
+
+class GeminiProvider(LLMProvider):
+    """genai.GenerativeModel behind the provider interface."""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.model.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+def _gemini_provider() -> GeminiProvider:
+    from app.ai.gemini_client import resolve_model_name
+    return GeminiProvider(resolve_model_name())
+
+
+def _fake_provider() -> LLMProvider:
+    from app.ai.fake_model import FakeProvider
+    return FakeProvider()
+
+
+# name -> (factory, needs GOOGLE_GEMINI_API_KEY)
+_PROVIDERS: Dict[str, Tuple[Callable[[], LLMProvider], bool]] = {
+    'gemini': (_gemini_provider, True),
+    'fake': (_fake_provider, False)
+}
+
+
+def register_provider(name: str, factory: Callable[[], LLMProvider], requires_api_key: bool = False):
+    """Make factory available as LLM_PROVIDER=name."""
+    _PROVIDERS[name.lower()] = (factory, requires_api_key)
+
+
+def _lookup(name: str):
+    entry = _PROVIDERS.get(name.lower())
+    if entry is None:
+        raise ValueError(f"Unknown LLM provider '{name}'. Use one of: {', '.join(sorted(_PROVIDERS))}")
+    return entry
+
+
+def provider_requires_api_key(name: str) -> bool:
+    return _lookup(name)[1]
+
+
+def create_provider(name: str) -> LLMProvider:
+    """Instantiate the provider registered under name."""
+    return _lookup(name)[0]()
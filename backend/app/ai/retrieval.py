@@ -0,0 +1,208 @@
+"""Row retrieval for data chat prompts.
+
+chat_with_data used to paste every lead / customer / campaign into each prompt.
+Instead, rows are ranked against the question and only the top K are sent,
+alongside the summary aggregates that already cover the whole dataset:
+
+1. Structured filters: column values named in the question ("hot leads",
+   "at risk customers", "paid ads campaigns") restrict the candidate rows.
+2. BM25 over the text columns (name, company, email, source, ...) ranks the
+   candidates; rows without a lexical match follow in the data type's default
+   order ("top" / "worst" in the question picks the direction).
+
+Indexes are built once per cached chat context (app.ai.chat_context), so they
+are reused until the organization's data version changes.
+"""
+import math
+import os
+import re
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+CHAT_CONTEXT_ROWS = int(os.getenv('CHAT_CONTEXT_ROWS', 50))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Per data type: columns indexed for BM25, columns usable as filters, the
+# default ranking column (descending) for rows without a lexical match, and the
+# column prompt-budget sampling stratifies on (app.ai.prompt_budget)
+DATA_TYPES = {
+    'leads': {
+        'text_fields': ('name', 'company', 'email', 'source', 'status', 'temperature', 'engagement_level'),
+        'filter_fields': ('temperature', 'status', 'source', 'engagement_level'),
+        'rank_field': 'score',
+        'stratum_field': 'temperature'
+    },
+    'customers': {
+        'text_fields': ('company', 'email', 'plan', 'health_status', 'churn_risk_level'),
+        'filter_fields': ('health_status', 'churn_risk_level', 'plan'),
+        'rank_field': 'health_score',
+        'stratum_field': 'health_status'
+    },
+    'campaigns': {
+        'text_fields': ('name', 'channel', 'period', 'performance'),
+        'filter_fields': ('channel', 'performance'),
+        'rank_field': 'roi',
+        'stratum_field': 'performance'
+    }
+}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_ASCENDING_WORDS = {'worst', 'lowest', 'bottom', 'least', 'weakest', 'poorest'}
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'for', 'from', 'how', 'i', 'in', 'is', 'me', 'my',
+    'of', 'on', 'or', 'our', 'show', 'tell', 'the', 'to', 'what', 'which', 'who',
+    'with', 'list', 'give', 'about', 'do', 'we', 'have', 'any', 'all'
+}
+
+def tokenize(text) -> List[str]:
+    """Lowercase alphanumeric tokens (emails split into their parts)."""
+    if text is None:
+        return []
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def _value_phrase(value) -> str:
+    """Column value as it would be written in a question ("at_risk" -> "at risk")."""
+    return ' '.join(tokenize(value))
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of rows.
+
+    Postings are built columnar: every (token, row) occurrence becomes one
+    integer key, np.unique counts term frequencies, and each token's postings
+    are a slice of the sorted result.
+    """
+
+    def __init__(self, rows: Sequence[Dict], text_fields: Sequence[str]):
+        self.size = len(rows)
+        documents = [
+            _TOKEN_RE.findall(' '.join(str(row[field]) for field in text_fields if row.get(field) is not None).lower())
+            for row in rows
+        ]
+        lengths = np.fromiter(map(len, documents), dtype=np.int64, count=self.size)
+        tokens = [token for document in documents for token in document]
+
+        self.vocabulary = {token: token_id for token_id, token in enumerate(dict.fromkeys(tokens))}
+        token_ids = np.fromiter(map(self.vocabulary.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+        doc_ids = np.repeat(np.arange(self.size, dtype=np.int64), lengths)
+
+        keys, tfs = np.unique(token_ids * max(self.size, 1) + doc_ids, return_counts=True)
+        self._docs = keys % max(self.size, 1)
+        self._tfs = tfs.astype(np.float64)
+        self._offsets = np.searchsorted(keys // max(self.size, 1), np.arange(len(self.vocabulary) + 1))
+
+        average = lengths.mean() if self.size else 0.0
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (average or 1.0))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for the query (0 = no matching term)."""
+        scores = np.zeros(self.size, dtype=np.float64)
+        for token in set(tokenize(query)) - _STOPWORDS:
+            token_id = self.vocabulary.get(token)
+            if token_id is None:
+                continue
+            start, end = self._offsets[token_id], self._offsets[token_id + 1]
+            ids, tfs = self._docs[start:end], self._tfs[start:end]
+            idf = math.log(1 + (self.size - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tfs * (BM25_K1 + 1) / (tfs + self._norm[ids])
+        return scores
+
+
+class RowIndex:
+    """BM25 index plus per-column value masks for one dataset."""
+
+    def __init__(self, rows: Sequence[Dict], data_type: str):
+        spec = DATA_TYPES[data_type]
+        self.rows = rows
+        self.bm25 = BM25Index(rows, spec['text_fields'])
+        # field -> {phrase: row mask}, longest phrases first so "at risk" wins over "risk"
+        self.filters = {}
+        for field in spec['filter_fields']:
+            column = [row.get(field) for row in rows]
+            codes_by_value = {value: code for code, value in enumerate(dict.fromkeys(column))}
+            codes = np.fromiter(map(codes_by_value.__getitem__, column), dtype=np.int64, count=len(column))
+            masks = {}
+            for value, code in codes_by_value.items():
+                phrase = _value_phrase(value)
+                if phrase:
+                    masks[phrase] = masks[phrase] | (codes == code) if phrase in masks else codes == code
+            self.filters[field] = dict(sorted(masks.items(), key=lambda item: -len(item[0])))
+        rank = np.asarray([row.get(spec['rank_field']) or 0 for row in rows], dtype=np.float64)
+        self.rank_order = np.argsort(-rank, kind='stable')
+
+    def parse_filters(self, question: str) -> Dict[str, List[str]]:
+        """Column values mentioned in the question, per filter field."""
+        text = f" {' '.join(tokenize(question))} "
+        found = {}
+        for field, masks in self.filters.items():
+            for phrase in masks:
+                # Plural forms ("campaigns" for "campaign") count as mentions
+                if f" {phrase} " in text or f" {phrase}s " in text:
+                    found.setdefault(field, []).append(phrase)
+                    text = text.replace(f" {phrase} ", ' ')
+        return found
+
+    def select_indices(self, question: str, k: int = CHAT_CONTEXT_ROWS) -> Tuple[List[int], Dict]:
+        """Positions of the top-k rows for the question and how they were picked."""
+        filters = self.parse_filters(question)
+        candidates = np.ones(len(self.rows), dtype=bool)
+        for field, phrases in filters.items():
+            field_mask = np.zeros(len(self.rows), dtype=bool)
+            for phrase in phrases:
+                field_mask |= self.filters[field][phrase]
+            candidates &= field_mask
+
+        scores = self.bm25.scores(question)
+        # Filter words also match lexically; don't let them drive the ranking
+        if filters:
+            filter_words = ' '.join(phrase for phrases in filters.values() for phrase in phrases)
+            scores = scores - self.bm25.scores(filter_words)
+        scores[~candidates] = 0
+
+        ascending = bool(_ASCENDING_WORDS & set(tokenize(question)))
+        fallback_order = self.rank_order[::-1] if ascending else self.rank_order
+        fallback_order = fallback_order[candidates[fallback_order]]
+
+        matched = np.flatnonzero(scores > 1e-9)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        if len(matched) < k:
+            rest = fallback_order[~np.isin(fallback_order, matched)][:k - len(matched)]
+            matched = np.concatenate([matched, rest])
+
+        return matched.tolist(), {
+            'filters': filters,
+            'matching_rows': int(candidates.sum()),
+            'total_rows': len(self.rows),
+            'returned_rows': len(matched),
+            'order': 'ascending' if ascending else 'descending'
+        }
+
+    def select(self, question: str, k: int = CHAT_CONTEXT_ROWS) -> Tuple[List[Dict], Dict]:
+        """Top-k rows for the question and a description of how they were picked."""
+        indices, selection = self.select_indices(question, k)
+        return [self.rows[i] for i in indices], selection
+
+
+def select_rows(rows: Sequence[Dict], data_type: str, question: str,
+                k: int = CHAT_CONTEXT_ROWS) -> Tuple[List[Dict], Dict]:
+    """Top-k rows relevant to question (builds a throwaway index)."""
+    if data_type not in DATA_TYPES:
+        raise ValueError(f"Unknown data type '{data_type}'")
+    return RowIndex(rows, data_type).select(question, k)
+
+
+def describe_selection(selection: Dict, noun: str) -> str:
+    """One-line prompt note explaining that the table is a subset."""
+    if selection['returned_rows'] >= selection['total_rows']:
+        return f"The table lists all {selection['total_rows']} {noun}."
+    filters = '; '.join(f"{field} = {', '.join(phrases)}" for field, phrases in selection['filters'].items())
+    note = (f"The table lists the {selection['returned_rows']} {noun} most relevant to the question "
+            f"out of {selection['total_rows']}")
+    if filters:
+        note += f" ({selection['matching_rows']} match {filters})"
+    return note + ". SUMMARY figures cover all of them."
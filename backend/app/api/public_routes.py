@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.auth.api_key_auth import require_api_key
-from app.modules.revops.services import RevOpsService
+from app.modules.revops.services import RevOpsService, revops_service
+from app.modules.revops.routes import lead_list_args
 from app.modules.jobs.services import JobsService
 from app.modules.customer_health.services import CustomerHealthService
 
@@ -14,11 +15,13 @@ public_api_bp = Blueprint('public_api', __name__, url_prefix='/api/v1')
 @public_api_bp.route('/leads', methods=['GET'])
 @require_api_key(['read:*', 'read:leads'])
 def get_leads():
-    """Get all leads - requires read:leads scope"""
+    """Get a page of leads - requires read:leads scope (same parameters as /api/revops/leads)"""
     try:
         organization_id = request.organization_id
-        leads = RevOpsService.get_all_leads(organization_id)
-        return jsonify({'leads': leads}), 200
+        result = revops_service.get_leads(organization_id, **lead_list_args(request.args))
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
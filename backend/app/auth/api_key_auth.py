@@ -1,6 +1,8 @@
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, after_this_request
 from app.modules.api_keys.services import APIKeyService
+from app.modules.stripe_service import StripeService
+from app.auth.rate_limiter import check_rate_limit
 
 def require_api_key(allowed_scopes=None):
     """
@@ -29,6 +31,34 @@ def require_api_key(allowed_scopes=None):
             if not key_data:
                 return jsonify({'error': 'Invalid or expired API key'}), 401
             
+            # Enforce the plan's API access and per-key rate limit
+            plan = StripeService.PLANS.get(key_data['plan_type'], StripeService.PLANS['free'])
+            if not plan['limits']['api_access']:
+                return jsonify({
+                    'error': 'API access not available',
+                    'message': f"API access is not included in the {plan['name']} plan",
+                    'upgrade_required': True
+                }), 403
+            
+            rate_limit = plan['limits']['api_rate_limit']
+            if rate_limit != -1:
+                checked, limit_result = check_rate_limit(key_data['key_id'], rate_limit)
+                if checked:
+                    if not limit_result.allowed:
+                        response = jsonify({
+                            'error': 'Rate limit exceeded',
+                            'message': f"This API key is limited to {rate_limit} requests per day",
+                            'limit': rate_limit
+                        })
+                        response.status_code = 429
+                        response.headers.update(limit_result.headers())
+                        return response
+                    
+                    @after_this_request
+                    def add_rate_limit_headers(response):
+                        response.headers.update(limit_result.headers())
+                        return response
+            
             # Check scopes if specified
             if allowed_scopes:
                 key_scopes = key_data['scopes']
@@ -1,8 +1,9 @@
 """Authentication decorators for route protection."""
 from functools import wraps
 from flask import request, jsonify
-from app.extensions import get_supabase
 from .exceptions import AuthException
+from .token_verifier import get_token_verifier
+from .membership_cache import get_membership_role
 
 
 def require_auth(f):
@@ -17,15 +18,14 @@ def require_auth(f):
             
             token = auth_header.split(' ')[1]
             
-            # Verify token with Supabase
-            supabase = get_supabase()
-            user = supabase.auth.get_user(token)
+            # Verify token locally (falls back to Supabase when no local key applies)
+            user = get_token_verifier().verify(token)
             
             if not user:
                 return jsonify({'error': 'Invalid token'}), 401
             
             # Attach user to request
-            request.user = user.user
+            request.user = user
             
             return f(*args, **kwargs)
             
@@ -56,23 +56,13 @@ def require_role(*allowed_roles):
                 user_id = request.user.id
                 print(f"[require_role] User ID: {user_id}, Org ID: {org_id}")
                 
-                # Get user's role in this organization
-                from app.extensions import get_supabase_admin
-                admin = get_supabase_admin()
-                response = admin.table('user_organizations')\
-                    .select('role')\
-                    .eq('user_id', user_id)\
-                    .eq('organization_id', org_id)\
-                    .single()\
-                    .execute()
+                # Get user's role in this organization (cached per user/org)
+                user_role = get_membership_role(user_id, org_id)
                 
-                print(f"[require_role] Query response: {response.data}")
-                
-                if not response.data:
+                if not user_role:
                     print("[require_role] User not in organization")
                     return jsonify({'error': 'User not in organization'}), 403
                 
-                user_role = response.data['role']
                 print(f"[require_role] User role: {user_role}, Allowed roles: {allowed_roles}")
                 
                 # Check if user has required role
@@ -112,20 +102,13 @@ def require_org_access(f):
             user_id = request.user.id
             
             # Verify user belongs to organization
-            from app.extensions import get_supabase_admin
-            admin = get_supabase_admin()
-            response = admin.table('user_organizations')\
-                .select('role')\
-                .eq('user_id', user_id)\
-                .eq('organization_id', org_id)\
-                .single()\
-                .execute()
+            user_role = get_membership_role(user_id, org_id)
             
-            if not response.data:
+            if not user_role:
                 return jsonify({'error': 'Access denied'}), 403
             
             request.organization_id = org_id
-            request.user_role = response.data['role']
+            request.user_role = user_role
             
             return f(*args, **kwargs)
             
@@ -0,0 +1,59 @@
+"""Cached organization membership lookups for the role decorators.
+
+Roles are cached per (user_id, organization_id). Writes that change membership
+call ``invalidate_membership`` so this worker sees them immediately; other
+gunicorn workers pick them up when the TTL expires.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from app.extensions import get_supabase_admin
+from app.utils.ttl_cache import TTLCache
+
+# Marker for "user is not in this organization" so repeated denials are cheap too
+_NOT_A_MEMBER = ''
+
+_membership_cache = TTLCache(
+    maxsize=int(os.getenv('MEMBERSHIP_CACHE_SIZE', 20000)),
+    ttl=int(os.getenv('MEMBERSHIP_CACHE_TTL', 300))
+)
+_NEGATIVE_TTL = int(os.getenv('MEMBERSHIP_NEGATIVE_CACHE_TTL', 30))
+
+
+def get_membership_role(user_id: str, organization_id: str) -> Optional[str]:
+    """Return the user's role in the organization, or None if not a member."""
+    key = (user_id, organization_id)
+    role = _membership_cache.get(key)
+    if role is not None:
+        return role or None
+
+    admin = get_supabase_admin()
+    response = admin.table('user_organizations')\
+        .select('role')\
+        .eq('user_id', user_id)\
+        .eq('organization_id', organization_id)\
+        .limit(1)\
+        .execute()
+
+    if response.data:
+        role = response.data[0]['role']
+        _membership_cache.set(key, role)
+        return role
+
+    _membership_cache.set(key, _NOT_A_MEMBER, ttl=_NEGATIVE_TTL)
+    return None
+
+
+def invalidate_membership(user_id: str = None, organization_id: str = None):
+    """Drop cached roles for a user, an organization, or one membership."""
+    if user_id and organization_id:
+        _membership_cache.pop((user_id, organization_id))
+    elif user_id:
+        _membership_cache.pop_where(lambda key: key[0] == user_id)
+    elif organization_id:
+        _membership_cache.pop_where(lambda key: key[1] == organization_id)
+
+
+def membership_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the membership cache."""
+    return _membership_cache.stats()
@@ -0,0 +1,164 @@
+"""Token-bucket rate limiting for the public API.
+
+Each API key gets a bucket holding up to ``limit`` requests that refills
+continuously over ``period`` seconds, so a 1000/day plan allows short bursts
+but averages out to the plan limit. Buckets live in process memory by default,
+or in Redis (``RATE_LIMIT_BACKEND=redis``) so all workers share one budget.
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+DAY_SECONDS = 86400
+
+
+class RateLimitResult:
+    """Outcome of a rate limit check, with the values for the response headers."""
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float, retry_after: float = 0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(math.ceil(self.reset_after))
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def _result(allowed: bool, tokens: float, limit: int, period: float) -> RateLimitResult:
+    rate = limit / period
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit,
+        remaining=max(0, int(tokens)),
+        reset_after=(limit - tokens) / rate,
+        retry_after=0 if allowed else (1 - tokens) / rate
+    )
+
+
+class InMemoryRateLimiter:
+    """Token buckets in a dict - per worker, no I/O."""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, period: float = DAY_SECONDS, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        rate = limit / period
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(limit), now))
+            tokens = min(float(limit), tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+        return _result(allowed, tokens, limit, period)
+
+    def reset(self, key: str = None):
+        with self._lock:
+            if key is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(key, None)
+
+
+class RedisRateLimiter:
+    """Token buckets in Redis, updated atomically by a Lua script."""
+
+    # KEYS[1] bucket; ARGV: limit, rate (tokens/sec), cost, ttl (sec)
+    # Uses the Redis server clock so workers on different hosts agree.
+    SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local limit = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+  tokens = limit
+  ts = now
+end
+tokens = math.min(limit, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, redis_url: str, prefix: str = 'ratelimit:'):
+        import redis
+        self.redis = redis.Redis.from_url(redis_url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        self.prefix = prefix
+        self._script = self.redis.register_script(self.SCRIPT)
+
+    def hit(self, key: str, limit: int, period: float = DAY_SECONDS, cost: int = 1) -> RateLimitResult:
+        allowed, tokens = self._script(
+            keys=[self.prefix + key],
+            args=[limit, limit / period, cost, int(period) + 60]
+        )
+        return _result(bool(allowed), float(tokens), limit, period)
+
+    def reset(self, key: str = None):
+        if key is None:
+            for bucket in self.redis.scan_iter(match=self.prefix + '*'):
+                self.redis.delete(bucket)
+        else:
+            self.redis.delete(self.prefix + key)
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    """Get or create the configured rate limiter backend."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        backend = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower()
+        if backend == 'redis':
+            try:
+                _rate_limiter = RedisRateLimiter(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+                print("[RateLimiter] Using Redis backend")
+            except ImportError:
+                print("[RateLimiter] redis package not installed - falling back to in-memory limiter")
+        if _rate_limiter is None:
+            _rate_limiter = InMemoryRateLimiter()
+    return _rate_limiter
+
+
+def check_rate_limit(key: str, limit: int, period: float = DAY_SECONDS) -> Tuple[bool, RateLimitResult]:
+    """Consume one request from the key's bucket.
+
+    Returns (checked, result); checked is False when the backend failed, in which
+    case the request is let through (fail open, like require_limit).
+    """
+    try:
+        return True, get_rate_limiter().hit(key, limit, period)
+    except Exception as e:
+        print(f"[RateLimiter] Rate limit check failed for {key}: {e}")
+        return False, None
+
+
+def peek_rate_limit(key: str, limit: int, period: float = DAY_SECONDS):
+    """The key's bucket state without consuming a request (None if the backend failed)."""
+    try:
+        return get_rate_limiter().hit(key, limit, period, cost=0)
+    except Exception as e:
+        print(f"[RateLimiter] Rate limit peek failed for {key}: {e}")
+        return None
@@ -108,6 +108,28 @@ def get_organizations():
     
     return jsonify(result), 200
 
+@auth_bp.route('/organizations/<org_id>/members/<member_id>', methods=['PATCH'])
+def update_member_role(org_id, member_id):
+    """Change a member's role (owners only)"""
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    data = request.get_json() or {}
+    role = data.get('role')
+    
+    if not token:
+        return jsonify({"error": "Authorization token required"}), 401
+    
+    if role not in ['org_owner', 'org_member']:
+        return jsonify({"error": "Role must be org_owner or org_member"}), 400
+    
+    auth_service = AuthService()
+    result = auth_service.update_member_role(token, org_id, member_id, role)
+    
+    if 'error' in result:
+        status = 403 if result['error'].startswith('Forbidden') else 400
+        return jsonify(result), status
+    
+    return jsonify(result), 200
+
 @auth_bp.route('/forgot-password', methods=['POST'])
 def forgot_password():
     """Send password reset email"""
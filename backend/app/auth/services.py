@@ -1,6 +1,7 @@
 """Authentication service layer."""
 from flask import current_app
 from typing import Dict, Any
+from .membership_cache import get_membership_role, invalidate_membership
 
 
 class AuthService:
@@ -115,6 +116,7 @@ class AuthService:
                         'organization_id': org['id'],
                         'role': 'org_owner'
                     }).execute()
+                    invalidate_membership(user_id, org['id'])
                     
                     # Convert user object to dict for JSON serialization
                     user_dict = {
@@ -223,6 +225,9 @@ class AuthService:
         """Logout user."""
         try:
             self.supabase.auth.sign_out()
+            if token:
+                from app.auth.token_verifier import get_token_verifier
+                get_token_verifier().invalidate(token)
             return {'message': 'Logged out successfully'}
         
         except Exception as e:
@@ -300,6 +305,7 @@ class AuthService:
                 'organization_id': org.data[0]['id'],
                 'role': 'org_owner'
             }).execute()
+            invalidate_membership(user.user.id, org.data[0]['id'])
             
             return {'organization': org.data[0]}
         
@@ -315,14 +321,9 @@ class AuthService:
                 return {'error': 'Unauthorized'}
             
             # Check if user is owner or admin
-            user_role = self.supabase.table('user_organizations')\
-                .select('role')\
-                .eq('user_id', user.user.id)\
-                .eq('organization_id', org_id)\
-                .single()\
-                .execute()
+            user_role = get_membership_role(user.user.id, org_id)
             
-            if user_role.data['role'] not in ['org_owner', 'platform_admin']:
+            if user_role not in ['org_owner', 'platform_admin']:
                 return {'error': 'Forbidden - Only owners can invite users'}
             
             # Create invitation (simplified - in production, send email)
@@ -332,12 +333,40 @@ class AuthService:
                 'role': role,
                 'invited_by': user.user.id
             }).execute()
+            # Drop cached "not a member" answers so the invitee's access shows up promptly
+            invalidate_membership(organization_id=org_id)
             
             return {'invitation': invitation.data[0]}
         
         except Exception as e:
             return {'error': str(e)}
     
+    def update_member_role(self, token: str, org_id: str, member_id: str, role: str) -> Dict[str, Any]:
+        """Change a member's role in an organization."""
+        try:
+            user = self.supabase.auth.get_user(token)
+            
+            if not user:
+                return {'error': 'Unauthorized'}
+            
+            if get_membership_role(user.user.id, org_id) not in ['org_owner', 'platform_admin']:
+                return {'error': 'Forbidden - Only owners can change roles'}
+            
+            response = self.supabase_admin.table('user_organizations')\
+                .update({'role': role})\
+                .eq('user_id', member_id)\
+                .eq('organization_id', org_id)\
+                .execute()
+            invalidate_membership(member_id, org_id)
+            
+            if not response.data:
+                return {'error': 'Member not found'}
+            
+            return {'membership': response.data[0]}
+        
+        except Exception as e:
+            return {'error': str(e)}
+    
     def forgot_password(self, email: str) -> Dict[str, Any]:
         """Send password reset email."""
         try:
@@ -0,0 +1,187 @@
+"""Local verification of Supabase access tokens.
+
+Supabase access tokens are JWTs signed either with the project's JWT secret
+(HS256) or with an asymmetric key published in the project's JWKS. Checking the
+signature locally avoids a GoTrue round trip on every authenticated request;
+the remote ``auth.get_user`` call is only used when no local key can decide.
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+import requests
+from flask import current_app
+
+from app.utils.ttl_cache import TTLCache
+
+
+class TokenUser:
+    """Minimal user object built from verified JWT claims.
+
+    Exposes the same attributes routes read from the GoTrue ``User`` model.
+    """
+
+    def __init__(self, claims: Dict[str, Any]):
+        self.id = claims.get('sub')
+        self.email = claims.get('email')
+        self.phone = claims.get('phone')
+        self.role = claims.get('role')
+        self.aud = claims.get('aud')
+        self.app_metadata = claims.get('app_metadata') or {}
+        self.user_metadata = claims.get('user_metadata') or {}
+        self.session_id = claims.get('session_id')
+
+
+class TokenVerifier:
+    """Verify access tokens locally and cache token -> user until expiry."""
+
+    ASYMMETRIC_ALGORITHMS = ('RS256', 'ES256', 'EdDSA')
+
+    def __init__(self, jwt_secret: str = None, jwks: Dict = None, jwks_url: str = None,
+                 audience: str = 'authenticated', cache_size: int = 10000, cache_ttl: int = 300,
+                 jwks_refresh_interval: int = 300, remote_verify=None):
+        self.jwt_secret = jwt_secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.jwks_refresh_interval = jwks_refresh_interval
+        self.remote_verify = remote_verify
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._keys = {}
+        self._keys_fetched_at = 0.0
+        self._keys_lock = threading.Lock()
+        self.local_verifications = 0
+        self.remote_verifications = 0
+        if jwks:
+            self._load_jwks(jwks)
+
+    @staticmethod
+    def _cache_key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _load_jwks(self, jwks: Dict):
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            try:
+                key = jwt.PyJWK.from_dict(jwk)
+            except jwt.PyJWTError as e:
+                print(f"[TokenVerifier] Skipping unusable JWK {jwk.get('kid')}: {e}")
+                continue
+            keys[jwk.get('kid')] = key
+        self._keys = keys
+        self._keys_fetched_at = time.monotonic()
+
+    def _refresh_jwks(self):
+        """Re-fetch the JWKS, at most once per refresh interval."""
+        if not self.jwks_url:
+            return
+        with self._keys_lock:
+            if time.monotonic() - self._keys_fetched_at < self.jwks_refresh_interval:
+                return
+            try:
+                response = requests.get(self.jwks_url, timeout=5)
+                response.raise_for_status()
+                self._load_jwks(response.json())
+            except Exception as e:
+                print(f"[TokenVerifier] JWKS refresh failed: {e}")
+                self._keys_fetched_at = time.monotonic()
+
+    def _signing_key(self, header: Dict):
+        """Return the key for this token, or None if no local key can verify it."""
+        alg = header.get('alg')
+        if alg == 'HS256':
+            return self.jwt_secret
+        if alg not in self.ASYMMETRIC_ALGORITHMS:
+            return None
+        kid = header.get('kid')
+        if kid not in self._keys:
+            # Unknown key id: the project may have rotated keys since our last fetch
+            self._refresh_jwks()
+        key = self._keys.get(kid)
+        return key.key if key else None
+
+    def _verify_remote(self, token: str):
+        if self.remote_verify is None:
+            return None
+        self.remote_verifications += 1
+        response = self.remote_verify(token)
+        return response.user if response else None
+
+    def verify(self, token: str):
+        """Return the user for a valid token, or None if it is invalid or expired."""
+        cache_key = self._cache_key(token)
+        user = self.cache.get(cache_key)
+        if user is not None:
+            return user
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.PyJWTError:
+            return None
+
+        key = self._signing_key(header)
+        if key is None:
+            # No local key for this token - let GoTrue decide
+            user = self._verify_remote(token)
+            expires_at = None
+            try:
+                expires_at = jwt.decode(token, options={'verify_signature': False}).get('exp')
+            except jwt.PyJWTError:
+                pass
+        else:
+            try:
+                claims = jwt.decode(
+                    token,
+                    key,
+                    algorithms=[header['alg']],
+                    audience=self.audience,
+                    options={'require': ['exp', 'sub']}
+                )
+            except jwt.PyJWTError:
+                return None
+            self.local_verifications += 1
+            user = TokenUser(claims)
+            expires_at = claims['exp']
+
+        if user is not None:
+            ttl = self.cache.ttl
+            if expires_at:
+                ttl = min(ttl, expires_at - time.time())
+            self.cache.set(cache_key, user, ttl=ttl)
+        return user
+
+    def invalidate(self, token: str):
+        """Forget a cached token (e.g. on logout)."""
+        self.cache.pop(self._cache_key(token))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            'local_verifications': self.local_verifications,
+            'remote_verifications': self.remote_verifications
+        }
+
+
+_token_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    """Get or create the process-wide token verifier from app config."""
+    global _token_verifier
+    if _token_verifier is None:
+        from app.extensions import get_supabase
+        config = current_app.config
+        supabase_url = config.get('SUPABASE_URL')
+        jwks_url = config.get('SUPABASE_JWKS_URL')
+        if not jwks_url and supabase_url:
+            jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        _token_verifier = TokenVerifier(
+            jwt_secret=config.get('SUPABASE_JWT_SECRET'),
+            jwks=config.get('SUPABASE_JWKS'),
+            jwks_url=jwks_url,
+            cache_size=config.get('AUTH_TOKEN_CACHE_SIZE', 10000),
+            cache_ttl=config.get('AUTH_TOKEN_CACHE_TTL', 300),
+            remote_verify=lambda token: get_supabase().auth.get_user(token)
+        )
+    return _token_verifier
@@ -0,0 +1,39 @@
+"""Flask CLI commands for scheduled maintenance jobs (run via cron)."""
+import click
+
+
+def register_commands(app):
+    """Attach maintenance commands to the app's `flask` CLI."""
+
+    @app.cli.command('rescore-leads')
+    @click.option('--org', 'organization_id', default=None, help='Only rescore this organization')
+    @click.option('--batch-size', type=int, default=None, help='Leads per batch')
+    def rescore_leads(organization_id, batch_size):
+        """Apply score decay to leads that crossed a 1/3/7 day recency boundary."""
+        from app.modules.revops.rescoring import rescore_due_leads, RESCORE_BATCH_SIZE
+
+        stats = rescore_due_leads(organization_id, batch_size=batch_size or RESCORE_BATCH_SIZE)
+        click.echo(f"Rescored {stats['updated']} leads ({stats['scanned']} due, {stats['batches']} batches)")
+
+    @app.cli.command('recompute-campaign-stats')
+    @click.argument('organization_id')
+    @click.option('--campaign', 'campaign_id', default=None, help='Only this campaign')
+    def recompute_campaign_stats(organization_id, campaign_id):
+        """Repair campaign lead/conversion/revenue/ROI stats from the leads table."""
+        from app.modules.revops.services import revops_service
+
+        result = revops_service.recompute_campaign_stats(organization_id, campaign_id)
+        click.echo(f"Recomputed stats for {result['campaigns']} campaigns")
+
+    @app.cli.command('run-attribution')
+    @click.argument('organization_id')
+    @click.option('--model', default='linear', help='first_touch, last_touch, linear, time_decay or position_based')
+    def run_attribution(organization_id, model):
+        """Recompute multi-touch credited revenue per campaign from lead touchpoints."""
+        from app.modules.revops.attribution import run_attribution as attribute
+
+        summary = attribute(organization_id, model)
+        click.echo(
+            f"{model}: credited ${summary['credited_revenue']:,.2f} to {summary['campaigns']} campaigns "
+            f"from {summary['touches']} touches (${summary['unattributed_revenue']:,.2f} unattributed)"
+        )
@@ -12,6 +12,11 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY')
     SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
+    # Used to verify access tokens locally instead of calling GoTrue per request
+    SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+    SUPABASE_JWKS_URL = os.getenv('SUPABASE_JWKS_URL')  # defaults to <SUPABASE_URL>/auth/v1/.well-known/jwks.json
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+    AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', 300))  # seconds, never beyond token exp
     
     # Redis
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
@@ -20,6 +25,12 @@ class Config:
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     # Check both GOOGLE_API_KEY and GOOGLE_GEMINI_API_KEY for compatibility
     GOOGLE_GEMINI_API_KEY = os.getenv('GOOGLE_API_KEY') or os.getenv('GOOGLE_GEMINI_API_KEY')
+    # Pin the Gemini model to skip list_models() discovery (e.g. models/gemini-1.5-flash)
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL')
+    # Resolve the Gemini model in the background at startup instead of on the first AI request
+    GEMINI_PREWARM = os.getenv('GEMINI_PREWARM', 'false').lower() == 'true'
+    # 'fake' swaps Gemini for a deterministic offline model (no API key needed)
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'gemini')
     
     # Application
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5173').split(',')
@@ -1,6 +1,7 @@
 """Debug routes for troubleshooting production issues."""
 from flask import Blueprint, jsonify, current_app
 import os
+from app.auth.decorators import require_auth
 
 debug_bp = Blueprint('debug', __name__, url_prefix='/api/debug')
 
@@ -68,3 +69,29 @@ def test_gemini():
             'error_message': str(e),
             'api_key_set': bool(os.getenv('GOOGLE_GEMINI_API_KEY'))
         }), 500
+
+@debug_bp.route('/cache-stats', methods=['GET'])
+@require_auth
+def cache_stats():
+    """Hit/miss counters for this worker's auth caches."""
+    from app.auth.token_verifier import get_token_verifier
+    from app.auth.membership_cache import membership_cache_stats
+    
+    return jsonify({
+        'auth_tokens': get_token_verifier().stats(),
+        'memberships': membership_cache_stats()
+    }), 200
+
+@debug_bp.route('/llm-stats', methods=['GET'])
+@require_auth
+def llm_stats():
+    """Per-call latency percentiles, failure counters and circuit state of this worker's LLM executor, and recent prompt trims."""
+    from app.ai import prompt_budget
+    from app.ai.llm_executor import llm_executor
+    from app.ai.insight_cache import insight_cache
+    
+    return jsonify({
+        'executor': llm_executor.stats(),
+        'insight_cache': insight_cache.stats(),
+        'prompt_budget': prompt_budget.stats()
+    }), 200
@@ -1,25 +1,63 @@
+import hashlib
+import hmac
+import os
+import re
 import secrets
 import bcrypt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from app.extensions import get_supabase_admin
+from app.utils.ttl_cache import TTLCache
+from app.modules.api_keys.usage_meter import usage_meter
+
+# Verified keys, keyed by HMAC digest so plaintext keys are never held in memory
+_verified_keys = TTLCache(
+    maxsize=int(os.getenv('API_KEY_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('API_KEY_CACHE_TTL', 60))
+)
+
+# Digests of keys that failed validation, so a repeated bad key (a client with a
+# revoked or mistyped key retrying) doesn't re-query, or re-run bcrypt, each time
+_rejected_keys = TTLCache(
+    maxsize=int(os.getenv('API_KEY_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('API_KEY_REJECT_CACHE_TTL', 30))
+)
 
 class APIKeyService:
+    KEY_PREFIX = 'gh_live_'
+    # gh_live_<12 hex lookup id>_<secret>
+    KEY_PATTERN = re.compile(r'^gh_live_([0-9a-f]{12})_([A-Za-z0-9_-]{32,})$')
+    # gh_live_<32 char secret>, issued before lookup ids (bcrypt hash only)
+    LEGACY_KEY_PATTERN = re.compile(r'^gh_live_[A-Za-z0-9_-]{32}$')
+
     @staticmethod
     def generate_api_key():
-        """Generate a secure random API key with prefix"""
-        # Format: gh_live_XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX (total 48 chars)
+        """Generate a secure random API key with prefix and lookup id"""
+        # Format: gh_live_<lookup_id>_<secret> - the lookup id is indexed, the secret is not stored
+        lookup_id = secrets.token_hex(6)  # 12 chars
         random_part = secrets.token_urlsafe(32)[:32]  # 32 chars
-        api_key = f"gh_live_{random_part}"
-        return api_key
+        api_key = f"{APIKeyService.KEY_PREFIX}{lookup_id}_{random_part}"
+        return api_key, lookup_id
+    
+    @staticmethod
+    def parse_lookup_id(api_key):
+        """Return the lookup id of a current-format key, or None for legacy keys"""
+        match = APIKeyService.KEY_PATTERN.match(api_key)
+        return match.group(1) if match else None
+    
+    @staticmethod
+    def digest_api_key(api_key):
+        """Keyed SHA-256 digest of the full API key (fast, safe to index)"""
+        secret = os.getenv('API_KEY_HMAC_SECRET') or os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+        return hmac.new(secret.encode('utf-8'), api_key.encode('utf-8'), hashlib.sha256).hexdigest()
     
     @staticmethod
     def hash_api_key(api_key):
-        """Hash API key using bcrypt"""
+        """Hash API key using bcrypt (legacy keys only)"""
         return bcrypt.hashpw(api_key.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
     
     @staticmethod
     def verify_api_key(api_key, key_hash):
-        """Verify API key against stored hash"""
+        """Verify API key against stored bcrypt hash (legacy keys only)"""
         return bcrypt.checkpw(api_key.encode('utf-8'), key_hash.encode('utf-8'))
     
     @staticmethod
@@ -28,9 +66,8 @@ class APIKeyService:
         supabase = get_supabase_admin()
         
         # Generate API key
-        api_key = APIKeyService.generate_api_key()
-        key_prefix = api_key[:8]  # "gh_live_"
-        key_hash = APIKeyService.hash_api_key(api_key)
+        api_key, lookup_id = APIKeyService.generate_api_key()
+        key_digest = APIKeyService.digest_api_key(api_key)
         
         # Calculate expiration
         expires_at = None
@@ -44,8 +81,9 @@ class APIKeyService:
         # Insert into database
         key_data = {
             'organization_id': organization_id,
-            'key_prefix': key_prefix,
-            'key_hash': key_hash,
+            'key_prefix': APIKeyService.KEY_PREFIX,
+            'lookup_id': lookup_id,
+            'key_digest': key_digest,
             'name': name,
             'scopes': scopes,
             'expires_at': expires_at,
@@ -56,17 +94,25 @@ class APIKeyService:
         
         # Return the key info with the PLAIN API KEY (only time it's visible)
         key_info = response.data[0]
+        key_info.pop('key_hash', None)
+        key_info.pop('key_digest', None)
         key_info['api_key'] = api_key  # Only returned once!
         
         return key_info
     
+    @staticmethod
+    def clear_cache():
+        """Forget all verified and rejected keys in this worker (after revoke, delete or plan change)"""
+        _verified_keys.clear()
+        _rejected_keys.clear()
+    
     @staticmethod
     def get_all_keys(organization_id):
         """Get all API keys for organization (without full keys)"""
         supabase = get_supabase_admin()
         
         response = supabase.table('api_keys') \
-            .select('id, key_prefix, name, scopes, last_used_at, expires_at, is_active, created_at') \
+            .select('id, key_prefix, lookup_id, name, scopes, last_used_at, expires_at, is_active, created_at') \
             .eq('organization_id', organization_id) \
             .order('created_at', desc=True) \
             .execute()
@@ -74,46 +120,91 @@ class APIKeyService:
         return response.data
     
     @staticmethod
-    def validate_api_key(api_key):
-        """Validate an API key and return organization_id and scopes"""
+    def _find_key_record(api_key, key_digest):
+        """Fetch the active key row for this key with a single indexed lookup"""
         supabase = get_supabase_admin()
+        columns = 'id, organization_id, scopes, expires_at, key_digest, organizations(plan_type)'
+        
+        lookup_id = APIKeyService.parse_lookup_id(api_key)
+        if lookup_id:
+            query = supabase.table('api_keys').select(columns).eq('lookup_id', lookup_id)
+        else:
+            # Legacy key that has already been upgraded with a digest
+            query = supabase.table('api_keys').select(columns).eq('key_digest', key_digest)
         
-        # Extract prefix for lookup
-        key_prefix = api_key[:8]
+        response = query.eq('is_active', True).limit(1).execute()
+        if response.data and response.data[0].get('key_digest') and \
+                hmac.compare_digest(response.data[0]['key_digest'], key_digest):
+            return response.data[0]
         
-        # Find all keys with this prefix
+        if lookup_id or not APIKeyService.LEGACY_KEY_PATTERN.match(api_key):
+            return None
+        return APIKeyService._migrate_legacy_key(api_key, key_digest)
+    
+    @staticmethod
+    def _migrate_legacy_key(api_key, key_digest):
+        """Verify a not-yet-upgraded bcrypt key and store its digest for O(1) lookups"""
+        supabase = get_supabase_admin()
+        
+        # Only keys without a digest are candidates, so this scan shrinks to nothing over time
         response = supabase.table('api_keys') \
-            .select('*') \
-            .eq('key_prefix', key_prefix) \
+            .select('id, organization_id, scopes, expires_at, key_hash, organizations(plan_type)') \
+            .eq('key_prefix', api_key[:8]) \
             .eq('is_active', True) \
+            .is_('key_digest', 'null') \
             .execute()
         
-        if not response.data:
-            return None
-        
-        # Try to verify against each key with this prefix
-        for key_record in response.data:
+        for key_record in response.data or []:
             if APIKeyService.verify_api_key(api_key, key_record['key_hash']):
-                # Check expiration
-                if key_record['expires_at']:
-                    expires_at = datetime.fromisoformat(key_record['expires_at'].replace('Z', '+00:00'))
-                    if datetime.utcnow() > expires_at:
-                        return None  # Expired
-                
-                # Update last_used_at
                 supabase.table('api_keys') \
-                    .update({'last_used_at': datetime.utcnow().isoformat()}) \
+                    .update({'key_digest': key_digest}) \
                     .eq('id', key_record['id']) \
                     .execute()
-                
-                return {
-                    'organization_id': key_record['organization_id'],
-                    'scopes': key_record['scopes'],
-                    'key_id': key_record['id']
-                }
+                print(f"[APIKeyService] Upgraded legacy API key {key_record['id']} to digest lookup")
+                return key_record
         
         return None
     
+    @staticmethod
+    def validate_api_key(api_key):
+        """Validate an API key and return organization_id and scopes"""
+        key_digest = APIKeyService.digest_api_key(api_key)
+        key_record = _verified_keys.get(key_digest)
+        if key_record is None:
+            if _rejected_keys.contains(key_digest):
+                return None
+            key_record = APIKeyService._find_key_record(api_key, key_digest)
+            if not key_record:
+                _rejected_keys.set(key_digest, True)
+                return None
+            organization = key_record.get('organizations') or {}
+            key_record = {
+                'id': key_record['id'],
+                'organization_id': key_record['organization_id'],
+                'scopes': key_record['scopes'],
+                'expires_at': key_record['expires_at'],
+                'plan_type': organization.get('plan_type') or 'free'
+            }
+            _verified_keys.set(key_digest, key_record)
+        
+        # Check expiration
+        if key_record['expires_at']:
+            expires_at = datetime.fromisoformat(key_record['expires_at'].replace('Z', '+00:00'))
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) > expires_at:
+                return None  # Expired
+        
+        # Buffered - last_used_at and request counts are flushed in batches
+        usage_meter.record(key_record['id'], key_record['organization_id'])
+        
+        return {
+            'organization_id': key_record['organization_id'],
+            'scopes': key_record['scopes'],
+            'key_id': key_record['id'],
+            'plan_type': key_record['plan_type']
+        }
+    
     @staticmethod
     def revoke_key(organization_id, key_id):
         """Revoke (deactivate) an API key"""
@@ -125,6 +216,9 @@ class APIKeyService:
             .eq('organization_id', organization_id) \
             .execute()
         
+        # Revocations must take effect before the verified-key TTL runs out
+        APIKeyService.clear_cache()
+        
         return response.data[0] if response.data else None
     
     @staticmethod
@@ -138,6 +232,8 @@ class APIKeyService:
             .eq('organization_id', organization_id) \
             .execute()
         
+        APIKeyService.clear_cache()
+        
         return True
     
     @staticmethod
@@ -147,19 +243,45 @@ class APIKeyService:
         
         # Get all keys
         all_keys = supabase.table('api_keys') \
-            .select('*') \
+            .select('id, name, is_active, last_used_at, request_count') \
+            .eq('organization_id', organization_id) \
+            .execute()
+        
+        # Daily request counts for the last 7 days
+        seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        daily = supabase.table('api_key_usage_daily') \
+            .select('key_id, day, request_count') \
             .eq('organization_id', organization_id) \
+            .gte('day', seven_days_ago.date().isoformat()) \
             .execute()
         
-        total_keys = len(all_keys.data)
-        active_keys = len([k for k in all_keys.data if k['is_active']])
+        requests_7d = {}
+        for row in daily.data or []:
+            requests_7d[row['key_id']] = requests_7d.get(row['key_id'], 0) + row['request_count']
+        
+        # Fold in usage that is still buffered in this worker
+        pending = usage_meter.pending_for_org(organization_id)
+        
+        keys = []
+        for k in all_keys.data:
+            buffered = pending.get(k['id'], {})
+            last_used_at = buffered.get('last_used_at') or k['last_used_at']
+            keys.append({
+                'id': k['id'],
+                'name': k['name'],
+                'is_active': k['is_active'],
+                'last_used_at': last_used_at,
+                'total_requests': (k.get('request_count') or 0) + buffered.get('count', 0),
+                'requests_last_7_days': requests_7d.get(k['id'], 0) + buffered.get('count', 0)
+            })
+        
+        total_keys = len(keys)
+        active_keys = len([k for k in keys if k['is_active']])
         inactive_keys = total_keys - active_keys
         
         # Count recently used (last 7 days) - use timezone-aware datetime
-        from datetime import timezone
-        seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
         recently_used = len([
-            k for k in all_keys.data 
+            k for k in keys 
             if k['last_used_at'] and datetime.fromisoformat(k['last_used_at'].replace('Z', '+00:00')) > seven_days_ago
         ])
         
@@ -167,5 +289,8 @@ class APIKeyService:
             'total_keys': total_keys,
             'active_keys': active_keys,
             'inactive_keys': inactive_keys,
-            'recently_used': recently_used
+            'recently_used': recently_used,
+            'total_requests': sum(k['total_requests'] for k in keys),
+            'requests_last_7_days': sum(k['requests_last_7_days'] for k in keys),
+            'keys': keys
         }
@@ -0,0 +1,119 @@
+"""Buffered API key usage metering.
+
+``validate_api_key`` used to write ``last_used_at`` synchronously on every
+public API call. Instead, each call is recorded in memory and a background
+thread flushes per-key request counts and last-used timestamps in one RPC
+(``record_api_key_usage``) every few seconds or once enough keys are pending.
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict
+
+from app.extensions import get_supabase_admin
+
+
+class UsageMeter:
+    """Coalesce per-key usage in memory and write it in batches."""
+
+    def __init__(self, flush_interval: float = 10, max_pending_keys: int = 500, writer=None):
+        self.flush_interval = flush_interval
+        self.max_pending_keys = max_pending_keys
+        self._writer = writer or self._write_batch
+        self._pending = {}  # key_id -> {'organization_id', 'count', 'last_used_at'}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._last_flush = time.monotonic()
+
+    def record(self, key_id: str, organization_id: str):
+        """Count one request for a key. Never touches the database."""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            entry = self._pending.get(key_id)
+            if entry is None:
+                entry = self._pending[key_id] = {'organization_id': organization_id, 'count': 0}
+            entry['count'] += 1
+            entry['last_used_at'] = now
+            pending_keys = len(self._pending)
+
+        self._ensure_thread()
+        if pending_keys >= self.max_pending_keys:
+            self._wakeup.set()
+
+    def pending_for_org(self, organization_id: str) -> Dict[str, Dict]:
+        """Unflushed usage for an organization's keys, keyed by key id."""
+        with self._lock:
+            return {
+                key_id: dict(entry)
+                for key_id, entry in self._pending.items()
+                if entry['organization_id'] == organization_id
+            }
+
+    def flush(self):
+        """Write all pending usage now. Failed batches are merged back for retry."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+            if not batch:
+                return 0
+
+            rows = [
+                {
+                    'key_id': key_id,
+                    'organization_id': entry['organization_id'],
+                    'request_count': entry['count'],
+                    'last_used_at': entry['last_used_at']
+                }
+                for key_id, entry in batch.items()
+            ]
+            try:
+                self._writer(rows)
+            except Exception as e:
+                print(f"[UsageMeter] Flush of {len(rows)} keys failed, will retry: {e}")
+                self._merge_back(batch)
+                return 0
+            return len(rows)
+
+    def _merge_back(self, batch: Dict[str, Dict]):
+        with self._lock:
+            for key_id, entry in batch.items():
+                current = self._pending.get(key_id)
+                if current is None:
+                    self._pending[key_id] = entry
+                else:
+                    current['count'] += entry['count']
+                    current['last_used_at'] = max(current['last_used_at'], entry['last_used_at'])
+
+    @staticmethod
+    def _write_batch(rows):
+        supabase = get_supabase_admin()
+        supabase.rpc('record_api_key_usage', {'usage': rows}).execute()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='api-usage-meter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+usage_meter = UsageMeter(
+    flush_interval=float(os.getenv('API_USAGE_FLUSH_INTERVAL', 10)),
+    max_pending_keys=int(os.getenv('API_USAGE_FLUSH_BATCH', 500))
+)
+
+# Don't lose buffered counts on a clean worker shutdown
+atexit.register(usage_meter.flush)
@@ -1,6 +1,8 @@
 """Customer Health module routes."""
 from flask import Blueprint, request, jsonify
 from app.auth.decorators import require_auth, require_role
+from app.utils.bulk_insert import DuplicateRowError
+from app.utils.sse import event_stream_response, wants_event_stream
 from .services import customer_health_service
 
 customer_health_bp = Blueprint('customer_health', __name__)
@@ -34,7 +36,10 @@ def create_customer():
     """Create a new customer."""
     org_id = request.organization_id
     data = request.get_json()
-    result = customer_health_service.create_customer(org_id, data)
+    try:
+        result = customer_health_service.create_customer(org_id, data)
+    except DuplicateRowError as e:
+        return jsonify({'error': str(e)}), 409
     return jsonify(result), 201
 
 
@@ -96,7 +101,7 @@ def analyze_customers():
 @require_auth
 @require_role('org_owner', 'org_member')
 def chat_with_customers():
-    """Chat with AI about customers data."""
+    """Chat with AI about customers data (streamed as SSE with ?stream=1)."""
     org_id = request.organization_id
     user_id = request.user.id
     data = request.get_json()
@@ -107,6 +112,10 @@ def chat_with_customers():
         return jsonify({'error': 'Message is required'}), 400
     
     try:
+        if wants_event_stream(request):
+            return event_stream_response(
+                customer_health_service.chat_about_customers_stream(org_id, user_id, message, conversation_history)
+            )
         result = customer_health_service.chat_about_customers(org_id, user_id, message, conversation_history)
         return jsonify(result), 200
     except Exception as e:
@@ -109,59 +109,79 @@ class CustomerHealthService:
             'metadata': data.get('metadata', {})
         }
         
-        response = self.admin.table('customers')\
-            .insert(customer_data)\
-            .execute()
+        from app.utils.bulk_insert import insert_unique
+        
+        customer = insert_unique('customers', customer_data, f"A customer with email {customer_data['email']} already exists")
         
-        return {'customer': response.data[0]}
+        return {'customer': customer}
     
     def upload_customers_csv(self, org_id: str, file) -> Dict:
         """Upload customers from CSV."""
         from app.utils.csv_parser import parse_customers_csv
+        from app.utils.bulk_insert import dedupe_rows, insert_skip_duplicates, normalize_key
         
         customers = parse_customers_csv(file)
         
-        # Get existing emails to check for duplicates
-        existing_response = self.admin.table('customers')\
-            .select('email')\
-            .eq('organization_id', org_id)\
-            .execute()
-        
-        existing_emails = {c['email'].lower() for c in existing_response.data if c.get('email')}
+        # Collapse duplicate emails within the file; the unique
+        # (organization_id, email_key) index skips customers that already exist
+        new_customers, _ = dedupe_rows(customers, key=lambda customer: normalize_key(customer['email']))
         
-        # Filter out duplicates
-        new_customers = []
-        duplicates = 0
-        
-        for customer in customers:
-            if customer.get('email') and customer['email'].lower() in existing_emails:
-                duplicates += 1
-                continue
-            
+        for customer in new_customers:
             customer['organization_id'] = org_id
             customer['last_active'] = customer.get('last_active') or datetime.now(timezone.utc).isoformat()
-            new_customers.append(customer)
         
-        # Bulk insert
-        if new_customers:
-            self.admin.table('customers')\
-                .insert(new_customers)\
-                .execute()
+        inserted = insert_skip_duplicates(
+            'customers', new_customers,
+            on_conflict='organization_id,email_key',
+            defaults={'metadata': {}}
+        )
+        duplicates = len(customers) - len(inserted)
         
         return {
-            'message': f'Successfully uploaded {len(new_customers)} customers',
-            'new_count': len(new_customers),
+            'message': f'Successfully uploaded {len(inserted)} customers',
+            'new_count': len(inserted),
             'duplicate_count': duplicates
         }
     
     def chat_about_customers(self, org_id: str, user_id: str, message: str, conversation_history: list = None):
         """Chat with AI about customers data with full access to customer details."""
         from app.ai.gemini_client import get_gemini_client
+        from app.ai.chat_context import get_chat_context
         
-        # Get customers data for context
+        # Reused across messages until the org's customers change (or the TTL
+        # passes, since health scores depend on the current date)
+        data_context = get_chat_context(org_id, 'customers', lambda: self._customers_chat_context(org_id))
+        
+        # Get AI response
+        try:
+            gemini = get_gemini_client()
+            result = gemini.chat_with_data(user_id, message, data_context, conversation_history, data_type='customers', organization_id=org_id)
+            
+            return {
+                'response': result.get('response', 'I apologize, I could not process that request.'),
+                'success': result.get('success', False)
+            }
+        except Exception as e:
+            print(f"Chat error: {e}")
+            return {
+                'response': f"I'm having trouble processing your question right now. Error: {str(e)}",
+                'success': False
+            }
+    
+    def chat_about_customers_stream(self, org_id: str, user_id: str, message: str, conversation_history: list = None):
+        """Streamed chat_about_customers: an iterator of chunk events, then done / error."""
+        from app.ai.gemini_client import get_gemini_client
+        from app.ai.chat_context import get_chat_context
+        
+        data_context = get_chat_context(org_id, 'customers', lambda: self._customers_chat_context(org_id))
+        return get_gemini_client().stream_chat_with_data(user_id, message, data_context, conversation_history, data_type='customers', organization_id=org_id)
+    
+    def _customers_chat_context(self, org_id: str) -> Dict:
+        """Summary figures and enriched customer rows for the customers chat prompt."""
         response = self.admin.table('customers')\
             .select('*')\
             .eq('organization_id', org_id)\
+            .order('id')\
             .execute()
         
         customers = response.data
@@ -192,6 +212,7 @@ class CustomerHealthService:
             total_mrr += float(customer.get('mrr', 0))
             
             enriched_customers.append({
+                'id': customer.get('id'),
                 'company': customer.get('company'),
                 'email': customer.get('email'),
                 'plan': customer.get('plan'),
@@ -214,27 +235,7 @@ class CustomerHealthService:
             'all_customers': enriched_customers
         }
         
-        # Get AI response
-        try:
-            gemini = get_gemini_client()
-            result = gemini.chat_with_data(user_id, message, data_context, conversation_history, data_type='customers')
-            
-            return {
-                'response': result.get('response', 'I apologize, I could not process that request.'),
-                'success': result.get('success', False)
-            }
-        except Exception as e:
-            print(f"Chat error: {e}")
-            return {
-                'response': f"I'm having trouble processing your question right now. Error: {str(e)}",
-                'success': False
-            }
-        
-        return {
-            'message': f'{len(new_customers)} customers uploaded, {duplicates} duplicates skipped',
-            'uploaded': len(new_customers),
-            'duplicates': duplicates
-        }
+        return data_context
     
     def get_dashboard_stats(self, org_id: str) -> Dict:
         """Get customer health dashboard statistics."""
@@ -378,7 +379,7 @@ Each should be a concise sentence (max 100 characters).
         
         try:
             gemini = get_gemini_client()
-            ai_response = gemini.generate_text(prompt)
+            ai_response = gemini.generate_text(prompt, cache=True)
             
             import json
             import re
@@ -1,6 +1,7 @@
 """Data labeling service for dataset management and labeling."""
 from app.extensions import get_supabase_admin
 from app.utils.csv_parser import parse_labeling_csv
+from app.modules.usage_counters import adjust_usage
 from datetime import datetime, timezone
 import csv
 from io import StringIO
@@ -69,6 +70,7 @@ class DataLabelingService:
             .execute()
         
         dataset = dataset_response.data[0]
+        adjust_usage(org_id, datasets=1, total_rows=len(rows))
         
         # Insert all rows
         labeling_rows = []
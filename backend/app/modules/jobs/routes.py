@@ -31,6 +31,48 @@ def get_statistics():
         print(f"Error fetching statistics: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@jobs_bp.route('/bulk/status', methods=['POST'])
+@require_auth
+@require_role('org_owner', 'org_member')
+def bulk_update_status():
+    """Set the status of several jobs at once"""
+    try:
+        organization_id = request.organization_id
+        data = request.get_json() or {}
+        
+        job_ids = data.get('job_ids')
+        status = data.get('status')
+        
+        if not isinstance(job_ids, list) or not status:
+            return jsonify({'error': 'job_ids (list) and status are required'}), 400
+        
+        jobs = JobsService.bulk_update_status(organization_id, job_ids, status)
+        return jsonify({'jobs': jobs, 'updated': len(jobs)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error bulk updating jobs: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/bulk/delete', methods=['POST'])
+@require_auth
+@require_role('org_owner', 'org_member')
+def bulk_delete_jobs():
+    """Delete several jobs at once"""
+    try:
+        organization_id = request.organization_id
+        data = request.get_json() or {}
+        
+        job_ids = data.get('job_ids')
+        if not isinstance(job_ids, list):
+            return jsonify({'error': 'job_ids (list) is required'}), 400
+        
+        deleted = JobsService.bulk_delete_jobs(organization_id, job_ids)
+        return jsonify({'deleted': deleted}), 200
+    except Exception as e:
+        print(f"Error bulk deleting jobs: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @jobs_bp.route('/<job_id>', methods=['GET'])
 @require_auth
 @require_role('org_owner', 'org_member')
@@ -1,4 +1,12 @@
 from app.extensions import get_supabase_admin
+from app.modules.usage_counters import adjust_usage
+
+JOB_STATUSES = ('open', 'in_progress', 'completed')
+
+# Talent task counters (tasks_assigned / tasks_completed / tasks_pending) follow
+# job inserts, updates and deletes through triggers on the jobs table (see
+# database/talent-task-counters.sql), so nothing here adjusts them.
+
 
 class JobsService:
     @staticmethod
@@ -48,16 +56,7 @@ class JobsService:
         response = supabase.table('jobs') \
             .insert(job_data) \
             .execute()
-        
-        # Update talent task counters if assigned
-        if assigned_talent_id:
-            # Get current talent data
-            talent = supabase.table('talent').select('*').eq('id', assigned_talent_id).single().execute()
-            if talent.data:
-                supabase.table('talent').update({
-                    'tasks_assigned': talent.data['tasks_assigned'] + 1,
-                    'tasks_pending': talent.data['tasks_pending'] + 1
-                }).eq('id', assigned_talent_id).execute()
+        adjust_usage(organization_id, jobs=len(response.data))
         
         return response.data[0]
     
@@ -99,39 +98,24 @@ class JobsService:
         """Mark job as completed"""
         supabase = get_supabase_admin()
         
-        # Get job to check if it has assigned talent
-        job = supabase.table('jobs').select('*').eq('id', job_id).eq('organization_id', organization_id).single().execute()
-        
-        print(f"[mark_completed] Job data: {job.data}")
-        
-        if not job.data:
-            print("[mark_completed] No job found")
-            return None
-        
+        # Only rows that weren't completed yet are returned
         response = supabase.table('jobs') \
             .update({'status': 'completed'}) \
             .eq('id', job_id) \
             .eq('organization_id', organization_id) \
+            .neq('status', 'completed') \
             .execute()
         
-        print(f"[mark_completed] Updated job status: {response.data}")
-        
-        # Update talent counters if job was assigned and not already completed
-        if job.data.get('assigned_talent_id') and job.data.get('status') != 'completed':
-            talent_id = job.data['assigned_talent_id']
-            print(f"[mark_completed] Updating talent {talent_id} counters")
-            talent = supabase.table('talent').select('*').eq('id', talent_id).single().execute()
-            if talent.data:
-                print(f"[mark_completed] Current talent data: tasks_completed={talent.data['tasks_completed']}, tasks_pending={talent.data['tasks_pending']}")
-                update_result = supabase.table('talent').update({
-                    'tasks_completed': talent.data['tasks_completed'] + 1,
-                    'tasks_pending': max(0, talent.data['tasks_pending'] - 1)
-                }).eq('id', talent_id).execute()
-                print(f"[mark_completed] Updated talent: {update_result.data}")
-        else:
-            print(f"[mark_completed] Skipping talent update: assigned={job.data.get('assigned_talent_id')}, status={job.data.get('status')}")
+        if not response.data:
+            # Missing, or already completed
+            existing = supabase.table('jobs') \
+                .select('*') \
+                .eq('id', job_id) \
+                .eq('organization_id', organization_id) \
+                .execute()
+            return existing.data[0] if existing.data else None
         
-        return response.data[0] if response.data else None
+        return response.data[0]
     
     @staticmethod
     def delete_job(organization_id, job_id):
@@ -143,9 +127,47 @@ class JobsService:
             .eq('id', job_id) \
             .eq('organization_id', organization_id) \
             .execute()
+        adjust_usage(organization_id, jobs=-len(response.data or []))
         
         return True
     
+    @staticmethod
+    def bulk_update_status(organization_id, job_ids, status):
+        """Set the status of many jobs; counters change once per affected talent"""
+        supabase = get_supabase_admin()
+        
+        if status not in JOB_STATUSES:
+            raise ValueError(f"Invalid status: {status}")
+        if not job_ids:
+            return []
+        
+        response = supabase.table('jobs') \
+            .update({'status': status}) \
+            .eq('organization_id', organization_id) \
+            .in_('id', job_ids) \
+            .neq('status', status) \
+            .execute()
+        
+        return response.data or []
+    
+    @staticmethod
+    def bulk_delete_jobs(organization_id, job_ids):
+        """Delete many jobs; counters change once per affected talent"""
+        supabase = get_supabase_admin()
+        
+        if not job_ids:
+            return 0
+        
+        response = supabase.table('jobs') \
+            .delete() \
+            .eq('organization_id', organization_id) \
+            .in_('id', job_ids) \
+            .execute()
+        deleted = response.data or []
+        adjust_usage(organization_id, jobs=-len(deleted))
+        
+        return len(deleted)
+    
     @staticmethod
     def get_statistics(organization_id):
         """Get job statistics for the organization"""
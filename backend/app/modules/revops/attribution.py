@@ -0,0 +1,256 @@
+"""
+Multi-Touch Attribution
+Credits converted leads' revenue across the campaigns in their touchpoint
+history (lead_touchpoints) instead of only the lead's own campaign_id.
+
+Models, per converted lead with n touches up to its conversion date:
+- first_touch / last_touch: all credit to the first / last touch
+- linear: 1/n per touch
+- time_decay: weight 2^(-age / half-life), age measured back from conversion
+- position_based: 40% first, 40% last, 20% split across the middle touches
+  (50/50 with two touches)
+
+The engine is columnar: touches are integer-coded lead/campaign arrays plus
+int64 microsecond timestamps, weights are computed with one sort and per-lead
+bincounts, and credited revenue is a weighted bincount per campaign — no
+per-touch Python work after loading.
+
+Loading is most of run_attribution's cost. Only touches of converted leads are
+fetched: an inner join on leads keeps open leads' touches in the database. They
+arrive in ATTRIBUTION_PAGE_SIZE keyset pages, one round trip each, about 1,000
+per million touches. Turning those rows into arrays takes about 2s per million
+touches. The engine then takes about 0.3s (benchmarks/bench_attribution.py
+reports both).
+"""
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from app.extensions import get_supabase_admin
+from app.modules.revops.batch_scoring import MICROS_PER_DAY, to_epoch_seconds
+from app.modules.revops.money import cents_array, to_units
+
+ATTRIBUTION_MODELS = ('first_touch', 'last_touch', 'linear', 'time_decay', 'position_based')
+DEFAULT_ATTRIBUTION_MODEL = 'linear'
+TIME_DECAY_HALF_LIFE_DAYS = float(os.getenv('ATTRIBUTION_HALF_LIFE_DAYS', 7))
+POSITION_BASED_ENDPOINT_SHARE = 0.4
+TOUCHPOINT_PAGE_SIZE = int(os.getenv('ATTRIBUTION_PAGE_SIZE', 1000))
+
+_NO_CONVERSION_DATE = np.iinfo(np.int64).max
+
+
+def to_micros(values: Sequence) -> np.ndarray:
+    """ISO strings / datetimes -> int64 epoch microseconds (missing -> int64 max)."""
+    epochs = np.fromiter((to_epoch_seconds(value) for value in values), dtype=np.float64, count=len(values))
+    missing = np.isnan(epochs)
+    micros = np.rint(np.where(missing, 0, epochs) * 1_000_000).astype(np.int64)
+    micros[missing] = _NO_CONVERSION_DATE
+    return micros
+
+
+def encode(values: Sequence, codes_by_value: Dict) -> np.ndarray:
+    """Map values to integer codes from codes_by_value; unknown values -> -1."""
+    return np.fromiter((codes_by_value.get(value, -1) for value in values), dtype=np.int64, count=len(values))
+
+
+def touch_weights(
+    lead_codes: np.ndarray,
+    occurred_us: np.ndarray,
+    reference_us: np.ndarray,
+    model: str,
+    half_life_days: float = TIME_DECAY_HALF_LIFE_DAYS
+) -> np.ndarray:
+    """
+    Credit share of each touch within its lead (shares sum to 1 per lead).
+
+    lead_codes / occurred_us describe the touches (any order); reference_us is
+    the per-lead time time_decay ages are measured back from.
+    """
+    if model not in ATTRIBUTION_MODELS:
+        raise ValueError(f"Unknown attribution model '{model}'. Use one of: {', '.join(ATTRIBUTION_MODELS)}")
+
+    weights = np.zeros(len(lead_codes), dtype=np.float64)
+    if not len(lead_codes):
+        return weights
+
+    # Touches grouped by lead, chronological within each lead (stable for ties)
+    order = np.lexsort((occurred_us, lead_codes))
+    leads = lead_codes[order]
+    counts = np.bincount(leads)
+    starts = np.cumsum(counts) - counts
+    position = np.arange(len(leads)) - starts[leads]
+    n = counts[leads]
+
+    if model == 'first_touch':
+        sorted_weights = (position == 0).astype(np.float64)
+    elif model == 'last_touch':
+        sorted_weights = (position == n - 1).astype(np.float64)
+    elif model == 'linear':
+        sorted_weights = 1.0 / n
+    elif model == 'time_decay':
+        age_days = (reference_us[leads] - occurred_us[order]) / MICROS_PER_DAY
+        decay = np.exp2(-np.maximum(age_days, 0) / half_life_days)
+        sorted_weights = decay / np.bincount(leads, weights=decay)[leads]
+    else:  # position_based
+        endpoint = POSITION_BASED_ENDPOINT_SHARE
+        is_endpoint = (position == 0) | (position == n - 1)
+        middle = (1 - 2 * endpoint) / np.maximum(n - 2, 1)
+        sorted_weights = np.where(is_endpoint, endpoint, middle)
+        sorted_weights[n == 1] = 1.0
+        sorted_weights[n == 2] = 0.5
+
+    weights[order] = sorted_weights
+    return weights
+
+
+def attribute(
+    lead_codes: np.ndarray,
+    campaign_codes: np.ndarray,
+    occurred_us: np.ndarray,
+    lead_revenue_cents: np.ndarray,
+    lead_conversion_us: np.ndarray,
+    n_campaigns: int,
+    model: str = DEFAULT_ATTRIBUTION_MODEL,
+    half_life_days: float = TIME_DECAY_HALF_LIFE_DAYS
+) -> Dict[str, np.ndarray]:
+    """
+    Credited touches / conversions / revenue per campaign code.
+
+    Touches with lead code -1 (lead not converted) or after the lead's
+    conversion are ignored. Touches without a campaign (code -1) still take
+    their share of credit; that share is reported as unattributed.
+    """
+    lead_codes = np.asarray(lead_codes, dtype=np.int64)
+    campaign_codes = np.asarray(campaign_codes, dtype=np.int64)
+    occurred_us = np.asarray(occurred_us, dtype=np.int64)
+
+    keep = lead_codes >= 0
+    keep[keep] = occurred_us[keep] <= lead_conversion_us[lead_codes[keep]]
+    leads, campaigns, occurred = lead_codes[keep], campaign_codes[keep], occurred_us[keep]
+
+    # Leads without a conversion date age from their last touch
+    last_touch = np.full(len(lead_revenue_cents), np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(last_touch, leads, occurred)
+    reference = np.where(lead_conversion_us == _NO_CONVERSION_DATE, last_touch, lead_conversion_us)
+
+    weights = touch_weights(leads, occurred, reference, model, half_life_days)
+    credited_cents = weights * lead_revenue_cents[leads]
+
+    has_campaign = campaigns >= 0
+    touched = np.bincount(leads, minlength=len(lead_revenue_cents)) > 0
+    return {
+        'touches': np.bincount(campaigns[has_campaign], minlength=n_campaigns),
+        'credited_conversions': np.bincount(campaigns[has_campaign], weights=weights[has_campaign], minlength=n_campaigns),
+        'credited_revenue_cents': np.bincount(campaigns[has_campaign], weights=credited_cents[has_campaign], minlength=n_campaigns),
+        'unattributed_revenue_cents': float(credited_cents[~has_campaign].sum() + lead_revenue_cents[~touched].sum()),
+        'converted_leads_touched': int(touched.sum())
+    }
+
+
+def _fetch_all(query_factory, page_size: int = TOUCHPOINT_PAGE_SIZE) -> List[Dict]:
+    """
+    Page through a query ordered by `id`, keyset style.
+
+    Stops on an empty page rather than a short one: PostgREST's max-rows
+    setting can cap a page below page_size.
+    """
+    rows = []
+    last_id = None
+    while True:
+        query = query_factory()
+        if last_id is not None:
+            query = query.gt('id', last_id)
+        page = query.order('id').limit(page_size).execute().data or []
+        if not page:
+            return rows
+        rows.extend(page)
+        last_id = page[-1]['id']
+
+
+def run_attribution(
+    organization_id: str,
+    model: str = DEFAULT_ATTRIBUTION_MODEL,
+    half_life_days: float = TIME_DECAY_HALF_LIFE_DAYS
+) -> Dict:
+    """Compute credited revenue per campaign for one model and store it in campaign_attribution."""
+    if model not in ATTRIBUTION_MODELS:
+        raise ValueError(f"Unknown attribution model '{model}'. Use one of: {', '.join(ATTRIBUTION_MODELS)}")
+    admin = get_supabase_admin()
+
+    converted = _fetch_all(lambda: admin.table('leads')
+                           .select('id, revenue, conversion_date')
+                           .eq('organization_id', organization_id)
+                           .eq('converted', True))
+    campaigns = _fetch_all(lambda: admin.table('campaigns')
+                           .select('id')
+                           .eq('organization_id', organization_id))
+    # Touches of leads that never converted get no credit; leave them in the database
+    touches = _fetch_all(lambda: admin.table('lead_touchpoints')
+                         .select('id, lead_id, campaign_id, occurred_at, leads!inner(converted)')
+                         .eq('organization_id', organization_id)
+                         .eq('leads.converted', True))
+
+    lead_index = {lead['id']: code for code, lead in enumerate(converted)}
+    campaign_ids = [campaign['id'] for campaign in campaigns]
+    campaign_index = {campaign_id: code for code, campaign_id in enumerate(campaign_ids)}
+
+    result = attribute(
+        encode([touch['lead_id'] for touch in touches], lead_index),
+        encode([touch.get('campaign_id') for touch in touches], campaign_index),
+        to_micros([touch['occurred_at'] for touch in touches]),
+        cents_array(lead.get('revenue') for lead in converted),
+        to_micros([lead.get('conversion_date') for lead in converted]),
+        len(campaign_ids),
+        model=model,
+        half_life_days=half_life_days
+    )
+
+    revenue_cents = np.rint(result['credited_revenue_cents']).astype(np.int64)
+    rows = [
+        {
+            'campaign_id': campaign_id,
+            'touches': touch_count,
+            'credited_conversions': round(conversions, 4),
+            'credited_revenue': to_units(cents)
+        }
+        for campaign_id, touch_count, conversions, cents in zip(
+            campaign_ids,
+            result['touches'].tolist(),
+            result['credited_conversions'].tolist(),
+            revenue_cents.tolist()
+        )
+        if touch_count
+    ]
+    written = admin.rpc('replace_campaign_attribution', {
+        'org_id': organization_id,
+        'attribution_model': model,
+        'results': rows
+    }).execute().data or 0
+
+    summary = {
+        'model': model,
+        'touches': len(touches),
+        'converted_leads': len(converted),
+        'converted_leads_touched': result['converted_leads_touched'],
+        'campaigns': written,
+        'credited_revenue': to_units(int(revenue_cents.sum())),
+        'unattributed_revenue': to_units(round(result['unattributed_revenue_cents'])),
+        'computed_at': datetime.now(timezone.utc).isoformat()
+    }
+    print(f"[run_attribution] {model}: {summary['touches']} touches, {written} campaigns credited for org {organization_id}")
+    return summary
+
+
+def get_attribution(organization_id: str, model: str = DEFAULT_ATTRIBUTION_MODEL) -> List[Dict]:
+    """Stored results for a model, best credited revenue first."""
+    if model not in ATTRIBUTION_MODELS:
+        raise ValueError(f"Unknown attribution model '{model}'. Use one of: {', '.join(ATTRIBUTION_MODELS)}")
+    response = get_supabase_admin().table('campaign_attribution')\
+        .select('campaign_id, model, touches, credited_conversions, credited_revenue, attributed_roi, computed_at, campaigns(name, channel, spend)')\
+        .eq('organization_id', organization_id)\
+        .eq('model', model)\
+        .order('credited_revenue', desc=True)\
+        .execute()
+    return response.data or []
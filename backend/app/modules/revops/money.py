@@ -0,0 +1,125 @@
+"""
+Money Helpers
+Amounts are handled as int64 cents: exact to add and compare, and cheap to
+aggregate in NumPy, unlike per-value Decimal(str(x)) conversions. Values arrive
+from PostgREST / CSV as floats, ints or numeric strings, are converted to cents
+once, and only turned back into dollars (float) for JSON and prompt output.
+ROI is a ratio, not money: it is computed from the integer cents with a single
+division.
+"""
+from typing import Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+
+CENTS_PER_UNIT = 100
+
+
+def to_cents(value) -> int:
+    """Convert a money value (int / float / numeric string / None) to integer cents."""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int):
+        return value * CENTS_PER_UNIT
+    if isinstance(value, str):
+        return _parse_cents(value)
+    # Floats from JSON carry at most 2 decimals of real precision; rounding
+    # x * 100 recovers the exact cent (e.g. 19.99 * 100 = 1998.999...)
+    return int(round(float(value) * CENTS_PER_UNIT))
+
+
+def _parse_cents(text: str) -> int:
+    """Exact decimal string -> cents, rounding half away from zero past 2 decimals."""
+    text = text.strip().replace(',', '')
+    negative = text.startswith('-')
+    whole, _, fraction = text.lstrip('+-').partition('.')
+    if not (whole or fraction) or not (whole or '0').isdigit() or (fraction and not fraction.isdigit()):
+        return int(round(float(text) * CENTS_PER_UNIT))  # exponent notation and the like
+    fraction = fraction.ljust(3, '0')
+    cents = int(whole or 0) * CENTS_PER_UNIT + int(fraction[:2])
+    if fraction[2] >= '5':
+        cents += 1
+    return -cents if negative else cents
+
+
+def cents_array(values: Iterable) -> np.ndarray:
+    """Column of money values -> int64 cents array."""
+    values = list(values)
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return np.rint(np.asarray(values, dtype=np.float64) * CENTS_PER_UNIT).astype(np.int64)
+    return np.fromiter((to_cents(value) for value in values), dtype=np.int64, count=len(values))
+
+
+def to_units(cents) -> float:
+    """Cents -> dollars as a float, for JSON responses and prompts."""
+    return int(cents) / CENTS_PER_UNIT
+
+
+def roi_ratio(spend_cents: int, revenue_cents: int) -> float:
+    """ROI as a ratio: (revenue - spend) / spend, 0 when there is no spend."""
+    if spend_cents <= 0:
+        return 0.0
+    return (int(revenue_cents) - int(spend_cents)) / int(spend_cents)
+
+
+def roi_ratios(spend_cents: np.ndarray, revenue_cents: np.ndarray) -> np.ndarray:
+    """Vectorized roi_ratio over cents arrays."""
+    spend = np.asarray(spend_cents, dtype=np.int64)
+    revenue = np.asarray(revenue_cents, dtype=np.int64)
+    safe_spend = np.where(spend > 0, spend, 1)
+    return np.where(spend > 0, (revenue - spend) / safe_spend, 0.0)
+
+
+def group_sums(keys: Sequence, *columns: np.ndarray) -> Tuple[list, list]:
+    """
+    Sum int64 columns per key, exactly (np.add.at, not float bincount).
+
+    Returns (unique keys in first-seen order, [per-key sums for each column]).
+    """
+    codes_by_key = {}
+    codes = np.fromiter(
+        (codes_by_key.setdefault(key, len(codes_by_key)) for key in keys),
+        dtype=np.int64,
+        count=len(keys)
+    )
+    sums = []
+    for column in columns:
+        totals = np.zeros(len(codes_by_key), dtype=np.int64)
+        np.add.at(totals, codes, column)
+        sums.append(totals)
+    return list(codes_by_key), sums
+
+
+def summarize_campaigns(campaigns: Sequence[Dict]) -> Dict:
+    """
+    Spend / revenue totals and per-channel breakdown for a list of campaign rows.
+
+    Returns cents totals, the portfolio ROI ratio, the mean of the stored
+    campaign ROIs, and {channel: {'count', 'spend_cents', 'revenue_cents', 'roi'}}.
+    """
+    spend = cents_array(campaign.get('spend') for campaign in campaigns)
+    revenue = cents_array(campaign.get('revenue') for campaign in campaigns)
+    stored_roi = np.asarray([float(campaign.get('roi') or 0) for campaign in campaigns], dtype=np.float64)
+
+    channels, (channel_spend, channel_revenue, channel_count) = group_sums(
+        [campaign.get('channel', 'unknown') for campaign in campaigns],
+        spend, revenue, np.ones(len(campaigns), dtype=np.int64)
+    )
+    channel_roi = roi_ratios(channel_spend, channel_revenue)
+
+    total_spend = int(spend.sum())
+    total_revenue = int(revenue.sum())
+    return {
+        'total_spend_cents': total_spend,
+        'total_revenue_cents': total_revenue,
+        'portfolio_roi': roi_ratio(total_spend, total_revenue),
+        'mean_roi': float(stored_roi.mean()) if len(campaigns) else 0.0,
+        'channels': {
+            channel: {
+                'count': int(channel_count[i]),
+                'spend_cents': int(channel_spend[i]),
+                'revenue_cents': int(channel_revenue[i]),
+                'roi': float(channel_roi[i]) if channel_spend[i] > 0 else None
+            }
+            for i, channel in enumerate(channels)
+        }
+    }
@@ -0,0 +1,76 @@
+"""
+Lead Score Decay
+Stored lead scores include a recency component that drops 1, 4 and 8 days after
+the last activity. Every scoring write also stores `score_refresh_at`, the next
+of those boundaries; this job rescores only leads whose boundary has passed, in
+batches, so its cost is the number of leads that changed bucket rather than the
+number of leads.
+
+Run it periodically, e.g. hourly from cron: `flask rescore-leads`
+"""
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.extensions import get_supabase_admin
+from app.modules.revops.batch_scoring import (
+    next_recency_changes, score_leads_batch, to_epoch_seconds, to_isoformat
+)
+
+RESCORE_BATCH_SIZE = int(os.getenv('LEAD_RESCORE_BATCH_SIZE', 1000))
+
+
+def rescore_due_leads(
+    organization_id: Optional[str] = None,
+    as_of: Optional[datetime] = None,
+    batch_size: int = RESCORE_BATCH_SIZE,
+    max_batches: Optional[int] = None
+) -> Dict[str, int]:
+    """Rescore leads whose recency bucket changed; returns scanned/updated/batch counts."""
+    admin = get_supabase_admin()
+    as_of = as_of or datetime.now(timezone.utc)
+    stats = {'scanned': 0, 'updated': 0, 'batches': 0}
+
+    while max_batches is None or stats['batches'] < max_batches:
+        query = admin.table('leads')\
+            .select('id, source, engagement_level, status, last_activity_date, updated_at')\
+            .lte('score_refresh_at', as_of.isoformat())
+        if organization_id:
+            query = query.eq('organization_id', organization_id)
+        rows = query.order('score_refresh_at').limit(batch_size).execute().data or []
+        if not rows:
+            break
+
+        epochs = [to_epoch_seconds(row.get('last_activity_date')) for row in rows]
+        scores, temperatures = score_leads_batch(
+            [row.get('source') for row in rows],
+            [row.get('engagement_level') for row in rows],
+            epochs,
+            [row.get('status') for row in rows],
+            as_of=as_of
+        )
+        refresh_at = to_isoformat(next_recency_changes(epochs, as_of))
+
+        updates = [
+            {
+                'id': row['id'],
+                'score': score,
+                'temperature': temperature,
+                'score_refresh_at': refresh,
+                'updated_at': row.get('updated_at')
+            }
+            for row, score, temperature, refresh in zip(rows, scores.tolist(), temperatures.tolist(), refresh_at)
+        ]
+        applied = admin.rpc('apply_lead_rescores', {'updates': updates}).execute().data or 0
+
+        stats['scanned'] += len(rows)
+        stats['updated'] += applied
+        stats['batches'] += 1
+
+        # A short page means nothing else is due; no progress means every row
+        # was edited concurrently and will be picked up next run
+        if len(rows) < batch_size or applied == 0:
+            break
+
+    print(f"[rescore_due_leads] {stats['updated']} of {stats['scanned']} due leads rescored in {stats['batches']} batches")
+    return stats
@@ -1,19 +1,45 @@
 """RevOps module routes."""
-from flask import Blueprint, request, jsonify
+import json
+from itertools import chain
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from app.auth.decorators import require_auth, require_role
+from app.utils.bulk_insert import DuplicateRowError
+from app.utils.sse import event_stream_response, stream_requested, wants_event_stream
 from .services import revops_service
 
 revops_bp = Blueprint('revops', __name__)
 
 
+def _csv_arg(args, name):
+    """Comma-separated query parameter -> list (None when absent)."""
+    value = args.get(name)
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+def lead_list_args(args):
+    """Translate GET /leads query parameters into RevOpsService.get_leads kwargs."""
+    return {
+        'sort_by': args.get('sort_by', 'score'),
+        'limit': args.get('limit', type=int),
+        'cursor': args.get('cursor'),
+        'fields': _csv_arg(args, 'fields'),
+        'temperature': _csv_arg(args, 'temperature'),
+        'status': _csv_arg(args, 'status'),
+        'source': _csv_arg(args, 'source')
+    }
+
+
 @revops_bp.route('/leads', methods=['GET'])
 @require_auth
 @require_role('org_owner', 'org_member')
 def get_leads():
-    """Get all leads for organization."""
+    """Get a page of leads for organization (?cursor=&limit=&fields=&temperature=&status=&source=)."""
     org_id = request.organization_id
-    sort_by = request.args.get('sort_by', 'score')
-    result = revops_service.get_leads(org_id, sort_by)
+    try:
+        result = revops_service.get_leads(org_id, **lead_list_args(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify(result), 200
 
 
@@ -24,7 +50,10 @@ def create_lead():
     """Create a new lead."""
     org_id = request.organization_id
     data = request.get_json()
-    result = revops_service.create_lead(org_id, data)
+    try:
+        result = revops_service.create_lead(org_id, data)
+    except DuplicateRowError as e:
+        return jsonify({'error': str(e)}), 409
     return jsonify(result), 201
 
 
@@ -44,6 +73,14 @@ def upload_leads():
         return jsonify({'error': 'No file provided'}), 400
     
     try:
+        # ?stream=1 -> NDJSON, one progress line per chunk plus a final summary
+        if stream_requested(request):
+            events = revops_service.upload_leads_csv_stream(org_id, file)
+            # Pull the first chunk now so header errors still return a 400
+            first = next(events)
+            lines = (json.dumps(event) + '\n' for event in chain([first], events))
+            return Response(stream_with_context(lines), status=201, mimetype='application/x-ndjson')
+        
         result = revops_service.upload_leads_csv(org_id, file)
         return jsonify(result), 201
     except Exception as e:
@@ -84,7 +121,7 @@ def analyze_leads():
 @require_auth
 @require_role('org_owner', 'org_member')
 def chat_with_leads():
-    """Chat with AI about leads data."""
+    """Chat with AI about leads data (streamed as SSE with ?stream=1)."""
     org_id = request.organization_id
     user_id = request.user.id  # Get user ID from authenticated user
     data = request.get_json()
@@ -97,6 +134,11 @@ def chat_with_leads():
     try:
         print(f"[chat_with_leads] Starting chat for org {org_id}")
         print(f"[chat_with_leads] Message: {message}")
+        # ?stream=1 or Accept: text/event-stream -> SSE chunk events, then done / error
+        if wants_event_stream(request):
+            return event_stream_response(
+                revops_service.chat_about_leads_stream(org_id, user_id, message, conversation_history)
+            )
         result = revops_service.chat_about_leads(org_id, user_id, message, conversation_history)
         print(f"[chat_with_leads] Success")
         return jsonify(result), 200
@@ -147,7 +189,10 @@ def create_campaign():
     """Create a new campaign."""
     org_id = request.organization_id
     data = request.get_json()
-    result = revops_service.create_campaign(org_id, data)
+    try:
+        result = revops_service.create_campaign(org_id, data)
+    except DuplicateRowError as e:
+        return jsonify({'error': str(e)}), 409
     return jsonify(result), 201
 
 
@@ -161,6 +206,17 @@ def clear_campaigns():
     return jsonify(result), 200
 
 
+@revops_bp.route('/campaigns/recompute', methods=['POST'])
+@require_auth
+@require_role('org_owner')
+def recompute_campaign_stats():
+    """Repair: rebuild campaign stats from leads (optionally one campaign_id)."""
+    org_id = request.organization_id
+    data = request.get_json(silent=True) or {}
+    result = revops_service.recompute_campaign_stats(org_id, data.get('campaign_id'))
+    return jsonify(result), 200
+
+
 @revops_bp.route('/campaigns/upload', methods=['POST'])
 @require_auth
 @require_role('org_owner', 'org_member')
@@ -201,7 +257,7 @@ def analyze_campaigns():
 @require_auth
 @require_role('org_owner', 'org_member')
 def chat_with_campaigns():
-    """Chat with AI about campaigns data."""
+    """Chat with AI about campaigns data (streamed as SSE with ?stream=1)."""
     org_id = request.organization_id
     user_id = request.user.id
     data = request.get_json()
@@ -212,6 +268,10 @@ def chat_with_campaigns():
         return jsonify({'error': 'Message is required'}), 400
     
     try:
+        if wants_event_stream(request):
+            return event_stream_response(
+                revops_service.chat_about_campaigns_stream(org_id, user_id, message, conversation_history)
+            )
         result = revops_service.chat_about_campaigns(org_id, user_id, message, conversation_history)
         return jsonify(result), 200
     except Exception as e:
@@ -221,6 +281,49 @@ def chat_with_campaigns():
         return jsonify({'error': str(e)}), 500
 
 
+# Attribution routes
+
+@revops_bp.route('/touchpoints', methods=['POST'])
+@require_auth
+@require_role('org_owner', 'org_member')
+def record_touchpoints():
+    """Record lead touchpoints: {"touchpoints": [{lead_id, campaign_id, channel, touch_type, occurred_at}]}."""
+    org_id = request.organization_id
+    data = request.get_json(silent=True) or {}
+    try:
+        result = revops_service.record_touchpoints(org_id, data.get('touchpoints'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 201
+
+
+@revops_bp.route('/attribution', methods=['GET'])
+@require_auth
+@require_role('org_owner', 'org_member')
+def get_attribution():
+    """Get stored per-campaign credited revenue (?model=linear)."""
+    org_id = request.organization_id
+    try:
+        result = revops_service.get_attribution(org_id, request.args.get('model', 'linear'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
+
+
+@revops_bp.route('/attribution/run', methods=['POST'])
+@require_auth
+@require_role('org_owner')
+def run_attribution():
+    """Recompute multi-touch attribution for a model: {"model": "time_decay"}."""
+    org_id = request.organization_id
+    data = request.get_json(silent=True) or {}
+    try:
+        result = revops_service.run_attribution(org_id, data.get('model', 'linear'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
+
+
 # Dashboard route
 
 @revops_bp.route('/dashboard', methods=['GET'])
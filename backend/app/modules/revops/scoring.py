@@ -2,15 +2,82 @@
 Lead Scoring Engine - MVP
 Simple, deterministic scoring based on Source + Engagement + Recency + Status
 """
-from datetime import datetime, timezone
-from typing import Dict, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+SOURCE_SCORES = {
+    'website_form': 20,
+    'inbound_referral': 25,
+    'paid_ads': 15,
+    'cold_list': 5
+}
+
+ENGAGEMENT_SCORES = {
+    'form_filled': 20,
+    'email_replied': 25,
+    'multiple_visits': 15,
+    'none': 0
+}
+
+STATUS_MODIFIERS = {
+    'contacted': -5,
+    'qualified': 10,
+    'lost': -30,
+    'new': 0,
+    'converted': 0
+}
+
+# (max whole days since last activity, points, label); older than the last bucket scores 0
+RECENCY_BUCKETS = (
+    (0, 20, '< 1 day'),
+    (3, 15, '1-3 days'),
+    (7, 10, '3-7 days')
+)
+STALE_RECENCY_LABEL = '> 7 days'
+
+HOT_THRESHOLD = 80
+WARM_THRESHOLD = 50
+
+
+def recency_score(days_since: int) -> Tuple[int, str]:
+    """Points and label for whole days since the last activity."""
+    for max_days, points, label in RECENCY_BUCKETS:
+        if days_since <= max_days:
+            return points, label
+    return 0, STALE_RECENCY_LABEL
+
+
+def next_recency_change(last_activity_date: datetime, as_of: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    When the recency component of a score next changes, i.e. the lead crosses
+    the 1 / 3 / 7 day boundary. None once it is past the last bucket (or has no
+    activity date), since the score can no longer decay.
+    """
+    if not last_activity_date:
+        return None
+    now = as_of or datetime.now(timezone.utc)
+    for max_days, _, _ in RECENCY_BUCKETS:
+        boundary = last_activity_date + timedelta(days=max_days + 1)
+        if boundary > now:
+            return boundary
+    return None
+
+
+def score_temperature(score: int) -> str:
+    """Map a 0-100 score to hot / warm / cold."""
+    if score >= HOT_THRESHOLD:
+        return 'hot'  # 🔥
+    if score >= WARM_THRESHOLD:
+        return 'warm'  # 🟡
+    return 'cold'  # 🔵
 
 
 def calculate_lead_score(
     source: str,
     engagement_level: str,
     last_activity_date: datetime,
-    status: str
+    status: str,
+    as_of: Optional[datetime] = None
 ) -> Tuple[int, str]:
     """
     Calculate lead score (0-100) based on:
@@ -19,70 +86,40 @@ def calculate_lead_score(
     - Recency Score
     - Status Modifier
     
+    Recency is measured against `as_of` (defaults to now).
+    For many leads at once use batch_scoring.score_leads_batch.
+    
     Returns: (score, temperature)
     """
     score = 0
     
     # Source Score
-    source_scores = {
-        'website_form': 20,
-        'inbound_referral': 25,
-        'paid_ads': 15,
-        'cold_list': 5
-    }
-    score += source_scores.get(source, 0)
+    score += SOURCE_SCORES.get(source, 0)
     
     # Engagement Score
-    engagement_scores = {
-        'form_filled': 20,
-        'email_replied': 25,
-        'multiple_visits': 15,
-        'none': 0
-    }
-    score += engagement_scores.get(engagement_level, 0)
+    score += ENGAGEMENT_SCORES.get(engagement_level, 0)
     
     # Recency Score
     if last_activity_date:
-        now = datetime.now(timezone.utc)
+        now = as_of or datetime.now(timezone.utc)
         days_since = (now - last_activity_date).days
-        
-        if days_since < 1:
-            score += 20
-        elif days_since <= 3:
-            score += 15
-        elif days_since <= 7:
-            score += 10
-        # > 7 days: +0
+        score += recency_score(days_since)[0]
     
     # Status Modifier
-    status_modifiers = {
-        'contacted': -5,
-        'qualified': 10,
-        'lost': -30,
-        'new': 0,
-        'converted': 0
-    }
-    score += status_modifiers.get(status, 0)
+    score += STATUS_MODIFIERS.get(status, 0)
     
     # Ensure score is within 0-100
     score = max(0, min(100, score))
     
-    # Determine temperature
-    if score >= 80:
-        temperature = 'hot'  # 🔥
-    elif score >= 50:
-        temperature = 'warm'  # 🟡
-    else:
-        temperature = 'cold'  # 🔵
-    
-    return score, temperature
+    return score, score_temperature(score)
 
 
 def get_score_breakdown(
     source: str,
     engagement_level: str,
     last_activity_date: datetime,
-    status: str
+    status: str,
+    as_of: Optional[datetime] = None
 ) -> Dict:
     """
     Get detailed breakdown of how the score was calculated
@@ -90,51 +127,27 @@ def get_score_breakdown(
     breakdown = {}
     
     # Source Score
-    source_scores = {
-        'website_form': 20,
-        'inbound_referral': 25,
-        'paid_ads': 15,
-        'cold_list': 5
-    }
     breakdown['source'] = {
         'value': source,
-        'score': source_scores.get(source, 0)
+        'score': SOURCE_SCORES.get(source, 0)
     }
     
     # Engagement Score
-    engagement_scores = {
-        'form_filled': 20,
-        'email_replied': 25,
-        'multiple_visits': 15,
-        'none': 0
-    }
     breakdown['engagement'] = {
         'value': engagement_level,
-        'score': engagement_scores.get(engagement_level, 0)
+        'score': ENGAGEMENT_SCORES.get(engagement_level, 0)
     }
     
     # Recency Score
     if last_activity_date:
-        now = datetime.now(timezone.utc)
+        now = as_of or datetime.now(timezone.utc)
         days_since = (now - last_activity_date).days
-        
-        if days_since < 1:
-            recency_score = 20
-            recency_label = '< 1 day'
-        elif days_since <= 3:
-            recency_score = 15
-            recency_label = '1-3 days'
-        elif days_since <= 7:
-            recency_score = 10
-            recency_label = '3-7 days'
-        else:
-            recency_score = 0
-            recency_label = '> 7 days'
+        points, label = recency_score(days_since)
         
         breakdown['recency'] = {
             'days_since': days_since,
-            'label': recency_label,
-            'score': recency_score
+            'label': label,
+            'score': points
         }
     else:
         breakdown['recency'] = {
@@ -144,16 +157,9 @@ def get_score_breakdown(
         }
     
     # Status Modifier
-    status_modifiers = {
-        'contacted': -5,
-        'qualified': 10,
-        'lost': -30,
-        'new': 0,
-        'converted': 0
-    }
     breakdown['status'] = {
         'value': status,
-        'modifier': status_modifiers.get(status, 0)
+        'modifier': STATUS_MODIFIERS.get(status, 0)
     }
     
     # Total
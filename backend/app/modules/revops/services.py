@@ -1,10 +1,66 @@
 """RevOps service for lead scoring and ROI attribution."""
 from app.extensions import get_supabase, get_supabase_admin
-from app.modules.revops.scoring import calculate_lead_score, get_score_breakdown
-from app.modules.revops.roi_calculator import calculate_campaign_roi, get_roi_percentage, get_performance_indicator, aggregate_campaign_metrics
-from app.utils.csv_parser import parse_leads_csv, parse_campaigns_csv
+from app.modules.revops.scoring import calculate_lead_score, get_score_breakdown, next_recency_change
+from app.modules.revops.batch_scoring import score_lead_dicts
+from app.modules.revops.roi_calculator import calculate_campaign_roi, get_roi_percentage, get_performance_indicator
+from app.modules.revops.money import roi_ratio, summarize_campaigns, to_units
+from app.ai.prompt_budget import PromptBudget, fit_breakdowns
+from app.modules.revops.attribution import run_attribution, get_attribution, DEFAULT_ATTRIBUTION_MODEL
+from app.utils.csv_parser import iter_leads_csv, iter_chunks, parse_campaigns_csv
+from app.utils.bulk_insert import dedupe_rows, insert_skip_duplicates, insert_unique, normalize_key
 from datetime import datetime, timezone
-from decimal import Decimal
+from uuid import UUID
+import base64
+import json
+import os
+
+TOUCHPOINT_FIELDS = ('lead_id', 'campaign_id', 'channel', 'touch_type', 'occurred_at', 'metadata')
+MAX_TOUCHPOINTS_PER_REQUEST = 5000
+# IN (...) lookups go in the query string; keep each request's URL short
+ID_LOOKUP_BATCH_SIZE = 100
+LEAD_UPLOAD_CHUNK_SIZE = int(os.getenv('LEAD_UPLOAD_CHUNK_SIZE', 500))
+MAX_REPORTED_UPLOAD_ERRORS = 100
+LEADS_PAGE_SIZE = int(os.getenv('LEADS_PAGE_SIZE', 100))
+LEADS_MAX_PAGE_SIZE = 500
+
+LEAD_COLUMNS = (
+    'id', 'name', 'email', 'phone', 'company', 'source', 'campaign_id', 'status',
+    'engagement_level', 'score', 'temperature', 'last_activity_date', 'converted',
+    'conversion_date', 'revenue', 'metadata', 'created_at', 'updated_at'
+)
+# Default projection for list views: everything except the metadata blob
+LEAD_LIST_COLUMNS = tuple(column for column in LEAD_COLUMNS if column != 'metadata')
+
+
+def _encode_cursor(sort_column: str, value, lead_id: str) -> str:
+    """Opaque page cursor for the last row of a page."""
+    payload = json.dumps([sort_column, value, lead_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str, sort_column: str):
+    """Inverse of _encode_cursor; raises ValueError on anything malformed."""
+    try:
+        column, value, lead_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if column != sort_column or not isinstance(value, (int, float, str, type(None))) or not isinstance(lead_id, str):
+            raise ValueError
+        return value, str(UUID(lead_id))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def _sorted_breakdown(counts: dict) -> dict:
+    """A breakdown in key order, so equal data renders (and caches) the same prompt.
+
+    Keys are compared as strings: a NULL channel/status comes through as None.
+    """
+    return dict(sorted(counts.items(), key=lambda item: str(item[0])))
+
+
+def _or_filter(query, conditions: str):
+    """Add a PostgREST or=(...) filter; postgrest-py 0.13 has no or_()."""
+    query.params = query.params.add('or', f'({conditions})')
+    return query
 
 
 class RevOpsService:
@@ -14,24 +70,64 @@ class RevOpsService:
         self.supabase = get_supabase()
         self.admin = get_supabase_admin()
     
-    def get_leads(self, org_id: str, sort_by: str = 'score'):
-        """Get all leads for organization, sorted by score by default."""
+    def get_leads(self, org_id: str, sort_by: str = 'score', limit: int = None, cursor: str = None,
+                  fields: list = None, temperature: list = None, status: list = None, source: list = None):
+        """
+        Get one page of leads for the organization, sorted by score by default.
+        
+        Keyset pagination on (score, id) or (created_at, id): pass the returned
+        next_cursor back as `cursor` for the following page. `fields` projects
+        columns (metadata is left out unless asked for); temperature / status /
+        source filter server-side.
+        """
+        sort_column = 'score' if sort_by == 'score' else 'created_at'
+        limit = max(1, min(limit or LEADS_PAGE_SIZE, LEADS_MAX_PAGE_SIZE))
+        
+        if fields:
+            unknown = set(fields) - set(LEAD_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown lead fields: {', '.join(sorted(unknown))}")
+        columns = list(dict.fromkeys(['id', sort_column] + list(fields or LEAD_LIST_COLUMNS)))
+        
         query = self.admin.table('leads')\
-            .select('*')\
+            .select(','.join(columns))\
             .eq('organization_id', org_id)
         
-        # Sort by score (descending) or created_at
-        if sort_by == 'score':
-            query = query.order('score', desc=True)
-        else:
-            query = query.order('created_at', desc=True)
-        
-        response = query.execute()
-        
-        return {'leads': response.data}
+        if temperature:
+            query = query.in_('temperature', temperature)
+        if status:
+            query = query.in_('status', status)
+        if source:
+            query = query.in_('source', source)
+        
+        # Rows strictly after the cursor in (sort_column DESC NULLS LAST, id DESC)
+        # order; score and created_at are nullable, and NULLs sort after every value
+        if cursor:
+            value, last_id = _decode_cursor(cursor, sort_column)
+            if value is None:
+                query = query.is_(sort_column, 'null').lt('id', last_id)
+            else:
+                value = json.dumps(value)
+                query = _or_filter(
+                    query,
+                    f'{sort_column}.lt.{value},and({sort_column}.eq.{value},id.lt.{last_id}),{sort_column}.is.null'
+                )
+        
+        # One order param with both keys (chained .order() calls repeat the
+        # param); fetch one extra row to know whether there is another page
+        query.params = query.params.set('order', f'{sort_column}.desc.nullslast,id.desc')
+        response = query.limit(limit + 1).execute()
+        
+        leads = response.data or []
+        has_more = len(leads) > limit
+        leads = leads[:limit]
+        next_cursor = _encode_cursor(sort_column, leads[-1][sort_column], leads[-1]['id']) if has_more else None
+        
+        return {'leads': leads, 'next_cursor': next_cursor, 'has_more': has_more}
     
     def create_lead(self, org_id: str, data: dict):
         """Create a new lead with automatic scoring."""
+        now = datetime.now(timezone.utc)
         lead_data = {
             'organization_id': org_id,
             'name': data.get('name'),
@@ -41,81 +137,120 @@ class RevOpsService:
             'campaign_id': data.get('campaign_id'),
             'status': 'new',
             'engagement_level': data.get('engagement_level', 'none'),
-            'last_activity_date': datetime.now(timezone.utc).isoformat()
+            'last_activity_date': now.isoformat()
         }
         
         # Calculate score
         score, temperature = calculate_lead_score(
             lead_data['source'],
             lead_data['engagement_level'],
-            datetime.now(timezone.utc),
-            lead_data['status']
+            now,
+            lead_data['status'],
+            as_of=now
         )
         
         lead_data['score'] = score
         lead_data['temperature'] = temperature
+        lead_data['score_refresh_at'] = next_recency_change(now, as_of=now).isoformat()
         
-        response = self.admin.table('leads')\
-            .insert(lead_data)\
-            .execute()
+        lead = insert_unique('leads', lead_data, f"A lead with email {lead_data['email']} already exists")
         
-        return {'lead': response.data[0]}
+        return {'lead': lead}
     
-    def upload_leads_csv(self, org_id: str, file):
+    def upload_leads_csv(self, org_id: str, file, chunk_size: int = LEAD_UPLOAD_CHUNK_SIZE):
         """Upload and parse CSV file with leads, skipping duplicates."""
-        leads = parse_leads_csv(file)
+        chunks = []
+        for event in self.upload_leads_csv_stream(org_id, file, chunk_size):
+            if event['type'] == 'chunk':
+                chunks.append(event)
+            else:
+                summary = event
         
-        # Get existing emails for this organization to check for duplicates
-        existing_response = self.admin.table('leads')\
-            .select('email')\
-            .eq('organization_id', org_id)\
-            .execute()
+        if not summary['total']:
+            raise ValueError('No valid leads found in CSV')
         
-        existing_emails = {lead['email'].lower() for lead in existing_response.data if lead.get('email')}
+        summary.pop('type')
+        summary['chunks'] = chunks
+        return summary
+    
+    def upload_leads_csv_stream(self, org_id: str, file, chunk_size: int = LEAD_UPLOAD_CHUNK_SIZE):
+        """
+        Stream a leads CSV into the database chunk by chunk.
+        
+        Yields a {'type': 'chunk'} progress report after each chunk is inserted,
+        then one {'type': 'summary'}. Only one chunk is held in memory at a time;
+        a bad row or a failed chunk is reported and the rest of the file continues.
+        """
+        totals = {'uploaded': 0, 'duplicates': 0, 'failed': 0, 'total': 0}
+        errors = []
+        
+        for index, rows in enumerate(iter_chunks(iter_leads_csv(file), chunk_size), start=1):
+            report = {
+                'type': 'chunk',
+                'chunk': index,
+                'first_line': rows[0][0],
+                'last_line': rows[-1][0],
+                'rows': len(rows),
+                'uploaded': 0,
+                'duplicates': 0,
+                'failed': 0,
+                'errors': []
+            }
+            
+            leads = []
+            for line, lead, error in rows:
+                if error:
+                    report['errors'].append({'line': line, 'error': error})
+                else:
+                    leads.append(lead)
+            report['failed'] = len(report['errors'])
+            
+            try:
+                # Collapse duplicates within the chunk; the unique index skips
+                # leads that already exist (including ones from earlier chunks)
+                new_leads, _ = dedupe_rows(leads, key=lambda lead: normalize_key(lead['email']))
+                inserted = insert_skip_duplicates('leads', self._prepare_new_leads(org_id, new_leads), on_conflict='organization_id,email_key')
+                report['uploaded'] = len(inserted)
+                report['duplicates'] = len(leads) - len(inserted)
+            except Exception as e:
+                print(f"[upload_leads_csv] Chunk {index} (lines {report['first_line']}-{report['last_line']}) failed: {e}")
+                report['failed'] += len(leads)
+                report['errors'].append({'line': None, 'error': f'Chunk insert failed: {e}'})
+            
+            for key in ('uploaded', 'duplicates', 'failed'):
+                totals[key] += report[key]
+            totals['total'] += len(rows)
+            if len(errors) < MAX_REPORTED_UPLOAD_ERRORS:
+                errors.extend(report['errors'][:MAX_REPORTED_UPLOAD_ERRORS - len(errors)])
+            
+            yield report
+        
+        message = f"{totals['uploaded']} new leads uploaded successfully, {totals['duplicates']} duplicates skipped"
+        if totals['failed']:
+            message += f", {totals['failed']} failed"
         
-        # Filter out duplicates and process new leads
-        new_leads = []
-        duplicates = 0
+        yield {
+            'type': 'summary',
+            'message': message,
+            **totals,
+            'errors': errors
+        }
+    
+    def _prepare_new_leads(self, org_id: str, leads: list):
+        """Fill in defaults and score a chunk of new leads."""
+        now = datetime.now(timezone.utc)
         
         for lead in leads:
-            # Skip if email already exists
-            if lead.get('email') and lead['email'].lower() in existing_emails:
-                duplicates += 1
-                continue
-            
             lead['organization_id'] = org_id
             lead['status'] = lead.get('status', 'new')
             lead['engagement_level'] = lead.get('engagement_level', 'none')
             
             # Set last_activity_date
             if 'last_activity_date' not in lead or not lead['last_activity_date']:
-                lead['last_activity_date'] = datetime.now(timezone.utc).isoformat()
-            
-            # Calculate score
-            activity_date = datetime.fromisoformat(lead['last_activity_date'].replace('Z', '+00:00'))
-            score, temperature = calculate_lead_score(
-                lead.get('source', 'website_form'),
-                lead['engagement_level'],
-                activity_date,
-                lead['status']
-            )
-            
-            lead['score'] = score
-            lead['temperature'] = temperature
-            new_leads.append(lead)
-        
-        # Bulk insert only new leads
-        if new_leads:
-            response = self.admin.table('leads')\
-                .insert(new_leads)\
-                .execute()
+                lead['last_activity_date'] = now.isoformat()
         
-        return {
-            'message': f'{len(new_leads)} new leads uploaded successfully, {duplicates} duplicates skipped',
-            'uploaded': len(new_leads),
-            'duplicates': duplicates,
-            'total': len(leads)
-        }
+        # Score the chunk in one vectorized pass
+        return score_lead_dicts(leads, as_of=now)
     
     def update_lead(self, org_id: str, lead_id: str, data: dict):
         """Update lead and recalculate score."""
@@ -128,6 +263,8 @@ class RevOpsService:
             .execute()
         
         lead = current.data
+        # Generated (upload dedup key) columns can't be written
+        lead.pop('email_key', None)
         
         # Update fields
         if 'status' in data:
@@ -144,10 +281,32 @@ class RevOpsService:
             lead['revenue'] = data['revenue']
         
         # Update last_activity_date
-        lead['last_activity_date'] = datetime.now(timezone.utc).isoformat()
+        now = datetime.now(timezone.utc)
+        lead['last_activity_date'] = now.isoformat()
         
         # Recalculate score
-        activity_date = datetime.fromisoformat(lead['last_activity_date'].replace('Z', '+00:00'))
+        score, temperature = calculate_lead_score(
+            lead['source'],
+            lead['engagement_level'],
+            now,
+            lead['status'],
+            as_of=now
+        )
+        
+        lead['score'] = score
+        lead['temperature'] = temperature
+        lead['score_refresh_at'] = next_recency_change(now, as_of=now).isoformat()
+        lead['updated_at'] = datetime.now(timezone.utc).isoformat()
+        
+        # Update in database
+        response = self.admin.table('leads')\
+            .update(lead)\
+            .eq('id', lead_id)\
+            .execute()
+        
+        # Campaign stats follow via the leads triggers (database/campaign-stats-deltas.sql)
+        
+        return {'lead': response.data[0]}
     
     def clear_leads(self, org_id: str):
         """Delete all leads for an organization."""
@@ -166,28 +325,6 @@ class RevOpsService:
             .execute()
         
         return {'message': 'All campaigns cleared successfully', 'deleted_count': len(response.data) if response.data else 0}
-        score, temperature = calculate_lead_score(
-            lead['source'],
-            lead['engagement_level'],
-            activity_date,
-            lead['status']
-        )
-        
-        lead['score'] = score
-        lead['temperature'] = temperature
-        lead['updated_at'] = datetime.now(timezone.utc).isoformat()
-        
-        # Update in database
-        response = self.admin.table('leads')\
-            .update(lead)\
-            .eq('id', lead_id)\
-            .execute()
-        
-        # Update campaign stats if lead converted
-        if lead.get('converted') and lead.get('campaign_id'):
-            self._update_campaign_stats(lead['campaign_id'])
-        
-        return {'lead': response.data[0]}
     
     def get_lead(self, org_id: str, lead_id: str):
         """Get single lead with score breakdown."""
@@ -227,7 +364,7 @@ class RevOpsService:
         
         # Add performance indicators
         for campaign in campaigns:
-            roi = Decimal(str(campaign.get('roi', 0)))
+            roi = float(campaign.get('roi') or 0)
             campaign['roi_percentage'] = get_roi_percentage(roi)
             campaign['performance'] = get_performance_indicator(roi)
         
@@ -247,34 +384,19 @@ class RevOpsService:
             'roi': 0
         }
         
-        response = self.admin.table('campaigns')\
-            .insert(campaign_data)\
-            .execute()
+        campaign = insert_unique('campaigns', campaign_data, f"A campaign named {campaign_data['name']} already exists")
         
-        return {'campaign': response.data[0]}
+        return {'campaign': campaign}
     
     def upload_campaigns_csv(self, org_id: str, file):
         """Upload campaigns with spend and optional revenue data, skipping duplicates."""
         campaigns = parse_campaigns_csv(file)
         
-        # Get existing campaign names for this organization to check for duplicates
-        existing_response = self.admin.table('campaigns')\
-            .select('name')\
-            .eq('organization_id', org_id)\
-            .execute()
+        # Collapse duplicate names within the file; the unique
+        # (organization_id, name_key) index skips names that already exist
+        unique_campaigns, _ = dedupe_rows(campaigns, key=lambda campaign: normalize_key(campaign['name']))
         
-        existing_names = {campaign['name'].lower() for campaign in existing_response.data if campaign.get('name')}
-        
-        # Filter out duplicates and process new campaigns
-        new_campaigns = []
-        duplicates = 0
-        
-        for campaign in campaigns:
-            # Skip if campaign name already exists
-            if campaign.get('name') and campaign['name'].lower() in existing_names:
-                duplicates += 1
-                continue
-            
+        for campaign in unique_campaigns:
             campaign['organization_id'] = org_id
             
             # Set defaults for optional fields if not provided
@@ -285,108 +407,99 @@ class RevOpsService:
             if 'revenue' not in campaign:
                 campaign['revenue'] = 0
             
-            # Calculate ROI if revenue is provided
-            spend = Decimal(str(campaign.get('spend', 0)))
-            revenue = Decimal(str(campaign.get('revenue', 0)))
-            
-            if spend > 0:
-                roi = calculate_campaign_roi(spend, revenue)
-                campaign['roi'] = float(roi)
-            else:
-                campaign['roi'] = 0
-            
-            new_campaigns.append(campaign)
+            # Calculate ROI if revenue is provided (0 when there's no spend)
+            campaign['roi'] = calculate_campaign_roi(campaign.get('spend', 0), campaign.get('revenue', 0))
         
-        # Bulk insert only new campaigns
-        if new_campaigns:
-            response = self.admin.table('campaigns')\
-                .insert(new_campaigns)\
-                .execute()
+        inserted = insert_skip_duplicates('campaigns', unique_campaigns, on_conflict='organization_id,name_key')
+        duplicates = len(campaigns) - len(inserted)
         
         return {
-            'message': f'{len(new_campaigns)} campaigns uploaded successfully, {duplicates} duplicates skipped',
-            'uploaded': len(new_campaigns),
+            'message': f'{len(inserted)} campaigns uploaded successfully, {duplicates} duplicates skipped',
+            'uploaded': len(inserted),
             'duplicates': duplicates,
             'total': len(campaigns)
         }
     
-    def _update_campaign_stats(self, campaign_id: str):
-        """Update campaign statistics based on its leads."""
-        # Get all leads for this campaign
-        leads_response = self.admin.table('leads')\
-            .select('*')\
-            .eq('campaign_id', campaign_id)\
-            .execute()
-        
-        leads = leads_response.data
-        metrics = aggregate_campaign_metrics(leads)
-        
-        # Get campaign to calculate ROI
-        campaign_response = self.admin.table('campaigns')\
-            .select('*')\
-            .eq('id', campaign_id)\
-            .single()\
-            .execute()
-        
-        campaign = campaign_response.data
-        spend = Decimal(str(campaign.get('spend', 0)))
-        revenue = Decimal(str(metrics['revenue']))
-        
-        roi = calculate_campaign_roi(spend, revenue)
-        
-        # Update campaign
-        update_data = {
-            'lead_count': metrics['lead_count'],
-            'conversion_count': metrics['conversion_count'],
-            'revenue': float(revenue),
-            'roi': float(roi),
-            'updated_at': datetime.now(timezone.utc).isoformat()
-        }
+    def recompute_campaign_stats(self, org_id: str, campaign_id: str = None):
+        """
+        Repair campaign stats by rebuilding them from the leads table.
+        
+        Normal writes keep stats current incrementally; use this only after a
+        bulk data fix or if the counters have drifted. It replaces any
+        lead/conversion/revenue numbers imported with a campaigns CSV.
+        """
+        response = self.admin.rpc('recompute_campaign_stats', {
+            'org_id': org_id,
+            'target_campaign_id': campaign_id
+        }).execute()
+        
+        return {'message': 'Campaign stats recomputed', 'campaigns': response.data or 0}
+    
+    def record_touchpoints(self, org_id: str, touchpoints: list):
+        """Record marketing touches for the organization's leads (bulk)."""
+        if not touchpoints:
+            raise ValueError('touchpoints must be a non-empty list')
+        if len(touchpoints) > MAX_TOUCHPOINTS_PER_REQUEST:
+            raise ValueError(f'At most {MAX_TOUCHPOINTS_PER_REQUEST} touchpoints per request')
+        if any(not isinstance(touch, dict) or not touch.get('lead_id') for touch in touchpoints):
+            raise ValueError('Every touchpoint needs a lead_id')
+        
+        # Only leads / campaigns of this organization may be referenced
+        known_leads = self._existing_ids('leads', org_id, {touch['lead_id'] for touch in touchpoints})
+        known_campaigns = self._existing_ids(
+            'campaigns', org_id, {touch['campaign_id'] for touch in touchpoints if touch.get('campaign_id')}
+        )
         
-        self.admin.table('campaigns')\
-            .update(update_data)\
-            .eq('id', campaign_id)\
-            .execute()
+        rows = []
+        for touch in touchpoints:
+            if touch['lead_id'] not in known_leads:
+                raise ValueError(f"Lead not found: {touch['lead_id']}")
+            if touch.get('campaign_id') and touch['campaign_id'] not in known_campaigns:
+                raise ValueError(f"Campaign not found: {touch['campaign_id']}")
+            row = {field: touch[field] for field in TOUCHPOINT_FIELDS if touch.get(field) is not None}
+            row['organization_id'] = org_id
+            row.setdefault('occurred_at', datetime.now(timezone.utc).isoformat())
+            rows.append(row)
+        
+        inserted = 0
+        for chunk in iter_chunks(rows, LEAD_UPLOAD_CHUNK_SIZE):
+            self.admin.table('lead_touchpoints').insert(chunk).execute()
+            inserted += len(chunk)
+        
+        return {'message': f'{inserted} touchpoints recorded', 'recorded': inserted}
+    
+    def _existing_ids(self, table: str, org_id: str, ids) -> set:
+        """Which of ids exist in the organization's table, looked up ID_LOOKUP_BATCH_SIZE at a time."""
+        found = set()
+        for batch in iter_chunks(list(ids), ID_LOOKUP_BATCH_SIZE):
+            response = self.admin.table(table)\
+                .select('id')\
+                .eq('organization_id', org_id)\
+                .in_('id', batch)\
+                .execute()
+            found.update(row['id'] for row in response.data or [])
+        return found
+    
+    def run_attribution(self, org_id: str, model: str = DEFAULT_ATTRIBUTION_MODEL):
+        """Recompute multi-touch credited revenue per campaign for one model."""
+        return run_attribution(org_id, model)
+    
+    def get_attribution(self, org_id: str, model: str = DEFAULT_ATTRIBUTION_MODEL):
+        """Stored multi-touch attribution results for one model."""
+        return {'model': model, 'campaigns': get_attribution(org_id, model)}
     
     def get_dashboard_stats(self, org_id: str):
-        """Get RevOps dashboard statistics."""
-        # Get all leads
-        leads_response = self.admin.table('leads')\
-            .select('*')\
-            .eq('organization_id', org_id)\
-            .execute()
-        
-        leads = leads_response.data
-        
-        # Calculate stats
-        total_leads = len(leads)
-        hot_leads = len([l for l in leads if l.get('temperature') == 'hot'])
-        warm_leads = len([l for l in leads if l.get('temperature') == 'warm'])
-        cold_leads = len([l for l in leads if l.get('temperature') == 'cold'])
-        
-        # Leads needing follow-up (hot leads not yet contacted)
-        follow_up_leads = len([
-            l for l in leads 
-            if l.get('temperature') == 'hot' and l.get('status') in ['new', 'contacted']
-        ])
-        
-        # Get top campaigns by ROI
-        campaigns_response = self.admin.table('campaigns')\
-            .select('*')\
-            .eq('organization_id', org_id)\
-            .order('roi', desc=True)\
-            .limit(5)\
-            .execute()
-        
-        top_campaigns = campaigns_response.data
+        """Get RevOps dashboard statistics (aggregated in SQL by get_revops_dashboard)."""
+        response = self.admin.rpc('get_revops_dashboard', {'org_id': org_id}).execute()
+        stats = response.data[0] if response.data else {}
         
         return {
-            'total_leads': total_leads,
-            'hot_leads': hot_leads,
-            'warm_leads': warm_leads,
-            'cold_leads': cold_leads,
-            'follow_up_count': follow_up_leads,
-            'top_campaigns': top_campaigns
+            'total_leads': stats.get('total_leads', 0),
+            'hot_leads': stats.get('hot_leads', 0),
+            'warm_leads': stats.get('warm_leads', 0),
+            'cold_leads': stats.get('cold_leads', 0),
+            'follow_up_count': stats.get('follow_up_count', 0),
+            'top_campaigns': stats.get('top_campaigns') or []
         }
 
     def analyze_leads_with_ai(self, org_id: str):
@@ -423,23 +536,24 @@ class RevOpsService:
         engagement_counts = {}
         
         for lead in leads:
-            status = lead.get('status', 'unknown')
-            source = lead.get('source', 'unknown')
-            engagement = lead.get('engagement_level', 'unknown')
+            status = lead.get('status') or 'unknown'
+            source = lead.get('source') or 'unknown'
+            engagement = lead.get('engagement_level') or 'unknown'
             
             status_counts[status] = status_counts.get(status, 0) + 1
             source_counts[source] = source_counts.get(source, 0) + 1
             engagement_counts[engagement] = engagement_counts.get(engagement, 0) + 1
         
-        # Create prompt for Gemini
-        prompt = f"""Analyze this leads data and provide actionable insights and recommendations:
+        # Create prompt for Gemini (breakdowns with many categories are trimmed to the token budget)
+        def render(breakdowns):
+            return f"""Analyze this leads data and provide actionable insights and recommendations:
 
 Total Leads: {total_leads}
 Score Distribution: {score_distribution['hot']} hot, {score_distribution['warm']} warm, {score_distribution['cold']} cold
 
-Status Breakdown: {status_counts}
-Source Breakdown: {source_counts}
-Engagement Breakdown: {engagement_counts}
+Status Breakdown: {_sorted_breakdown(breakdowns['status'])}
+Source Breakdown: {_sorted_breakdown(breakdowns['source'])}
+Engagement Breakdown: {_sorted_breakdown(breakdowns['engagement'])}
 
 Provide:
 1. 3-4 key insights about the lead quality and patterns
@@ -449,10 +563,18 @@ Format your response as JSON with two arrays: "insights" and "recommendations".
 Each should be a concise sentence (max 100 characters).
 """
         
+        budget = PromptBudget('analyze_leads')
+        prompt = fit_breakdowns(render, {
+            'status': status_counts,
+            'source': source_counts,
+            'engagement': engagement_counts
+        }, budget)
+        budget.report(prompt)
+        
         try:
             # Get AI analysis
             gemini = get_gemini_client()
-            ai_response = gemini.generate_text(prompt)
+            ai_response = gemini.generate_text(prompt, cache=True)
             
             # Try to parse JSON response
             import json
@@ -494,12 +616,42 @@ Each should be a concise sentence (max 100 characters).
     def chat_about_leads(self, org_id: str, user_id: str, message: str, conversation_history: list = None):
         """Chat with AI about leads data with full access to lead details."""
         from app.ai.gemini_client import get_gemini_client
+        from app.ai.chat_context import get_chat_context
+        
+        # Reused across messages until the org's leads change
+        data_context = get_chat_context(org_id, 'leads', lambda: self._leads_chat_context(org_id))
+        
+        # Get AI response
+        try:
+            gemini = get_gemini_client()
+            result = gemini.chat_with_data(user_id, message, data_context, conversation_history, organization_id=org_id)
+            
+            return {
+                'response': result.get('response', 'I apologize, I could not process that request.'),
+                'success': result.get('success', False)
+            }
+        except Exception as e:
+            print(f"Chat error: {e}")
+            return {
+                'response': f"I'm having trouble processing your question right now. Error: {str(e)}",
+                'success': False
+            }
+    
+    def chat_about_leads_stream(self, org_id: str, user_id: str, message: str, conversation_history: list = None):
+        """Streamed chat_about_leads: an iterator of chunk events, then done / error."""
+        from app.ai.gemini_client import get_gemini_client
+        from app.ai.chat_context import get_chat_context
         
-        # Get leads data for context
+        data_context = get_chat_context(org_id, 'leads', lambda: self._leads_chat_context(org_id))
+        return get_gemini_client().stream_chat_with_data(user_id, message, data_context, conversation_history, organization_id=org_id)
+    
+    def _leads_chat_context(self, org_id: str):
+        """Summary figures and lead rows for the leads chat prompt."""
         response = self.admin.table('leads')\
-            .select('*')\
+            .select('id, name, email, company, score, temperature, source, status, engagement_level')\
             .eq('organization_id', org_id)\
             .order('score', desc=True)\
+            .order('id')\
             .execute()
         
         leads = response.data
@@ -525,6 +677,7 @@ Each should be a concise sentence (max 100 characters).
         leads_details = []
         for lead in leads:
             leads_details.append({
+                'id': lead.get('id'),
                 'name': lead.get('name'),
                 'email': lead.get('email'),
                 'company': lead.get('company'),
@@ -548,10 +701,20 @@ Each should be a concise sentence (max 100 characters).
             'all_leads': leads_details  # Full access to all lead details
         }
         
+        return data_context
+
+    def chat_about_campaigns(self, org_id: str, user_id: str, message: str, conversation_history: list = None):
+        """Chat with AI about campaigns data with full access to campaign details."""
+        from app.ai.gemini_client import get_gemini_client
+        from app.ai.chat_context import get_chat_context
+        
+        # Reused across messages until the org's campaigns change
+        data_context = get_chat_context(org_id, 'campaigns', lambda: self._campaigns_chat_context(org_id))
+        
         # Get AI response
         try:
             gemini = get_gemini_client()
-            result = gemini.chat_with_data(user_id, message, data_context, conversation_history)
+            result = gemini.chat_with_data(user_id, message, data_context, conversation_history, data_type='campaigns', organization_id=org_id)
             
             return {
                 'response': result.get('response', 'I apologize, I could not process that request.'),
@@ -563,50 +726,52 @@ Each should be a concise sentence (max 100 characters).
                 'response': f"I'm having trouble processing your question right now. Error: {str(e)}",
                 'success': False
             }
-
-    def chat_about_campaigns(self, org_id: str, user_id: str, message: str, conversation_history: list = None):
-        """Chat with AI about campaigns data with full access to campaign details."""
+    
+    def chat_about_campaigns_stream(self, org_id: str, user_id: str, message: str, conversation_history: list = None):
+        """Streamed chat_about_campaigns: an iterator of chunk events, then done / error."""
         from app.ai.gemini_client import get_gemini_client
+        from app.ai.chat_context import get_chat_context
         
-        # Get campaigns data for context
+        data_context = get_chat_context(org_id, 'campaigns', lambda: self._campaigns_chat_context(org_id))
+        return get_gemini_client().stream_chat_with_data(user_id, message, data_context, conversation_history, data_type='campaigns', organization_id=org_id)
+    
+    def _campaigns_chat_context(self, org_id: str):
+        """Summary figures and campaign rows for the campaigns chat prompt."""
         response = self.admin.table('campaigns')\
             .select('*')\
             .eq('organization_id', org_id)\
             .order('roi', desc=True)\
+            .order('id')\
             .execute()
         
         campaigns = response.data
         
         # Calculate statistics for context
         total_campaigns = len(campaigns)
-        total_spend = sum(Decimal(str(c.get('spend', 0))) for c in campaigns)
-        total_revenue = sum(Decimal(str(c.get('revenue', 0))) for c in campaigns)
-        avg_roi = sum(Decimal(str(c.get('roi', 0))) for c in campaigns) / total_campaigns if total_campaigns > 0 else Decimal('0')
+        summary = summarize_campaigns(campaigns)
+        avg_roi = summary['mean_roi']
         
         # Count by performance
         performance_counts = {}
         for campaign in campaigns:
-            roi = Decimal(str(campaign.get('roi', 0)))
-            performance = get_performance_indicator(roi)
+            performance = get_performance_indicator(float(campaign.get('roi') or 0))
             performance_counts[performance] = performance_counts.get(performance, 0) + 1
         
         # Count by channel
-        channel_counts = {}
-        for campaign in campaigns:
-            channel = campaign.get('channel', 'unknown')
-            channel_counts[channel] = channel_counts.get(channel, 0) + 1
+        channel_counts = {channel: metrics['count'] for channel, metrics in summary['channels'].items()}
         
         # Format detailed campaign data for AI
         campaigns_details = []
         for campaign in campaigns:
-            roi = Decimal(str(campaign.get('roi', 0)))
+            roi = float(campaign.get('roi') or 0)
             campaigns_details.append({
+                'id': campaign.get('id'),
                 'name': campaign.get('name'),
                 'channel': campaign.get('channel'),
                 'period': campaign.get('period'),
                 'spend': float(campaign.get('spend', 0)),
                 'revenue': float(campaign.get('revenue', 0)),
-                'roi': float(roi),
+                'roi': roi,
                 'roi_percentage': get_roi_percentage(roi),
                 'performance': get_performance_indicator(roi),
                 'lead_count': campaign.get('lead_count', 0),
@@ -616,30 +781,16 @@ Each should be a concise sentence (max 100 characters).
         # Build comprehensive data context
         data_context = {
             'total_campaigns': total_campaigns,
-            'total_spend': float(total_spend),
-            'total_revenue': float(total_revenue),
-            'avg_roi': float(avg_roi),
+            'total_spend': to_units(summary['total_spend_cents']),
+            'total_revenue': to_units(summary['total_revenue_cents']),
+            'avg_roi': avg_roi,
             'avg_roi_percentage': get_roi_percentage(avg_roi),
             'performance_counts': performance_counts,
             'channel_counts': channel_counts,
             'all_campaigns': campaigns_details  # Full access to all campaign details
         }
         
-        # Get AI response
-        try:
-            gemini = get_gemini_client()
-            result = gemini.chat_with_data(user_id, message, data_context, conversation_history, data_type='campaigns')
-            
-            return {
-                'response': result.get('response', 'I apologize, I could not process that request.'),
-                'success': result.get('success', False)
-            }
-        except Exception as e:
-            print(f"Chat error: {e}")
-            return {
-                'response': f"I'm having trouble processing your question right now. Error: {str(e)}",
-                'success': False
-            }
+        return data_context
 
     def analyze_campaigns_with_ai(self, org_id: str):
         """Analyze campaigns data and provide AI-powered insights."""
@@ -664,42 +815,39 @@ Each should be a concise sentence (max 100 characters).
         
         # Calculate performance distribution
         performance_distribution = {'excellent': 0, 'good': 0, 'break_even': 0, 'loss': 0}
-        total_spend = 0
-        total_revenue = 0
-        channel_performance = {}
-        
         for campaign in campaigns:
-            roi = Decimal(str(campaign.get('roi', 0)))
-            performance = get_performance_indicator(roi)
+            performance = get_performance_indicator(float(campaign.get('roi') or 0))
+            # get_performance_indicator says 'break-even'; the distribution keys use '_'
+            performance = performance.replace('-', '_')
             performance_distribution[performance] = performance_distribution.get(performance, 0) + 1
-            
-            total_spend += Decimal(str(campaign.get('spend', 0)))
-            total_revenue += Decimal(str(campaign.get('revenue', 0)))
-            
-            channel = campaign.get('channel', 'unknown')
-            if channel not in channel_performance:
-                channel_performance[channel] = {'count': 0, 'spend': 0, 'revenue': 0}
-            channel_performance[channel]['count'] += 1
-            channel_performance[channel]['spend'] += Decimal(str(campaign.get('spend', 0)))
-            channel_performance[channel]['revenue'] += Decimal(str(campaign.get('revenue', 0)))
-        
-        # Calculate average ROI
-        avg_roi = ((total_revenue - total_spend) / total_spend * 100) if total_spend > 0 else 0
-        
-        # Calculate channel ROI
-        channel_roi = {}
-        for channel, metrics in channel_performance.items():
-            if metrics['spend'] > 0:
-                roi_val = ((metrics['revenue'] - metrics['spend']) / metrics['spend'] * 100)
-                channel_roi[channel] = float(roi_val)
-        
-        # Create AI prompt
-        prompt = f"""Analyze this marketing campaign performance data:
+        
+        # Totals and per-channel sums in integer cents
+        summary = summarize_campaigns(campaigns)
+        total_spend = to_units(summary['total_spend_cents'])
+        total_revenue = to_units(summary['total_revenue_cents'])
+        avg_roi = summary['portfolio_roi'] * 100
+        
+        # Channel ROI (channels without spend have no ROI)
+        channel_roi = {
+            channel: metrics['roi'] * 100
+            for channel, metrics in summary['channels'].items()
+            if metrics['roi'] is not None
+        }
+        
+        def merge_channels(folded):
+            """ROI of the folded channels taken together."""
+            spend = sum(summary['channels'][channel]['spend_cents'] for channel in folded)
+            revenue = sum(summary['channels'][channel]['revenue_cents'] for channel in folded)
+            return roi_ratio(spend, revenue) * 100
+        
+        # Create AI prompt (with many channels, the highest-spend ones are kept within the token budget)
+        def render(breakdowns):
+            return f"""Analyze this marketing campaign performance data:
 
 Total Campaigns: {total_campaigns}
-Total Spend: ${float(total_spend):,.2f}
-Total Revenue: ${float(total_revenue):,.2f}
-Average ROI: {float(avg_roi):.1f}%
+Total Spend: ${total_spend:,.2f}
+Total Revenue: ${total_revenue:,.2f}
+Average ROI: {avg_roi:.1f}%
 
 Performance Distribution:
 - Excellent (ROI > 200%): {performance_distribution['excellent']} campaigns
@@ -707,7 +855,7 @@ Performance Distribution:
 - Break-even (ROI 0-50%): {performance_distribution['break_even']} campaigns
 - Loss (ROI < 0%): {performance_distribution['loss']} campaigns
 
-Channel Performance: {channel_roi}
+Channel Performance: {_sorted_breakdown(breakdowns['channel_roi'])}
 
 Provide:
 1. 3-4 key insights about campaign performance and ROI trends
@@ -717,9 +865,17 @@ Format your response as JSON with two arrays: "insights" and "recommendations".
 Each should be a concise sentence (max 100 characters).
 """
         
+        budget = PromptBudget('analyze_campaigns')
+        prompt = fit_breakdowns(
+            render, {'channel_roi': channel_roi}, budget,
+            weights={'channel_roi': {channel: metrics['spend_cents'] for channel, metrics in summary['channels'].items()}},
+            merges={'channel_roi': merge_channels}
+        )
+        budget.report(prompt)
+        
         try:
             gemini = get_gemini_client()
-            ai_response = gemini.generate_text(prompt)
+            ai_response = gemini.generate_text(prompt, cache=True)
             
             import json
             import re
@@ -742,7 +898,7 @@ Each should be a concise sentence (max 100 characters).
             best_channel = max(channel_roi, key=channel_roi.get) if channel_roi else None
             
             insights = [
-                f"Portfolio ROI at {float(avg_roi):.1f}% with ${float(total_revenue):,.0f} total revenue",
+                f"Portfolio ROI at {avg_roi:.1f}% with ${total_revenue:,.0f} total revenue",
                 f"{performance_distribution['excellent']} campaigns achieving excellent ROI (>200%)"
             ]
             
@@ -763,9 +919,9 @@ Each should be a concise sentence (max 100 characters).
         
         return {
             'total_campaigns': total_campaigns,
-            'total_spend': float(total_spend),
-            'total_revenue': float(total_revenue),
-            'avg_roi': float(avg_roi),
+            'total_spend': total_spend,
+            'total_revenue': total_revenue,
+            'avg_roi': avg_roi,
             'performance_distribution': performance_distribution,
             'insights': insights[:4],
             'recommendations': recommendations[:4]
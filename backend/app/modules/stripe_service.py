@@ -1,7 +1,12 @@
 import os
 from app.extensions import get_supabase_admin
+from app.modules.usage_counters import get_usage
+from app.utils.ttl_cache import TTLCache
 import stripe
 
+# Organization -> plan_type; invalidated by the Stripe webhook handler
+_plan_cache = TTLCache(maxsize=10000, ttl=int(os.getenv('PLAN_CACHE_TTL', 300)))
+
 # Initialize Stripe with the API key
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 
@@ -101,6 +106,38 @@ class StripeService:
         }
     }
     
+    # Limit-checked resource -> (usage counter, plan limit key)
+    USAGE_LIMITS = {
+        'datasets': ('datasets', 'datasets'),
+        'talent': ('talent', 'talent_profiles'),
+        'jobs': ('jobs', 'jobs'),
+        'total_rows': ('total_rows', 'total_rows')
+    }
+    
+    @staticmethod
+    def get_plan_type(organization_id):
+        """Get the organization's plan type (cached until the webhook changes it)"""
+        plan_type = _plan_cache.get(organization_id)
+        if plan_type is not None:
+            return plan_type
+        
+        supabase = get_supabase_admin()
+        org = supabase.table('organizations').select('plan_type').eq('id', organization_id).limit(1).execute()
+        if not org.data:
+            raise Exception('Organization not found')
+        
+        plan_type = org.data[0].get('plan_type') or 'free'
+        _plan_cache.set(organization_id, plan_type)
+        return plan_type
+    
+    @staticmethod
+    def invalidate_plan(organization_id):
+        """Drop cached plan data after a subscription change"""
+        from app.modules.api_keys.services import APIKeyService
+        _plan_cache.pop(organization_id)
+        # Verified API keys carry the plan type for rate limiting
+        APIKeyService.clear_cache()
+    
     @staticmethod
     def create_checkout_session(organization_id, plan_type, success_url, cancel_url):
         """Create a Stripe checkout session"""
@@ -216,6 +253,7 @@ class StripeService:
                 'stripe_subscription_id': session.get('subscription'),
                 'subscription_status': 'active'
             }).eq('id', organization_id).execute()
+            StripeService.invalidate_plan(organization_id)
             
         elif event['type'] == 'customer.subscription.updated':
             subscription = event['data']['object']
@@ -229,6 +267,7 @@ class StripeService:
                     'current_period_start': subscription['current_period_start'],
                     'current_period_end': subscription['current_period_end']
                 }).eq('id', org.data['id']).execute()
+                StripeService.invalidate_plan(org.data['id'])
                 
         elif event['type'] == 'customer.subscription.deleted':
             subscription = event['data']['object']
@@ -242,6 +281,7 @@ class StripeService:
                     'subscription_status': 'canceled',
                     'stripe_subscription_id': None
                 }).eq('id', org.data['id']).execute()
+                StripeService.invalidate_plan(org.data['id'])
                 
         elif event['type'] == 'invoice.payment_succeeded':
             invoice = event['data']['object']
@@ -270,6 +310,7 @@ class StripeService:
                 supabase.table('organizations').update({
                     'subscription_status': 'past_due'
                 }).eq('id', org.data['id']).execute()
+                StripeService.invalidate_plan(org.data['id'])
                 
                 # Record failed payment
                 supabase.table('payment_history').insert({
@@ -296,13 +337,7 @@ class StripeService:
         plan_info = StripeService.PLANS.get(plan_type, StripeService.PLANS['free'])
         
         # Get current usage
-        datasets_count = supabase.table('labeling_datasets').select('id', count='exact').eq('organization_id', organization_id).execute()
-        talent_count = supabase.table('talent').select('id', count='exact').eq('organization_id', organization_id).execute()
-        jobs_count = supabase.table('jobs').select('id', count='exact').eq('organization_id', organization_id).execute()
-        
-        # Get total rows across all datasets
-        datasets = supabase.table('labeling_datasets').select('total_rows').eq('organization_id', organization_id).execute()
-        total_rows = sum(d.get('total_rows', 0) for d in datasets.data) if datasets.data else 0
+        usage = get_usage(organization_id)
         
         return {
             'plan_type': plan_type,
@@ -311,10 +346,10 @@ class StripeService:
             'features': plan_info['features'],
             'limits': plan_info['limits'],
             'usage': {
-                'datasets': datasets_count.count,
-                'talent_profiles': talent_count.count,
-                'jobs': jobs_count.count,
-                'total_rows': total_rows
+                'datasets': usage['datasets'],
+                'talent_profiles': usage['talent'],
+                'jobs': usage['jobs'],
+                'total_rows': usage['total_rows']
             },
             'subscription_status': org.data.get('subscription_status', 'inactive'),
             'current_period_end': org.data.get('current_period_end'),
@@ -326,35 +361,15 @@ class StripeService:
         """Check if organization can create more of a resource type"""
         supabase = get_supabase_admin()
         
-        # Get organization plan
-        org = supabase.table('organizations').select('*').eq('id', organization_id).single().execute()
-        if not org.data:
-            raise Exception('Organization not found')
-        
-        plan_type = org.data.get('plan_type', 'free')
-        limits = StripeService.PLANS[plan_type]['limits']
+        # Get organization plan (cached)
+        plan_type = StripeService.get_plan_type(organization_id)
+        limits = StripeService.PLANS.get(plan_type, StripeService.PLANS['free'])['limits']
         
         # Get current usage based on resource type
-        if resource_type == 'datasets':
-            count = supabase.table('labeling_datasets').select('id', count='exact').eq('organization_id', organization_id).execute()
-            current = count.count
-            limit = limits['datasets']
-            
-        elif resource_type == 'talent':
-            count = supabase.table('talent').select('id', count='exact').eq('organization_id', organization_id).execute()
-            current = count.count
-            limit = limits['talent_profiles']
-            
-        elif resource_type == 'jobs':
-            count = supabase.table('jobs').select('id', count='exact').eq('organization_id', organization_id).execute()
-            current = count.count
-            limit = limits['jobs']
-            
-        elif resource_type == 'total_rows':
-            # Sum all rows across datasets
-            datasets = supabase.table('labeling_datasets').select('total_rows').eq('organization_id', organization_id).execute()
-            current = sum(d.get('total_rows', 0) for d in datasets.data) if datasets.data else 0
-            limit = limits['total_rows']
+        if resource_type in StripeService.USAGE_LIMITS:
+            usage_field, limit_key = StripeService.USAGE_LIMITS[resource_type]
+            current = get_usage(organization_id)[usage_field]
+            limit = limits[limit_key]
             
         elif resource_type == 'export':
             return {
@@ -365,11 +380,58 @@ class StripeService:
             }
             
         elif resource_type == 'api_access':
+            # current: requests made today across the organization's keys (dashboard usage).
+            # The limit is enforced per key in require_api_key, so limit, remaining and
+            # allowed describe the keys' rate limit buckets, not the org-wide count.
+            from datetime import datetime, timezone
+            from app.auth.rate_limiter import peek_rate_limit
+            from app.modules.api_keys.usage_meter import usage_meter
+            today = datetime.now(timezone.utc).date().isoformat()
+            usage = supabase.table('api_key_usage_daily').select('request_count').eq('organization_id', organization_id).eq('day', today).execute()
+            current = sum(row['request_count'] for row in usage.data) if usage.data else 0
+            current += sum(entry['count'] for entry in usage_meter.pending_for_org(organization_id).values())
+            limit = limits['api_rate_limit']
+            
+            if not limits['api_access']:
+                return {
+                    'allowed': False,
+                    'limit': 0,
+                    'current': current,
+                    'remaining': 0,
+                    'keys': []
+                }
+            
+            if limit == -1:
+                return {
+                    'allowed': True,
+                    'limit': -1,
+                    'current': current,
+                    'remaining': -1,
+                    'keys': []
+                }
+            
+            active_keys = supabase.table('api_keys').select('id, name').eq('organization_id', organization_id).eq('is_active', True).execute()
+            keys = []
+            for key in active_keys.data or []:
+                bucket = peek_rate_limit(key['id'], limit)
+                if bucket is not None:
+                    keys.append({
+                        'key_id': key['id'],
+                        'name': key.get('name'),
+                        'allowed': bucket.remaining >= 1,
+                        'remaining': bucket.remaining,
+                        'reset_after': bucket.reset_after
+                    })
+            
+            # remaining: what the least-used key can still send (a new key starts full)
+            remaining = max((key['remaining'] for key in keys), default=limit)
             return {
-                'allowed': limits['api_access'],
-                'limit': limits['api_rate_limit'],
-                'current': 0,  # TODO: Track actual API usage
-                'remaining': limits['api_rate_limit']
+                'allowed': remaining >= 1,
+                'limit': limit,
+                'limit_scope': 'per_key',
+                'current': current,
+                'remaining': remaining,
+                'keys': keys
             }
         else:
             raise Exception(f'Unknown resource type: {resource_type}')
@@ -1,4 +1,5 @@
 from app.extensions import get_supabase_admin
+from app.modules.usage_counters import adjust_usage
 
 class TalentService:
     @staticmethod
@@ -67,6 +68,7 @@ class TalentService:
         response = supabase.table('talent') \
             .insert(talent_data) \
             .execute()
+        adjust_usage(organization_id, talent=len(response.data))
         
         return response.data[0]
     
@@ -136,6 +138,7 @@ class TalentService:
             .eq('id', talent_id) \
             .eq('organization_id', organization_id) \
             .execute()
+        adjust_usage(organization_id, talent=-len(response.data or []))
         
         return True
     
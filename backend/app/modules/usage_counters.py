@@ -0,0 +1,91 @@
+"""Per-organization usage counters for subscription limit checks.
+
+The ``organization_usage`` table is kept current by database triggers on
+``labeling_datasets``, ``talent`` and ``jobs`` (see
+database/organization-usage-counters.sql). This module caches each org's row in
+process memory; services apply their own creates and deletes to the cached copy
+via ``adjust_usage`` so this worker's view is exact, and the TTL bounds drift
+caused by writes in other workers.
+"""
+import os
+from typing import Dict
+
+from app.extensions import get_supabase_admin
+from app.utils.ttl_cache import TTLCache
+
+USAGE_FIELDS = ('datasets', 'talent', 'jobs', 'total_rows')
+
+_usage_cache = TTLCache(
+    maxsize=int(os.getenv('USAGE_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('USAGE_CACHE_TTL', 60))
+)
+
+
+def _count_usage(organization_id: str) -> Dict[str, int]:
+    """Count usage from the source tables (used when no counter row exists)."""
+    supabase = get_supabase_admin()
+    datasets = supabase.table('labeling_datasets').select('total_rows', count='exact').eq('organization_id', organization_id).execute()
+    talent = supabase.table('talent').select('id', count='exact').eq('organization_id', organization_id).limit(1).execute()
+    jobs = supabase.table('jobs').select('id', count='exact').eq('organization_id', organization_id).limit(1).execute()
+    return {
+        'datasets': datasets.count or 0,
+        'talent': talent.count or 0,
+        'jobs': jobs.count or 0,
+        'total_rows': sum(d.get('total_rows') or 0 for d in datasets.data) if datasets.data else 0
+    }
+
+
+def get_usage(organization_id: str) -> Dict[str, int]:
+    """Current usage counts for an organization, served from cache when possible."""
+    usage = _usage_cache.get(organization_id)
+    if usage is not None:
+        return dict(usage)
+
+    supabase = get_supabase_admin()
+    try:
+        response = supabase.table('organization_usage')\
+            .select('datasets_count, talent_count, jobs_count, total_rows')\
+            .eq('organization_id', organization_id)\
+            .limit(1)\
+            .execute()
+        row = response.data[0] if response.data else None
+    except Exception as e:
+        print(f"[usage_counters] organization_usage unavailable, counting directly: {e}")
+        row = None
+
+    if row:
+        usage = {
+            'datasets': row['datasets_count'],
+            'talent': row['talent_count'],
+            'jobs': row['jobs_count'],
+            'total_rows': row['total_rows']
+        }
+    else:
+        usage = _count_usage(organization_id)
+
+    _usage_cache.set(organization_id, usage)
+    return dict(usage)
+
+
+def adjust_usage(organization_id: str, **deltas: int):
+    """Apply a create/delete made by this worker to the cached counters.
+
+    The database triggers already maintain the stored counters; this only keeps
+    the cached copy in step. Nothing is cached yet -> nothing to do.
+    """
+    usage = _usage_cache.get(organization_id)
+    if usage is None:
+        return
+    usage = dict(usage)
+    for field, delta in deltas.items():
+        usage[field] = max(0, usage.get(field, 0) + delta)
+    # Keep the original expiry so other workers' writes are still picked up
+    _usage_cache.replace(organization_id, usage)
+
+
+def invalidate_usage(organization_id: str = None):
+    """Forget cached counters for one organization (or all)."""
+    if organization_id is None:
+        _usage_cache.clear()
+    else:
+        _usage_cache.pop(organization_id)
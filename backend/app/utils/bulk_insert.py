@@ -0,0 +1,77 @@
+"""Set-based bulk inserts that skip duplicates.
+
+Uploads collapse duplicates inside the file with a hash set, then let a unique
+(organization_id, normalized key) index reject rows that already exist via
+INSERT ... ON CONFLICT DO NOTHING (PostgREST upsert with ignore_duplicates).
+Only inserted rows come back, so skipped = sent - returned.
+
+Single-row creates go through insert_unique(), which turns a violation of the
+same indexes into DuplicateRowError (HTTP 409) instead of a 500.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from app.extensions import get_supabase_admin
+
+UNIQUE_VIOLATION = '23505'
+
+
+class DuplicateRowError(Exception):
+    """A single-row insert matched an existing row's unique key."""
+
+
+def normalize_key(value: Optional[str]) -> str:
+    """Python twin of the lower(btrim(...)) generated key columns."""
+    return (value or '').strip(' ').lower()
+
+
+def dedupe_rows(rows: Iterable[Dict], key: Callable[[Dict], Any]) -> Tuple[List[Dict], int]:
+    """Keep the first row per key; returns (unique rows, duplicates dropped)."""
+    seen = set()
+    unique = []
+    duplicates = 0
+    for row in rows:
+        row_key = key(row)
+        if row_key in seen:
+            duplicates += 1
+            continue
+        seen.add(row_key)
+        unique.append(row)
+    return unique, duplicates
+
+
+def insert_skip_duplicates(table: str, rows: List[Dict], on_conflict: str, defaults: Optional[Dict] = None) -> List[Dict]:
+    """Insert rows, silently skipping any that conflict on `on_conflict`.
+
+    PostgREST bulk inserts need every object to have the same keys, so keys
+    missing from some rows are filled from `defaults` (else None).
+    Returns the rows actually inserted.
+    """
+    if not rows:
+        return []
+
+    defaults = defaults or {}
+    columns = set().union(*(row.keys() for row in rows))
+    payload = [
+        {column: row.get(column, defaults.get(column)) for column in columns}
+        for row in rows
+    ]
+
+    response = get_supabase_admin().table(table)\
+        .upsert(payload, ignore_duplicates=True, on_conflict=on_conflict)\
+        .execute()
+    return response.data or []
+
+
+def insert_unique(table: str, row: Dict, duplicate_message: str) -> Dict:
+    """Insert one row; raises DuplicateRowError(duplicate_message) on a unique key conflict."""
+    try:
+        response = get_supabase_admin().table(table)\
+            .insert(row)\
+            .execute()
+    except APIError as e:
+        if e.code == UNIQUE_VIOLATION:
+            raise DuplicateRowError(duplicate_message) from e
+        raise
+    return response.data[0]
@@ -1,36 +1,49 @@
 """CSV parsing utilities - using csv module instead of pandas."""
 import csv
+import io
 from io import StringIO
-from typing import List, Dict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 
 
-def parse_leads_csv(file) -> List[Dict]:
+LEAD_FIELDS_REQUIRED = ('email', 'source')
+
+
+def _text_stream(file, encoding: str = 'utf-8-sig'):
+    """Decode an uploaded binary stream incrementally (BOM stripped, bad bytes replaced)."""
+    stream = getattr(file, 'stream', file)
+    return io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
+
+
+def iter_leads_csv(file) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
     """
-    Parse leads CSV file.
+    Stream leads from a CSV upload without reading the whole file.
     Required columns: email, source
     Optional columns: name, company, engagement_level, status
-    """
-    # Read file content and remove BOM if present
-    content = file.read().decode('utf-8-sig')  # utf-8-sig removes BOM automatically
     
-    # Use csv.reader first to normalize headers
-    lines = StringIO(content)
-    csv_reader = csv.reader(lines)
+    Yields (line_number, lead, error) per data row; exactly one of lead / error
+    is set. Blank rows are skipped. Raises ValueError up front if the header is
+    missing required columns.
+    """
+    csv_reader = csv.reader(_text_stream(file))
     
     # Get and normalize headers
-    headers = next(csv_reader)
-    print(f"[parse_leads_csv] Original headers: {headers}")
+    headers = next(csv_reader, None)
+    if headers is None:
+        raise ValueError('CSV file is empty')
     normalized_headers = [h.strip().lower() for h in headers]
-    print(f"[parse_leads_csv] Normalized headers: {normalized_headers}")
     
     # Check for required columns
-    if 'email' not in normalized_headers or 'source' not in normalized_headers:
-        print(f"[parse_leads_csv] Missing required columns. Looking for 'email' and 'source'")
+    if any(column not in normalized_headers for column in LEAD_FIELDS_REQUIRED):
+        print(f"[iter_leads_csv] Missing required columns in headers: {normalized_headers}")
         raise ValueError('CSV must contain email and source columns')
     
-    leads = []
     for row in csv_reader:
+        # Skip empty rows
+        if not any(cell.strip() for cell in row):
+            continue
+        
         # Create dict with normalized keys
         row_dict = dict(zip(normalized_headers, row))
         
@@ -43,11 +56,29 @@ def parse_leads_csv(file) -> List[Dict]:
             'status': row_dict.get('status', 'new').strip(),
         }
         
-        # Skip empty rows
         if not lead['email']:
+            yield csv_reader.line_num, None, 'Missing email'
             continue
-            
-        leads.append(lead)
+        
+        yield csv_reader.line_num, lead, None
+
+
+def iter_chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    """Group an iterable into lists of at most `size` items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_leads_csv(file) -> List[Dict]:
+    """
+    Parse leads CSV file into a list (whole file in memory).
+    Prefer iter_leads_csv for uploads.
+    """
+    leads = [lead for _, lead, _ in iter_leads_csv(file) if lead]
     
     if not leads:
         raise ValueError('No valid leads found in CSV')
@@ -0,0 +1,35 @@
+"""Server-Sent Events helpers for streamed endpoints."""
+import json
+from typing import Dict, Iterable
+
+from flask import Response, stream_with_context
+
+
+def stream_requested(request) -> bool:
+    """True for ?stream=1 or ?stream=true (not for stream=0 / stream=false)."""
+    return request.args.get('stream', '').lower() in ('1', 'true')
+
+
+def wants_event_stream(request) -> bool:
+    """True for ?stream=1 / ?stream=true or an Accept: text/event-stream request."""
+    return stream_requested(request) or 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def format_event(event: str, data: Dict) -> str:
+    """One SSE frame: `event: <name>` plus the JSON payload on a single data line."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def event_stream_response(events: Iterable[Dict]) -> Response:
+    """
+    Stream events ({'type': ..., ...} dicts) as SSE frames.
+
+    Buffering is disabled for proxies (X-Accel-Buffering) so each frame is
+    flushed to the client as soon as it is yielded.
+    """
+    frames = (format_event(event.pop('type', 'message'), event) for event in events)
+    return Response(
+        stream_with_context(frames),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,280 @@
+"""
+AI endpoint benchmark on the offline fake LLM provider.
+
+Run from backend/:
+    python -m benchmarks.bench_ai_endpoints [--rows 1000 10000 50000] [--iterations 5]
+        [--latency-median 0.5] [--latency-sigma 0.4] [--output-words 150] [--concurrency 8]
+
+Drives the service methods behind the analyze and chat endpoints
+(analyze_leads_with_ai, analyze_campaigns_with_ai, analyze_customers_with_ai,
+chat_about_leads, chat_about_campaigns, chat_about_customers) against generated
+leads, campaigns and customers served by an in-memory stand-in for the
+Supabase admin client. No network access or API key is needed.
+
+Per endpoint and dataset size it reports:
+- build: call start until the prompt reaches the provider (data load,
+  enrichment, prompt serialization); first call (cold caches) and median of
+  the rest
+- prompt KB
+- end-to-end p50 / p95 (sequential), and throughput with --concurrency > 1
+
+Insight responses are recomputed every call (the insight cache is cleared)
+unless --keep-insight-cache is given. Calls that never reach the provider
+(insight cache hits, open circuit breaker, failures) have no build time or
+prompt size; those columns show "-" when no call of the run reached it.
+"""
+import argparse
+import contextlib
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+ORG_ID = 'bench-org'
+USER_ID = 'bench-user'
+QUESTIONS = {
+    'leads': 'Who are my top hot leads from referral?',
+    'campaigns': 'Which email campaigns have the best ROI?',
+    'customers': 'Which enterprise customers are at risk of churning?'
+}
+
+
+def make_leads(n, rng):
+    sources = ['website', 'referral', 'linkedin', 'paid_ads', 'event', 'cold_outreach']
+    statuses = ['new', 'contacted', 'qualified', 'proposal', 'won', 'lost']
+    now = datetime.now(timezone.utc)
+    leads = []
+    for i in range(n):
+        score = rng.randint(0, 100)
+        leads.append({
+            'id': f"lead-{i}",
+            'organization_id': ORG_ID,
+            'name': f"Lead {i}",
+            'email': f"lead{i}@company{i % 997}.com",
+            'company': f"Company {i % 997}",
+            'score': score,
+            'temperature': 'hot' if score >= 80 else 'warm' if score >= 50 else 'cold',
+            'source': rng.choice(sources),
+            'status': rng.choice(statuses),
+            'engagement_level': rng.choice(['high', 'medium', 'low']),
+            'last_activity_date': (now - timedelta(days=rng.randint(0, 120))).isoformat()
+        })
+    return leads
+
+
+def make_campaigns(n, rng):
+    channels = ['email', 'paid_ads', 'social', 'events', 'content', 'referral']
+    campaigns = []
+    for i in range(n):
+        spend = round(rng.uniform(100, 50_000), 2)
+        revenue = round(spend * rng.lognormvariate(0, 0.8), 2)
+        campaigns.append({
+            'id': f"campaign-{i}",
+            'organization_id': ORG_ID,
+            'name': f"Campaign {i}",
+            'channel': rng.choice(channels),
+            'period': f"2026-Q{i % 4 + 1}",
+            'spend': spend,
+            'revenue': revenue,
+            'roi': round((revenue - spend) / spend, 4),
+            'lead_count': rng.randint(0, 500),
+            'conversion_count': rng.randint(0, 50)
+        })
+    return campaigns
+
+
+def make_customers(n, rng):
+    plans = ['starter', 'pro', 'enterprise']
+    now = datetime.now(timezone.utc)
+    customers = []
+    for i in range(n):
+        mrr = round(rng.uniform(50, 20_000), 2)
+        customers.append({
+            'id': f"customer-{i}",
+            'organization_id': ORG_ID,
+            'company': f"Customer {i}",
+            'email': f"owner@customer{i}.com",
+            'plan': rng.choice(plans),
+            'mrr': mrr,
+            'previous_mrr': round(mrr * rng.uniform(0.8, 1.2), 2),
+            'last_active': (now - timedelta(days=rng.randint(0, 90))).isoformat(),
+            'metadata': {'open_issues': rng.randint(0, 5)}
+        })
+    return customers
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """The subset of the postgrest query builder the AI services use."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        return self  # every generated row belongs to ORG_ID
+
+    def order(self, column, desc=False):
+        self.rows = sorted(self.rows, key=lambda row: row.get(column) or 0, reverse=desc)
+        return self
+
+    def limit(self, n):
+        self.rows = self.rows[:n]
+        return self
+
+    def execute(self):
+        return _Response(self.rows)
+
+
+class InMemoryAdmin:
+    """Stand-in for the Supabase admin client serving generated tables."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return _Query(list(self.tables.get(name, [])))
+
+
+class RecordingProvider:
+    """Wraps the fake provider, noting when each prompt arrives and its size."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.model_name = inner.model_name
+        self.events = []  # (perf_counter, prompt bytes), in arrival order
+        self._lock = threading.Lock()
+
+    def _note(self, prompt):
+        with self._lock:
+            self.events.append((time.perf_counter(), len(prompt.encode('utf-8'))))
+
+    def generate(self, prompt):
+        self._note(prompt)
+        return self.inner.generate(prompt)
+
+    def stream(self, prompt):
+        self._note(prompt)
+        return self.inner.stream(prompt)
+
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='also run iterations x concurrency calls from this many threads')
+    parser.add_argument('--latency-median', type=float, default=0.5, help='fake time to first chunk (s)')
+    parser.add_argument('--latency-sigma', type=float, default=0.4, help='lognormal shape (0 = fixed)')
+    parser.add_argument('--chunk-delay', type=float, default=0.0)
+    parser.add_argument('--output-words', type=int, default=150)
+    parser.add_argument('--keep-insight-cache', action='store_true')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help="keep the services' request logging")
+    args = parser.parse_args()
+
+    # Before any app import: module-level settings read these
+    os.environ['LLM_PROVIDER'] = 'bench'
+    os.environ.setdefault('AI_CACHE_DIR', '')
+
+    from app import extensions
+    from app.ai import chat_context, insight_cache as insight_cache_module
+    from app.ai.fake_model import FakeProvider
+    from app.ai.providers import register_provider
+
+    provider = RecordingProvider(FakeProvider(
+        latency_median=args.latency_median, latency_sigma=args.latency_sigma,
+        chunk_delay=args.chunk_delay, output_words=args.output_words, seed=args.seed
+    ))
+    register_provider('bench', lambda: provider)
+
+    admin = InMemoryAdmin({})
+    extensions.supabase_client = extensions.supabase_admin_client = admin
+    from app.modules.customer_health.services import customer_health_service
+    from app.modules.revops.services import revops_service
+
+    endpoints = [
+        ('analyze_leads_with_ai', lambda: revops_service.analyze_leads_with_ai(ORG_ID)),
+        ('analyze_campaigns_with_ai', lambda: revops_service.analyze_campaigns_with_ai(ORG_ID)),
+        ('analyze_customers_with_ai', lambda: customer_health_service.analyze_customers_with_ai(ORG_ID)),
+        ('chat_about_leads', lambda: revops_service.chat_about_leads(ORG_ID, USER_ID, QUESTIONS['leads'], [])),
+        ('chat_about_campaigns', lambda: revops_service.chat_about_campaigns(ORG_ID, USER_ID, QUESTIONS['campaigns'], [])),
+        ('chat_about_customers', lambda: customer_health_service.chat_about_customers(ORG_ID, USER_ID, QUESTIONS['customers'], [])),
+    ]
+
+    def reset_caches():
+        chat_context.invalidate_chat_context()
+        insight_cache_module.insight_cache.clear()
+
+    devnull = open(os.devnull, 'w')
+
+    def quiet():
+        """Silence per-request print logging while measuring."""
+        return contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+
+    def timed_call(call):
+        """(build seconds, prompt bytes, end-to-end seconds); the first two are None if no prompt was sent."""
+        if not args.keep_insight_cache:
+            insight_cache_module.insight_cache.clear()
+        start = time.perf_counter()
+        first_event = len(provider.events)
+        call()
+        elapsed = time.perf_counter() - start
+        if len(provider.events) <= first_event:
+            return None, None, elapsed
+        arrived_at, prompt_bytes = provider.events[first_event]
+        return arrived_at - start, prompt_bytes, elapsed
+    
+    def column(value, spec, width, unit=''):
+        """value formatted with spec plus unit, or '-', right-aligned in width."""
+        return format(format(value, spec) + unit if value is not None else '-', f'>{width}')
+
+    print(f"{'rows':>7} {'endpoint':>26} {'cold build':>11} {'build':>9} {'prompt KB':>10} "
+          f"{'e2e p50':>9} {'e2e p95':>9} {'calls/s':>8}")
+    for n in args.rows:
+        rng = random.Random(args.seed)
+        admin.tables = {
+            'leads': make_leads(n, rng),
+            'campaigns': make_campaigns(n, rng),
+            'customers': make_customers(n, rng)
+        }
+        reset_caches()
+        for name, call in endpoints:
+            with quiet():
+                runs = [timed_call(call) for _ in range(args.iterations)]
+            cold_build = runs[0][0]
+            warm = [run[0] for run in runs[1:] if run[0] is not None]
+            warm_build = statistics.median(warm) if warm else (cold_build if len(runs) == 1 else None)
+            prompt_bytes = next((run[1] for run in runs if run[1] is not None), None)
+            latencies = [run[2] for run in runs]
+
+            throughput = '-'
+            if args.concurrency > 1:
+                total = args.iterations * args.concurrency
+                start = time.perf_counter()
+                with quiet(), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                    list(pool.map(lambda _: call(), range(total)))
+                throughput = f"{total / (time.perf_counter() - start):.1f}"
+
+            ms = lambda seconds: None if seconds is None else seconds * 1000
+            print(f"{n:>7} {name:>26} {column(ms(cold_build), '.1f', 11, 'ms')} {column(ms(warm_build), '.1f', 9, 'ms')} "
+                  f"{column(None if prompt_bytes is None else prompt_bytes / 1024, '.1f', 10)} "
+                  f"{_quantile(latencies, 0.5):>8.2f}s {_quantile(latencies, 0.95):>8.2f}s {throughput:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Attribution benchmark: per-lead Python loop vs the columnar attribute() engine.
+
+Run from backend/:
+    python -m benchmarks.bench_attribution [--touches 100000 1000000 5000000] [--loop-max 1000000] [--load-max 1000000]
+
+Also checks that both paths credit the same revenue per campaign (to the cent)
+for every model.
+
+The engine is not the end-to-end cost of run_attribution. For each size this
+also times the load step, which turns PostgREST rows (UUID strings, ISO
+timestamps) into the engine's arrays. It prints how many ATTRIBUTION_PAGE_SIZE
+round trips the touchpoint fetch needs. Those round trips need a database and
+are not timed here; at the default page size they usually dominate.
+"""
+import argparse
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.modules.revops.attribution import (
+    ATTRIBUTION_MODELS, POSITION_BASED_ENDPOINT_SHARE, TIME_DECAY_HALF_LIFE_DAYS, TOUCHPOINT_PAGE_SIZE,
+    attribute, encode, to_micros
+)
+from app.modules.revops.batch_scoring import MICROS_PER_DAY
+
+N_CAMPAIGNS = 200
+
+
+def make_touches(n_touches, seed=42):
+    """Random touch stream: ~8 touches per lead, 5% without a campaign, 60% of leads converted."""
+    rng = np.random.default_rng(seed)
+    n_leads = max(n_touches // 8, 1)
+    conversion_us = rng.integers(1_600_000_000, 1_700_000_000, n_leads, dtype=np.int64) * 1_000_000
+    revenue_cents = rng.integers(0, 5_000_000, n_leads, dtype=np.int64)
+
+    lead_codes = rng.integers(0, n_leads, n_touches, dtype=np.int64)
+    campaign_codes = rng.integers(0, N_CAMPAIGNS, n_touches, dtype=np.int64)
+    campaign_codes[rng.random(n_touches) < 0.05] = -1
+    # Up to 90 days before conversion, a few after (ignored)
+    occurred_us = conversion_us[lead_codes] - rng.integers(-2 * MICROS_PER_DAY, 90 * MICROS_PER_DAY, n_touches)
+
+    converted = rng.random(n_leads) < 0.6
+    lead_codes = np.where(converted[lead_codes], lead_codes, -1)
+    return lead_codes, campaign_codes, occurred_us, revenue_cents, conversion_us
+
+
+def make_rows(lead_codes, campaign_codes, occurred_us):
+    """The touches as run_attribution receives them from PostgREST."""
+    lead_ids = [str(uuid.uuid4()) for _ in range(int(lead_codes.max()) + 1)]
+    campaign_ids = [str(uuid.uuid4()) for _ in range(N_CAMPAIGNS)]
+    return [
+        {
+            'id': index,
+            'lead_id': lead_ids[lead] if lead >= 0 else str(uuid.uuid4()),
+            'campaign_id': campaign_ids[campaign] if campaign >= 0 else None,
+            'occurred_at': datetime.fromtimestamp(occurred / 1_000_000, timezone.utc).isoformat()
+        }
+        for index, (lead, campaign, occurred) in enumerate(zip(lead_codes.tolist(), campaign_codes.tolist(), occurred_us.tolist()))
+    ], {lead_id: code for code, lead_id in enumerate(lead_ids)}, {campaign_id: code for code, campaign_id in enumerate(campaign_ids)}
+
+
+def run_load(touches, lead_index, campaign_index):
+    """run_attribution's rows -> arrays step."""
+    encode([touch['lead_id'] for touch in touches], lead_index)
+    encode([touch.get('campaign_id') for touch in touches], campaign_index)
+    to_micros([touch['occurred_at'] for touch in touches])
+
+
+def run_loop(lead_codes, campaign_codes, occurred_us, revenue_cents, conversion_us, model):
+    """Straightforward reference: group touches per lead, weight, accumulate."""
+    by_lead = defaultdict(list)
+    for index, (lead, campaign, occurred) in enumerate(zip(lead_codes.tolist(), campaign_codes.tolist(), occurred_us.tolist())):
+        if lead >= 0 and occurred <= conversion_us[lead]:
+            by_lead[lead].append((occurred, index, campaign))
+
+    credited = defaultdict(float)
+    for lead, touches in by_lead.items():
+        touches.sort()
+        n = len(touches)
+        if model == 'first_touch':
+            weights = [1.0] + [0.0] * (n - 1)
+        elif model == 'last_touch':
+            weights = [0.0] * (n - 1) + [1.0]
+        elif model == 'linear':
+            weights = [1.0 / n] * n
+        elif model == 'time_decay':
+            decay = [2 ** (-((conversion_us[lead] - occurred) / MICROS_PER_DAY) / TIME_DECAY_HALF_LIFE_DAYS)
+                     for occurred, _, _ in touches]
+            weights = [value / sum(decay) for value in decay]
+        elif n <= 2:
+            weights = [1.0 / n] * n
+        else:
+            middle = (1 - 2 * POSITION_BASED_ENDPOINT_SHARE) / (n - 2)
+            weights = [POSITION_BASED_ENDPOINT_SHARE] + [middle] * (n - 2) + [POSITION_BASED_ENDPOINT_SHARE]
+        for (_, _, campaign), weight in zip(touches, weights):
+            if campaign >= 0:
+                credited[campaign] += weight * revenue_cents[lead]
+    return np.array([round(credited[campaign]) for campaign in range(N_CAMPAIGNS)], dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--touches', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--loop-max', type=int, default=1_000_000,
+                        help='skip the (slow) Python loop above this many touches')
+    parser.add_argument('--load-max', type=int, default=1_000_000,
+                        help='skip the load timing (it builds every row dict in memory) above this many touches')
+    args = parser.parse_args()
+
+    print(f"{'touches':>10} {'model':>15} {'loop (s)':>10} {'engine (s)':>11} {'speedup':>9}  identical")
+    for n in args.touches:
+        columns = make_touches(n)
+        for model in ATTRIBUTION_MODELS:
+            start = time.perf_counter()
+            result = attribute(*columns, N_CAMPAIGNS, model=model)
+            engine_time = time.perf_counter() - start
+            engine_cents = np.rint(result['credited_revenue_cents']).astype(np.int64)
+
+            if n > args.loop_max:
+                print(f"{n:>10} {model:>15} {'-':>10} {engine_time:>11.4f} {'-':>9}  (loop skipped)")
+                continue
+
+            start = time.perf_counter()
+            expected = run_loop(*columns, model)
+            loop_time = time.perf_counter() - start
+
+            # Float summation order differs; allow a one-cent rounding flip
+            identical = bool(np.all(np.abs(engine_cents - expected) <= 1))
+            print(f"{n:>10} {model:>15} {loop_time:>10.4f} {engine_time:>11.4f} {loop_time / engine_time:>8.1f}x  {identical}")
+            if not identical:
+                raise SystemExit(f'{model}: engine credits differ from the reference loop')
+
+        pages = -(-n // TOUCHPOINT_PAGE_SIZE)
+        if n > args.load_max:
+            print(f"{n:>10} {'load':>15}  (skipped; fetch needs {pages:,} pages of {TOUCHPOINT_PAGE_SIZE:,})")
+            continue
+        touches, lead_index, campaign_index = make_rows(*columns[:3])
+        start = time.perf_counter()
+        run_load(touches, lead_index, campaign_index)
+        load_time = time.perf_counter() - start
+        print(f"{n:>10} {'load':>15} {'-':>10} {load_time:>11.4f}  rows -> arrays; fetch needs {pages:,} pages of {TOUCHPOINT_PAGE_SIZE:,} (not timed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Lead scoring benchmark: scalar calculate_lead_score loop vs score_leads_batch.
+
+Run from backend/:
+    python -m benchmarks.bench_lead_scoring [--sizes 10000 100000 1000000] [--scalar-max 1000000]
+
+Also checks that both paths produce identical scores and temperatures.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.modules.revops.scoring import (
+    SOURCE_SCORES, ENGAGEMENT_SCORES, STATUS_MODIFIERS, calculate_lead_score
+)
+from app.modules.revops.batch_scoring import score_leads_batch
+
+
+def make_leads(n, as_of, seed=42):
+    """Random columns, including unknown categories and missing activity dates."""
+    rng = random.Random(seed)
+    sources = list(SOURCE_SCORES) + ['unknown']
+    engagements = list(ENGAGEMENT_SCORES) + ['']
+    statuses = list(STATUS_MODIFIERS) + ['archived']
+
+    columns = {'sources': [], 'engagements': [], 'dates': [], 'statuses': []}
+    for _ in range(n):
+        columns['sources'].append(rng.choice(sources))
+        columns['engagements'].append(rng.choice(engagements))
+        columns['statuses'].append(rng.choice(statuses))
+        if rng.random() < 0.05:
+            columns['dates'].append(None)
+        else:
+            # Spread across ~10 days (and a little into the future) with microsecond precision
+            offset = timedelta(microseconds=rng.randint(-3_600_000_000, 10 * 86_400_000_000))
+            columns['dates'].append(as_of - offset)
+    return columns
+
+
+def run_scalar(columns, as_of):
+    return [
+        calculate_lead_score(source, engagement, date, status, as_of=as_of)
+        for source, engagement, date, status in zip(
+            columns['sources'], columns['engagements'], columns['dates'], columns['statuses']
+        )
+    ]
+
+
+def run_batch(columns, epochs, as_of):
+    return score_leads_batch(columns['sources'], columns['engagements'], epochs, columns['statuses'], as_of=as_of)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--scalar-max', type=int, default=1_000_000,
+                        help='skip the (slow) scalar loop above this many leads')
+    args = parser.parse_args()
+
+    as_of = datetime.now(timezone.utc)
+    print(f"{'leads':>10} {'scalar (s)':>12} {'batch (s)':>12} {'speedup':>9}  identical")
+
+    for n in args.sizes:
+        columns = make_leads(n, as_of)
+        epochs = [date.timestamp() if date else float('nan') for date in columns['dates']]
+
+        start = time.perf_counter()
+        scores, temperatures = run_batch(columns, epochs, as_of)
+        batch_time = time.perf_counter() - start
+
+        if n > args.scalar_max:
+            print(f"{n:>10} {'-':>12} {batch_time:>12.4f} {'-':>9}  (scalar skipped)")
+            continue
+
+        start = time.perf_counter()
+        expected = run_scalar(columns, as_of)
+        scalar_time = time.perf_counter() - start
+
+        identical = (
+            scores.tolist() == [score for score, _ in expected]
+            and temperatures.tolist() == [temperature for _, temperature in expected]
+        )
+        print(f"{n:>10} {scalar_time:>12.4f} {batch_time:>12.4f} {scalar_time / batch_time:>8.1f}x  {identical}")
+        if not identical:
+            raise SystemExit('Batch scores differ from calculate_lead_score')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+-- API Key Usage Metering
+-- The backend buffers per-key usage in memory and flushes it in batches through
+-- record_api_key_usage(), so public API calls no longer write on the read path.
+
+ALTER TABLE api_keys
+ADD COLUMN IF NOT EXISTS request_count BIGINT NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS api_key_usage_daily (
+    key_id UUID NOT NULL REFERENCES api_keys(id) ON DELETE CASCADE,
+    organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (key_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS idx_api_key_usage_daily_org_day
+ON api_key_usage_daily(organization_id, day);
+
+ALTER TABLE api_key_usage_daily ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view API key usage from their organization"
+    ON api_key_usage_daily FOR SELECT
+    USING (
+        organization_id IN (
+            SELECT organization_id FROM user_organizations
+            WHERE user_id = auth.uid()
+        )
+    );
+
+-- usage: [{"key_id", "organization_id", "request_count", "last_used_at"}, ...]
+CREATE OR REPLACE FUNCTION record_api_key_usage(usage JSONB)
+RETURNS VOID AS $$
+BEGIN
+  UPDATE api_keys k
+  SET request_count = k.request_count + u.request_count,
+      last_used_at = GREATEST(COALESCE(k.last_used_at, u.last_used_at), u.last_used_at)
+  FROM jsonb_to_recordset(usage)
+    AS u(key_id UUID, organization_id UUID, request_count BIGINT, last_used_at TIMESTAMPTZ)
+  WHERE k.id = u.key_id;
+
+  INSERT INTO api_key_usage_daily (key_id, organization_id, day, request_count)
+  SELECT u.key_id, u.organization_id, (u.last_used_at AT TIME ZONE 'UTC')::DATE, u.request_count
+  FROM jsonb_to_recordset(usage)
+    AS u(key_id UUID, organization_id UUID, request_count BIGINT, last_used_at TIMESTAMPTZ)
+  WHERE EXISTS (SELECT 1 FROM api_keys k WHERE k.id = u.key_id)
+  ON CONFLICT (key_id, day)
+  DO UPDATE SET request_count = api_key_usage_daily.request_count + EXCLUDED.request_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/record_api_key_usage
+REVOKE EXECUTE ON FUNCTION record_api_key_usage(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION record_api_key_usage(JSONB) TO service_role;
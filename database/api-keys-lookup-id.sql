@@ -0,0 +1,24 @@
+-- API Keys: O(1) lookup
+-- New keys look like gh_live_<lookup_id>_<secret>. The lookup id is indexed and
+-- the full key is verified against an HMAC-SHA256 digest instead of bcrypt.
+-- Legacy bcrypt keys get their digest filled in the first time they are used.
+
+ALTER TABLE api_keys
+ADD COLUMN IF NOT EXISTS lookup_id VARCHAR(24);
+
+ALTER TABLE api_keys
+ADD COLUMN IF NOT EXISTS key_digest VARCHAR(64);
+
+-- New keys no longer store a bcrypt hash
+ALTER TABLE api_keys
+ALTER COLUMN key_hash DROP NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_api_keys_lookup_id
+ON api_keys(lookup_id) WHERE lookup_id IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_api_keys_key_digest
+ON api_keys(key_digest) WHERE key_digest IS NOT NULL;
+
+-- Legacy keys still waiting for their first use after this migration
+CREATE INDEX IF NOT EXISTS idx_api_keys_legacy_pending
+ON api_keys(key_prefix) WHERE key_digest IS NULL AND is_active = true;
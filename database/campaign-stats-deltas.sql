@@ -0,0 +1,165 @@
+-- Incremental Campaign Stats
+-- campaigns.lead_count / conversion_count / revenue / roi are maintained by
+-- statement-level triggers on leads: each INSERT / UPDATE / DELETE statement
+-- computes the per-campaign difference between the old and new rows (lead
+-- created, converted, un-converted, revenue changed, moved to another
+-- campaign, deleted) and applies it with one UPDATE per statement, in the same
+-- transaction. Nothing rescans a campaign's leads.
+--
+-- A lead contributes 1 lead, plus 1 conversion and its revenue when converted.
+-- Values imported with campaign CSVs are kept as the baseline deltas apply to.
+
+-- Apply grouped deltas and recompute ROI from the new revenue.
+-- deltas: JSON array of {"campaign_id", "leads", "conversions", "revenue"}
+CREATE OR REPLACE FUNCTION apply_campaign_stat_deltas(deltas JSONB)
+RETURNS VOID AS $$
+BEGIN
+  UPDATE campaigns c SET
+    lead_count = GREATEST(COALESCE(c.lead_count, 0) + d.leads, 0),
+    conversion_count = GREATEST(COALESCE(c.conversion_count, 0) + d.conversions, 0),
+    revenue = COALESCE(c.revenue, 0) + d.revenue,
+    roi = CASE
+      WHEN COALESCE(c.spend, 0) > 0 THEN (COALESCE(c.revenue, 0) + d.revenue - c.spend) / c.spend
+      ELSE 0
+    END,
+    updated_at = NOW()
+  FROM (
+    SELECT
+      (item->>'campaign_id')::UUID AS campaign_id,
+      SUM((item->>'leads')::INTEGER) AS leads,
+      SUM((item->>'conversions')::INTEGER) AS conversions,
+      SUM((item->>'revenue')::NUMERIC) AS revenue
+    FROM jsonb_array_elements(deltas) AS item
+    GROUP BY 1
+  ) d
+  WHERE c.id = d.campaign_id
+    AND (d.leads <> 0 OR d.conversions <> 0 OR d.revenue <> 0);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/apply_campaign_stat_deltas
+REVOKE EXECUTE ON FUNCTION apply_campaign_stat_deltas(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_campaign_stat_deltas(JSONB) TO service_role;
+
+-- Transition tables can only serve one event per trigger, so one function
+-- handles all three and picks the side(s) that exist.
+CREATE OR REPLACE FUNCTION track_campaign_lead_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+  deltas JSONB;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT jsonb_agg(jsonb_build_object(
+      'campaign_id', campaign_id,
+      'leads', 1,
+      'conversions', CASE WHEN converted THEN 1 ELSE 0 END,
+      'revenue', CASE WHEN converted THEN COALESCE(revenue, 0) ELSE 0 END
+    ))
+    INTO deltas
+    FROM new_leads
+    WHERE campaign_id IS NOT NULL;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT jsonb_agg(jsonb_build_object(
+      'campaign_id', campaign_id,
+      'leads', -1,
+      'conversions', CASE WHEN converted THEN -1 ELSE 0 END,
+      'revenue', CASE WHEN converted THEN -COALESCE(revenue, 0) ELSE 0 END
+    ))
+    INTO deltas
+    FROM old_leads
+    WHERE campaign_id IS NOT NULL;
+  ELSE
+    -- Only rows whose campaign, conversion or revenue changed contribute
+    SELECT jsonb_agg(delta)
+    INTO deltas
+    FROM (
+      SELECT jsonb_build_object(
+        'campaign_id', o.campaign_id,
+        'leads', -1,
+        'conversions', CASE WHEN o.converted THEN -1 ELSE 0 END,
+        'revenue', CASE WHEN o.converted THEN -COALESCE(o.revenue, 0) ELSE 0 END
+      ) AS delta
+      FROM old_leads o
+      JOIN new_leads n ON n.id = o.id
+      WHERE o.campaign_id IS NOT NULL
+        AND (o.campaign_id IS DISTINCT FROM n.campaign_id
+             OR o.converted IS DISTINCT FROM n.converted
+             OR o.revenue IS DISTINCT FROM n.revenue)
+      UNION ALL
+      SELECT jsonb_build_object(
+        'campaign_id', n.campaign_id,
+        'leads', 1,
+        'conversions', CASE WHEN n.converted THEN 1 ELSE 0 END,
+        'revenue', CASE WHEN n.converted THEN COALESCE(n.revenue, 0) ELSE 0 END
+      )
+      FROM new_leads n
+      JOIN old_leads o ON o.id = n.id
+      WHERE n.campaign_id IS NOT NULL
+        AND (o.campaign_id IS DISTINCT FROM n.campaign_id
+             OR o.converted IS DISTINCT FROM n.converted
+             OR o.revenue IS DISTINCT FROM n.revenue)
+    ) changes;
+  END IF;
+
+  IF deltas IS NOT NULL THEN
+    PERFORM apply_campaign_stat_deltas(deltas);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS leads_campaign_stats_insert ON leads;
+CREATE TRIGGER leads_campaign_stats_insert
+  AFTER INSERT ON leads
+  REFERENCING NEW TABLE AS new_leads
+  FOR EACH STATEMENT EXECUTE FUNCTION track_campaign_lead_stats();
+
+DROP TRIGGER IF EXISTS leads_campaign_stats_update ON leads;
+CREATE TRIGGER leads_campaign_stats_update
+  AFTER UPDATE ON leads
+  REFERENCING OLD TABLE AS old_leads NEW TABLE AS new_leads
+  FOR EACH STATEMENT EXECUTE FUNCTION track_campaign_lead_stats();
+
+DROP TRIGGER IF EXISTS leads_campaign_stats_delete ON leads;
+CREATE TRIGGER leads_campaign_stats_delete
+  AFTER DELETE ON leads
+  REFERENCING OLD TABLE AS old_leads
+  FOR EACH STATEMENT EXECUTE FUNCTION track_campaign_lead_stats();
+
+-- Repair only: rebuild stats from the leads table for one campaign or all of
+-- an organization's campaigns. This replaces any CSV-imported baseline.
+CREATE OR REPLACE FUNCTION recompute_campaign_stats(org_id UUID, target_campaign_id UUID DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+  repaired INTEGER;
+BEGIN
+  UPDATE campaigns c SET
+    lead_count = s.lead_count,
+    conversion_count = s.conversion_count,
+    revenue = s.revenue,
+    roi = CASE WHEN COALESCE(c.spend, 0) > 0 THEN (s.revenue - c.spend) / c.spend ELSE 0 END,
+    updated_at = NOW()
+  FROM (
+    SELECT
+      cp.id,
+      COUNT(l.id) AS lead_count,
+      COUNT(l.id) FILTER (WHERE l.converted) AS conversion_count,
+      COALESCE(SUM(l.revenue) FILTER (WHERE l.converted), 0) AS revenue
+    FROM campaigns cp
+    LEFT JOIN leads l ON l.campaign_id = cp.id
+    WHERE cp.organization_id = org_id
+      AND (target_campaign_id IS NULL OR cp.id = target_campaign_id)
+    GROUP BY cp.id
+  ) s
+  WHERE c.id = s.id;
+
+  GET DIAGNOSTICS repaired = ROW_COUNT;
+  RETURN repaired;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/recompute_campaign_stats
+REVOKE EXECUTE ON FUNCTION recompute_campaign_stats(UUID, UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION recompute_campaign_stats(UUID, UUID) TO service_role;
@@ -0,0 +1,51 @@
+-- Lead Score Decay
+-- The recency part of a lead's score changes 1, 4 and 8 days after its last
+-- activity. score_refresh_at stores the next of those boundaries (NULL once the
+-- score can no longer decay), so the rescoring job only reads leads that are
+-- actually due instead of rescanning every lead.
+
+ALTER TABLE leads
+ADD COLUMN IF NOT EXISTS score_refresh_at TIMESTAMPTZ;
+
+CREATE INDEX IF NOT EXISTS idx_leads_score_refresh_at
+ON leads(score_refresh_at)
+WHERE score_refresh_at IS NOT NULL;
+
+-- Write recomputed scores in one statement. A lead edited since it was read
+-- (updated_at changed) is skipped: the edit already rescored it.
+-- updates: JSON array of {"id", "score", "temperature", "score_refresh_at", "updated_at"}
+CREATE OR REPLACE FUNCTION apply_lead_rescores(updates JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+  applied INTEGER;
+BEGIN
+  UPDATE leads l SET
+    score = u.score,
+    temperature = u.temperature,
+    score_refresh_at = u.score_refresh_at
+  FROM jsonb_to_recordset(updates) AS u(
+    id UUID,
+    score INTEGER,
+    temperature TEXT,
+    score_refresh_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ
+  )
+  WHERE l.id = u.id
+    AND l.updated_at IS NOT DISTINCT FROM u.updated_at;
+
+  GET DIAGNOSTICS applied = ROW_COUNT;
+  RETURN applied;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/apply_lead_rescores
+REVOKE EXECUTE ON FUNCTION apply_lead_rescores(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_lead_rescores(JSONB) TO service_role;
+
+-- Existing scores were never decayed: make every lead with an activity date due
+-- once, after which the job only touches leads crossing a boundary.
+UPDATE leads
+SET score_refresh_at = NOW()
+WHERE last_activity_date IS NOT NULL
+  AND score_refresh_at IS NULL;
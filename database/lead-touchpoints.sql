@@ -0,0 +1,106 @@
+-- Lead Touchpoints & Multi-Touch Attribution
+-- lead_touchpoints records every marketing touch a lead had (ad click, email
+-- open, webinar, ...) so conversion revenue can be credited across campaigns
+-- instead of only to leads.campaign_id (first touch).
+--
+-- The backend attribution engine (app/modules/revops/attribution.py) reads an
+-- organization's touches and converted leads, computes credited revenue per
+-- campaign for a model (first_touch, last_touch, linear, time_decay,
+-- position_based) and writes the per-campaign results to campaign_attribution
+-- through replace_campaign_attribution(), one statement per run.
+
+CREATE TABLE IF NOT EXISTS lead_touchpoints (
+  id BIGSERIAL PRIMARY KEY,
+  organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+  lead_id UUID NOT NULL REFERENCES leads(id) ON DELETE CASCADE,
+  campaign_id UUID REFERENCES campaigns(id) ON DELETE SET NULL,
+  channel TEXT,
+  touch_type TEXT, -- ad_click, email_open, webinar, form_fill, ...
+  occurred_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  metadata JSONB DEFAULT '{}'::jsonb,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- The engine pages through an organization's touches by id
+CREATE INDEX IF NOT EXISTS idx_lead_touchpoints_org_id
+  ON lead_touchpoints(organization_id, id);
+CREATE INDEX IF NOT EXISTS idx_lead_touchpoints_lead
+  ON lead_touchpoints(lead_id, occurred_at);
+
+ALTER TABLE lead_touchpoints ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their organization's touchpoints"
+  ON lead_touchpoints FOR SELECT
+  USING (
+    organization_id IN (
+      SELECT organization_id FROM user_organizations
+      WHERE user_id = auth.uid()
+    )
+  );
+
+-- Credited results, one row per campaign per model
+CREATE TABLE IF NOT EXISTS campaign_attribution (
+  organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+  campaign_id UUID NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+  model TEXT NOT NULL,
+  touches INTEGER NOT NULL DEFAULT 0,
+  credited_conversions NUMERIC(12, 4) NOT NULL DEFAULT 0,
+  credited_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  attributed_roi DECIMAL(10, 2) NOT NULL DEFAULT 0, -- (credited_revenue - spend) / spend
+  computed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (campaign_id, model)
+);
+
+CREATE INDEX IF NOT EXISTS idx_campaign_attribution_org_model
+  ON campaign_attribution(organization_id, model);
+
+ALTER TABLE campaign_attribution ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their organization's attribution"
+  ON campaign_attribution FOR SELECT
+  USING (
+    organization_id IN (
+      SELECT organization_id FROM user_organizations
+      WHERE user_id = auth.uid()
+    )
+  );
+
+-- Replace an organization's results for one model atomically.
+-- results: JSON array of {"campaign_id", "touches", "credited_conversions", "credited_revenue"}
+CREATE OR REPLACE FUNCTION replace_campaign_attribution(org_id UUID, attribution_model TEXT, results JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+  written INTEGER;
+BEGIN
+  DELETE FROM campaign_attribution
+  WHERE organization_id = org_id AND model = attribution_model;
+
+  INSERT INTO campaign_attribution (
+    organization_id, campaign_id, model, touches,
+    credited_conversions, credited_revenue, attributed_roi, computed_at
+  )
+  SELECT
+    org_id,
+    c.id,
+    attribution_model,
+    (item->>'touches')::INTEGER,
+    (item->>'credited_conversions')::NUMERIC,
+    (item->>'credited_revenue')::NUMERIC,
+    CASE
+      WHEN COALESCE(c.spend, 0) > 0 THEN ((item->>'credited_revenue')::NUMERIC - c.spend) / c.spend
+      ELSE 0
+    END,
+    NOW()
+  FROM jsonb_array_elements(results) AS item
+  -- Campaigns deleted (or from another org) since the touches were read are skipped
+  JOIN campaigns c ON c.id = (item->>'campaign_id')::UUID AND c.organization_id = org_id;
+
+  GET DIAGNOSTICS written = ROW_COUNT;
+  RETURN written;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/replace_campaign_attribution
+REVOKE EXECUTE ON FUNCTION replace_campaign_attribution(UUID, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION replace_campaign_attribution(UUID, TEXT, JSONB) TO service_role;
@@ -0,0 +1,11 @@
+-- Leads Keyset Pagination Indexes
+-- GET /api/revops/leads pages through an organization's leads ordered by
+-- (score, id) or (created_at, id), newest/highest first. These indexes match
+-- both orderings, so each page is an index range scan of `limit` rows no
+-- matter how deep the cursor is or how many leads the organization has.
+
+CREATE INDEX IF NOT EXISTS idx_leads_org_score_id
+ON leads(organization_id, score DESC NULLS LAST, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_leads_org_created_id
+ON leads(organization_id, created_at DESC NULLS LAST, id DESC);
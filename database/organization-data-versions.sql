@@ -0,0 +1,92 @@
+-- Organization Data Versions
+-- A counter per (organization, data type) that increases whenever that
+-- organization's leads, customers or campaigns change. The backend caches the
+-- serialized AI chat context per organization and only rebuilds it when the
+-- version it was built from is no longer current, instead of re-querying and
+-- re-enriching every row on every chat message.
+--
+-- Statement-level triggers bump each affected organization once per statement,
+-- so bulk uploads cost one counter update per organization, not per row.
+-- Campaign stats maintained by the leads triggers (campaign-stats-deltas.sql)
+-- bump the campaigns version as well.
+
+CREATE TABLE IF NOT EXISTS organization_data_versions (
+    organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    data_type TEXT NOT NULL, -- leads, customers, campaigns
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (organization_id, data_type)
+);
+
+ALTER TABLE organization_data_versions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view data versions of their organization"
+    ON organization_data_versions FOR SELECT
+    USING (
+        organization_id IN (
+            SELECT organization_id FROM user_organizations
+            WHERE user_id = auth.uid()
+        )
+    );
+
+-- TG_ARGV[0] is the data type. Transition tables can only serve one event per
+-- trigger, so one function handles all three and picks the side(s) that exist.
+CREATE OR REPLACE FUNCTION bump_organization_data_version()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO organization_data_versions (organization_id, data_type, version)
+    SELECT DISTINCT organization_id, TG_ARGV[0], 1 FROM new_rows
+    ON CONFLICT (organization_id, data_type) DO UPDATE SET
+      version = organization_data_versions.version + 1,
+      updated_at = NOW();
+  ELSIF TG_OP = 'DELETE' THEN
+    -- Rows removed by an organization's cascaded delete: the organization is
+    -- already gone, so skip it instead of failing the foreign key
+    INSERT INTO organization_data_versions (organization_id, data_type, version)
+    SELECT DISTINCT organization_id, TG_ARGV[0], 1 FROM old_rows o
+    WHERE EXISTS (SELECT 1 FROM organizations WHERE id = o.organization_id)
+    ON CONFLICT (organization_id, data_type) DO UPDATE SET
+      version = organization_data_versions.version + 1,
+      updated_at = NOW();
+  ELSE
+    INSERT INTO organization_data_versions (organization_id, data_type, version)
+    SELECT organization_id, TG_ARGV[0], 1 FROM new_rows
+    UNION
+    SELECT organization_id, TG_ARGV[0], 1 FROM old_rows
+    ON CONFLICT (organization_id, data_type) DO UPDATE SET
+      version = organization_data_versions.version + 1,
+      updated_at = NOW();
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DO $$
+DECLARE
+  tracked TEXT;
+BEGIN
+  FOREACH tracked IN ARRAY ARRAY['leads', 'customers', 'campaigns'] LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_data_version_insert', tracked);
+    EXECUTE format(
+      'CREATE TRIGGER %I AFTER INSERT ON %I REFERENCING NEW TABLE AS new_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION bump_organization_data_version(%L)',
+      tracked || '_data_version_insert', tracked, tracked
+    );
+
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_data_version_update', tracked);
+    EXECUTE format(
+      'CREATE TRIGGER %I AFTER UPDATE ON %I REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION bump_organization_data_version(%L)',
+      tracked || '_data_version_update', tracked, tracked
+    );
+
+    EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tracked || '_data_version_delete', tracked);
+    EXECUTE format(
+      'CREATE TRIGGER %I AFTER DELETE ON %I REFERENCING OLD TABLE AS old_rows '
+      'FOR EACH STATEMENT EXECUTE FUNCTION bump_organization_data_version(%L)',
+      tracked || '_data_version_delete', tracked, tracked
+    );
+  END LOOP;
+END;
+$$;
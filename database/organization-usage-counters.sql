@@ -0,0 +1,132 @@
+-- Organization Usage Counters
+-- One row per organization with the counts subscription limits are checked
+-- against. Triggers keep it current on every insert/delete (and on dataset
+-- row-count changes), so limit checks never count or sum the source tables.
+
+CREATE TABLE IF NOT EXISTS organization_usage (
+    organization_id UUID PRIMARY KEY REFERENCES organizations(id) ON DELETE CASCADE,
+    datasets_count INTEGER NOT NULL DEFAULT 0,
+    talent_count INTEGER NOT NULL DEFAULT 0,
+    jobs_count INTEGER NOT NULL DEFAULT 0,
+    total_rows BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE organization_usage ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view usage of their organization"
+    ON organization_usage FOR SELECT
+    USING (
+        organization_id IN (
+            SELECT organization_id FROM user_organizations
+            WHERE user_id = auth.uid()
+        )
+    );
+
+-- Apply deltas to an organization's counters, creating the row on first use.
+-- Decrements only update: they also fire for rows removed by an organization's
+-- cascaded delete, when inserting a row for it would fail the foreign key.
+CREATE OR REPLACE FUNCTION bump_organization_usage(
+    org_id UUID,
+    datasets_delta INTEGER DEFAULT 0,
+    talent_delta INTEGER DEFAULT 0,
+    jobs_delta INTEGER DEFAULT 0,
+    rows_delta BIGINT DEFAULT 0
+)
+RETURNS VOID AS $$
+BEGIN
+  IF datasets_delta <= 0 AND talent_delta <= 0 AND jobs_delta <= 0 AND rows_delta <= 0 THEN
+    UPDATE organization_usage SET
+      datasets_count = GREATEST(datasets_count + datasets_delta, 0),
+      talent_count = GREATEST(talent_count + talent_delta, 0),
+      jobs_count = GREATEST(jobs_count + jobs_delta, 0),
+      total_rows = GREATEST(total_rows + rows_delta, 0),
+      updated_at = NOW()
+    WHERE organization_id = org_id;
+    RETURN;
+  END IF;
+
+  INSERT INTO organization_usage (organization_id, datasets_count, talent_count, jobs_count, total_rows)
+  VALUES (org_id, GREATEST(datasets_delta, 0), GREATEST(talent_delta, 0), GREATEST(jobs_delta, 0), GREATEST(rows_delta, 0))
+  ON CONFLICT (organization_id) DO UPDATE SET
+    datasets_count = GREATEST(organization_usage.datasets_count + datasets_delta, 0),
+    talent_count = GREATEST(organization_usage.talent_count + talent_delta, 0),
+    jobs_count = GREATEST(organization_usage.jobs_count + jobs_delta, 0),
+    total_rows = GREATEST(organization_usage.total_rows + rows_delta, 0),
+    updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/bump_organization_usage
+REVOKE EXECUTE ON FUNCTION bump_organization_usage(UUID, INTEGER, INTEGER, INTEGER, BIGINT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION bump_organization_usage(UUID, INTEGER, INTEGER, INTEGER, BIGINT) TO service_role;
+
+CREATE OR REPLACE FUNCTION track_dataset_usage()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM bump_organization_usage(NEW.organization_id, datasets_delta => 1, rows_delta => COALESCE(NEW.total_rows, 0));
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM bump_organization_usage(OLD.organization_id, datasets_delta => -1, rows_delta => -COALESCE(OLD.total_rows, 0));
+  ELSIF TG_OP = 'UPDATE' AND COALESCE(NEW.total_rows, 0) <> COALESCE(OLD.total_rows, 0) THEN
+    PERFORM bump_organization_usage(NEW.organization_id, rows_delta => COALESCE(NEW.total_rows, 0) - COALESCE(OLD.total_rows, 0));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_talent_usage()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM bump_organization_usage(NEW.organization_id, talent_delta => 1);
+  ELSE
+    PERFORM bump_organization_usage(OLD.organization_id, talent_delta => -1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_jobs_usage()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM bump_organization_usage(NEW.organization_id, jobs_delta => 1);
+  ELSE
+    PERFORM bump_organization_usage(OLD.organization_id, jobs_delta => -1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trg_labeling_datasets_usage ON labeling_datasets;
+CREATE TRIGGER trg_labeling_datasets_usage
+    AFTER INSERT OR DELETE OR UPDATE OF total_rows ON labeling_datasets
+    FOR EACH ROW EXECUTE FUNCTION track_dataset_usage();
+
+DROP TRIGGER IF EXISTS trg_talent_usage ON talent;
+CREATE TRIGGER trg_talent_usage
+    AFTER INSERT OR DELETE ON talent
+    FOR EACH ROW EXECUTE FUNCTION track_talent_usage();
+
+DROP TRIGGER IF EXISTS trg_jobs_usage ON jobs;
+CREATE TRIGGER trg_jobs_usage
+    AFTER INSERT OR DELETE ON jobs
+    FOR EACH ROW EXECUTE FUNCTION track_jobs_usage();
+
+-- Backfill from existing data (safe to re-run)
+INSERT INTO organization_usage (organization_id, datasets_count, talent_count, jobs_count, total_rows)
+SELECT
+    o.id,
+    (SELECT COUNT(*) FROM labeling_datasets d WHERE d.organization_id = o.id),
+    (SELECT COUNT(*) FROM talent t WHERE t.organization_id = o.id),
+    (SELECT COUNT(*) FROM jobs j WHERE j.organization_id = o.id),
+    (SELECT COALESCE(SUM(d.total_rows), 0) FROM labeling_datasets d WHERE d.organization_id = o.id)
+FROM organizations o
+ON CONFLICT (organization_id) DO UPDATE SET
+    datasets_count = EXCLUDED.datasets_count,
+    talent_count = EXCLUDED.talent_count,
+    jobs_count = EXCLUDED.jobs_count,
+    total_rows = EXCLUDED.total_rows,
+    updated_at = NOW();
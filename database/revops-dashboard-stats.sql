@@ -0,0 +1,45 @@
+-- RevOps Dashboard Stats
+-- All dashboard numbers in one call: lead counts by temperature plus hot leads
+-- still needing follow-up from a single grouped scan of the organization's
+-- leads, and the top 5 campaigns by ROI. Only the counts leave the database.
+
+-- Covers the filtered counts so they can be answered from the index alone
+CREATE INDEX IF NOT EXISTS idx_leads_org_temperature_status
+ON leads(organization_id, temperature, status);
+
+CREATE OR REPLACE FUNCTION get_revops_dashboard(org_id UUID)
+RETURNS TABLE(
+  total_leads BIGINT,
+  hot_leads BIGINT,
+  warm_leads BIGINT,
+  cold_leads BIGINT,
+  follow_up_count BIGINT,
+  top_campaigns JSONB
+) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    COUNT(*)::BIGINT,
+    COUNT(*) FILTER (WHERE l.temperature = 'hot')::BIGINT,
+    COUNT(*) FILTER (WHERE l.temperature = 'warm')::BIGINT,
+    COUNT(*) FILTER (WHERE l.temperature = 'cold')::BIGINT,
+    COUNT(*) FILTER (WHERE l.temperature = 'hot' AND l.status IN ('new', 'contacted'))::BIGINT,
+    (
+      SELECT COALESCE(jsonb_agg(to_jsonb(c) ORDER BY c.roi DESC), '[]'::jsonb)
+      FROM (
+        SELECT *
+        FROM campaigns
+        WHERE organization_id = org_id
+        ORDER BY roi DESC
+        LIMIT 5
+      ) c
+    )
+  FROM leads l
+  WHERE l.organization_id = org_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/get_revops_dashboard
+REVOKE EXECUTE ON FUNCTION get_revops_dashboard(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_revops_dashboard(UUID) TO service_role;
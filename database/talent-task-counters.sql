@@ -0,0 +1,122 @@
+-- Atomic Talent Task Counters
+-- Applies task counter deltas (tasks_assigned / tasks_completed / tasks_pending)
+-- server-side with `x = x + delta`, so concurrent job writes can no longer lose
+-- updates the way the old read-modify-write did (see fix-talent-counters.sql).
+--
+-- The deltas come from statement-level triggers on jobs, computed from the
+-- old and new rows of the write itself: a job's previous assignee and status
+-- are whatever the row held when it was updated, so two concurrent status
+-- changes can never both apply the same delta.
+--
+-- deltas: JSON array of {"talent_id", "assigned", "completed", "pending"}.
+-- Entries for the same talent are summed, so a bulk job operation updates each
+-- talent row once, in a single statement.
+
+CREATE OR REPLACE FUNCTION apply_talent_task_deltas(deltas JSONB)
+RETURNS VOID AS $$
+BEGIN
+  UPDATE talent t SET
+    tasks_assigned = GREATEST(COALESCE(t.tasks_assigned, 0) + d.assigned, 0),
+    tasks_completed = GREATEST(COALESCE(t.tasks_completed, 0) + d.completed, 0),
+    tasks_pending = GREATEST(COALESCE(t.tasks_pending, 0) + d.pending, 0),
+    updated_at = NOW()
+  FROM (
+    SELECT
+      (item->>'talent_id')::UUID AS talent_id,
+      SUM(COALESCE((item->>'assigned')::INTEGER, 0)) AS assigned,
+      SUM(COALESCE((item->>'completed')::INTEGER, 0)) AS completed,
+      SUM(COALESCE((item->>'pending')::INTEGER, 0)) AS pending
+    FROM jsonb_array_elements(deltas) AS item
+    GROUP BY 1
+  ) d
+  WHERE t.id = d.talent_id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Backend only (service role): PostgREST would otherwise expose it to anyone
+-- holding the anon key at /rpc/apply_talent_task_deltas
+REVOKE EXECUTE ON FUNCTION apply_talent_task_deltas(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_talent_task_deltas(JSONB) TO service_role;
+
+-- One function for all three events, like track_campaign_lead_stats(). A job
+-- counts as 1 assigned plus 1 completed or 1 pending for its assigned talent.
+CREATE OR REPLACE FUNCTION track_talent_task_counters()
+RETURNS TRIGGER AS $$
+DECLARE
+  deltas JSONB;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT jsonb_agg(jsonb_build_object(
+      'talent_id', assigned_talent_id,
+      'assigned', 1,
+      'completed', CASE WHEN status = 'completed' THEN 1 ELSE 0 END,
+      'pending', CASE WHEN status = 'completed' THEN 0 ELSE 1 END
+    ))
+    INTO deltas
+    FROM new_jobs
+    WHERE assigned_talent_id IS NOT NULL;
+  ELSIF TG_OP = 'DELETE' THEN
+    SELECT jsonb_agg(jsonb_build_object(
+      'talent_id', assigned_talent_id,
+      'assigned', -1,
+      'completed', CASE WHEN status = 'completed' THEN -1 ELSE 0 END,
+      'pending', CASE WHEN status = 'completed' THEN 0 ELSE -1 END
+    ))
+    INTO deltas
+    FROM old_jobs
+    WHERE assigned_talent_id IS NOT NULL;
+  ELSE
+    -- Only jobs whose assignee or completion changed contribute
+    SELECT jsonb_agg(delta)
+    INTO deltas
+    FROM (
+      SELECT jsonb_build_object(
+        'talent_id', o.assigned_talent_id,
+        'assigned', -1,
+        'completed', CASE WHEN o.status = 'completed' THEN -1 ELSE 0 END,
+        'pending', CASE WHEN o.status = 'completed' THEN 0 ELSE -1 END
+      ) AS delta
+      FROM old_jobs o
+      JOIN new_jobs n ON n.id = o.id
+      WHERE o.assigned_talent_id IS NOT NULL
+        AND (o.assigned_talent_id IS DISTINCT FROM n.assigned_talent_id
+             OR (o.status = 'completed') IS DISTINCT FROM (n.status = 'completed'))
+      UNION ALL
+      SELECT jsonb_build_object(
+        'talent_id', n.assigned_talent_id,
+        'assigned', 1,
+        'completed', CASE WHEN n.status = 'completed' THEN 1 ELSE 0 END,
+        'pending', CASE WHEN n.status = 'completed' THEN 0 ELSE 1 END
+      )
+      FROM new_jobs n
+      JOIN old_jobs o ON o.id = n.id
+      WHERE n.assigned_talent_id IS NOT NULL
+        AND (o.assigned_talent_id IS DISTINCT FROM n.assigned_talent_id
+             OR (o.status = 'completed') IS DISTINCT FROM (n.status = 'completed'))
+    ) changes;
+  END IF;
+
+  IF deltas IS NOT NULL THEN
+    PERFORM apply_talent_task_deltas(deltas);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS jobs_talent_tasks_insert ON jobs;
+CREATE TRIGGER jobs_talent_tasks_insert
+  AFTER INSERT ON jobs
+  REFERENCING NEW TABLE AS new_jobs
+  FOR EACH STATEMENT EXECUTE FUNCTION track_talent_task_counters();
+
+DROP TRIGGER IF EXISTS jobs_talent_tasks_update ON jobs;
+CREATE TRIGGER jobs_talent_tasks_update
+  AFTER UPDATE ON jobs
+  REFERENCING OLD TABLE AS old_jobs NEW TABLE AS new_jobs
+  FOR EACH STATEMENT EXECUTE FUNCTION track_talent_task_counters();
+
+DROP TRIGGER IF EXISTS jobs_talent_tasks_delete ON jobs;
+CREATE TRIGGER jobs_talent_tasks_delete
+  AFTER DELETE ON jobs
+  REFERENCING OLD TABLE AS old_jobs
+  FOR EACH STATEMENT EXECUTE FUNCTION track_talent_task_counters();
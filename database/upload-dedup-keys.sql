@@ -0,0 +1,43 @@
+-- Upload Dedup Keys
+-- Normalized, uniquely indexed keys for the rows CSV uploads deduplicate on.
+-- Uploads insert with ON CONFLICT (organization_id, <key>) DO NOTHING, so the
+-- database (not a per-upload copy of every existing email/name) decides what's
+-- a duplicate, and concurrent uploads can't both insert the same row.
+--
+--   leads.email_key      = lower(btrim(email))
+--   customers.email_key  = lower(btrim(email))
+--   campaigns.name_key   = lower(btrim(name))
+--
+-- Generated columns (rather than expression indexes) because PostgREST's
+-- on_conflict takes column names.
+
+ALTER TABLE leads
+ADD COLUMN IF NOT EXISTS email_key TEXT GENERATED ALWAYS AS (lower(btrim(email))) STORED;
+
+ALTER TABLE customers
+ADD COLUMN IF NOT EXISTS email_key TEXT GENERATED ALWAYS AS (lower(btrim(email))) STORED;
+
+ALTER TABLE campaigns
+ADD COLUMN IF NOT EXISTS name_key TEXT GENERATED ALWAYS AS (lower(btrim(name))) STORED;
+
+-- The unique indexes below fail if an organization already has duplicates
+-- (possible from in-file duplicates or concurrent uploads before this change).
+-- Check first:
+--
+--   SELECT 'leads' AS tbl, organization_id, email_key, COUNT(*) FROM leads GROUP BY 1, 2, 3 HAVING COUNT(*) > 1
+--   UNION ALL
+--   SELECT 'customers', organization_id, email_key, COUNT(*) FROM customers GROUP BY 1, 2, 3 HAVING COUNT(*) > 1
+--   UNION ALL
+--   SELECT 'campaigns', organization_id, name_key, COUNT(*) FROM campaigns GROUP BY 1, 2, 3 HAVING COUNT(*) > 1;
+--
+-- and merge or delete the extras (e.g. keep the oldest row per key) before
+-- continuing.
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_leads_org_email_key
+ON leads(organization_id, email_key);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_org_email_key
+ON customers(organization_id, email_key);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_campaigns_org_name_key
+ON campaigns(organization_id, name_key);
@@ -1,5 +1,5 @@
 import { useState, useEffect, useRef } from 'react'
-import { useQuery } from '@tanstack/react-query'
+import { useInfiniteQuery } from '@tanstack/react-query'
 import { revopsService } from '../../services/revops.service'
 
 export default function LeadsPage() {
@@ -15,10 +15,13 @@ export default function LeadsPage() {
   const [chatLoading, setChatLoading] = useState(false)
   const chatEndRef = useRef(null)
 
-  const { data, isLoading, refetch } = useQuery({
+  const { data: pages, isLoading, refetch, fetchNextPage, hasNextPage, isFetchingNextPage } = useInfiniteQuery({
     queryKey: ['leads', sortBy],
-    queryFn: () => revopsService.getLeads(sortBy),
+    queryFn: ({ pageParam }) => revopsService.getLeads(sortBy, pageParam),
+    initialPageParam: null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
   })
+  const data = pages ? { leads: pages.pages.flatMap((page) => page.leads) } : undefined
 
   // Auto-scroll to bottom of chat
   useEffect(() => {
@@ -290,6 +293,17 @@ export default function LeadsPage() {
                 ))}
               </tbody>
             </table>
+            {hasNextPage && (
+              <div className="text-center py-4">
+                <button
+                  onClick={() => fetchNextPage()}
+                  disabled={isFetchingNextPage}
+                  className="px-4 py-2 bg-purple-500/20 text-purple-300 rounded-lg border border-purple-500/30 hover:bg-purple-500/30 transition-all disabled:opacity-50"
+                >
+                  {isFetchingNextPage ? 'Loading...' : 'Load more leads'}
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <div className="text-center py-16">
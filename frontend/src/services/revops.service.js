@@ -2,9 +2,9 @@ import api from './api'
 
 export const revopsService = {
   // Leads
-  async getLeads(sortBy = 'score') {
+  async getLeads(sortBy = 'score', cursor = null) {
     const response = await api.get('/revops/leads', {
-      params: { sort_by: sortBy },
+      params: { sort_by: sortBy, ...(cursor ? { cursor } : {}) },
     })
     return response.data
   },